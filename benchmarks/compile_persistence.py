@@ -0,0 +1,90 @@
+"""Benchmark: memory compile persistence throughput with a stubbed summarizer.
+
+    poetry run python -m benchmarks.compile_persistence --rows 100000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.message_window import build_database
+from klatrebot_v2.db import connection
+from klatrebot_v2.memory.compiler import CompilerConfig, RollupSummary, SegmentSummary, compile_run
+from klatrebot_v2.memory.segmentation import SegmentCandidate, SegmentConfig
+
+
+_ITEM_TYPES = ("decision", "plan", "preference", "fact", "lore")
+
+
+async def _summarizer(segment: SegmentCandidate) -> SegmentSummary:
+    ids = [m.discord_message_id for m in segment.messages]
+    return SegmentSummary(
+        topic_title=f"Emne {ids[0]}",
+        summary=f"Opsummering af {len(ids)} beskeder.",
+        tags=["klatring", f"kanal {segment.channel_id}", f"tag {ids[0] % 50}"],
+        memory_items=[
+            {
+                "type": _ITEM_TYPES[n % len(_ITEM_TYPES)],
+                "subject": f"emne {n}",
+                "text": f"Minde {n} fra segment {ids[0]}.",
+                "tags": [f"tag {(ids[0] + n) % 50}", "klatring", f"emne {n}"],
+                "source_message_ids": ids[n : n + 5],
+            }
+            for n in range(10)
+        ],
+    )
+
+
+async def _rollup_summarizer(rollup) -> RollupSummary:
+    return RollupSummary(title="Rollup", summary="Perioden.", key_items=["a", "b"], tags=["klatring"])
+
+
+async def _time(path: Path) -> tuple[int, float, float]:
+    conn = await connection.open(str(path))
+    marks: dict[str, float] = {}
+    segments = 0
+
+    def progress(line: str) -> None:
+        nonlocal segments
+        if line.startswith("Summarizing "):
+            segments = int(line.split()[1])
+            marks["start"] = time.perf_counter()
+        elif line.startswith(f"Summarized {segments}/{segments}"):
+            marks["end"] = time.perf_counter()
+
+    started = time.perf_counter()
+    await compile_run(
+        conn,
+        config=CompilerConfig(
+            name="bench",
+            compiler_model="stub",
+            segment=SegmentConfig(min_human_messages=1, max_messages=100),
+        ),
+        summarizer=_summarizer,
+        rollup_summarizer=_rollup_summarizer,
+        progress=progress,
+    )
+    total_s = time.perf_counter() - started
+    await conn.close()
+    return segments, marks["end"] - marks["start"], total_s
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        build_database(path, args.rows)
+        segments, persist_s, total_s = asyncio.run(_time(path))
+        print(f"compile over {args.rows} messages, {segments} summarized segments (10 items each):")
+        print(f"  segment persistence  {segments / persist_s:10,.0f} segments/s  ({persist_s:.2f}s)")
+        print(f"  whole compile_run    {total_s:10.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Benchmark: compile planning, per-segment lookups vs. a preloaded segment index.
+
+    poetry run python -m benchmarks.compile_planning --rows 100000 --max-messages 10
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+import aiosqlite
+
+from benchmarks.message_window import build_database
+from klatrebot_v2.db import connection
+from klatrebot_v2.memory import store
+from klatrebot_v2.memory.compiler import CompilerConfig, RollupSummary, SegmentSummary, _segment_key, compile_run
+from klatrebot_v2.memory.segment_index import load_segment_index
+from klatrebot_v2.memory.segmentation import SegmentCandidate, SegmentConfig, iter_segments
+
+
+async def _summarizer(segment: SegmentCandidate) -> SegmentSummary:
+    return SegmentSummary(topic_title="Emne", summary="Opsummering.")
+
+
+async def _rollup_summarizer(rollup) -> RollupSummary:
+    return RollupSummary(title="Rollup", summary="Perioden.")
+
+
+async def _legacy_plan(conn: aiosqlite.Connection, run_id: int, segments: list[SegmentCandidate]) -> int:
+    """The previous shape: a key lookup and an overlap query per segment."""
+    existing = 0
+    for segment in segments:
+        rows = await conn.execute_fetchall(
+            "SELECT id, status, retry_count FROM conversation_segments WHERE compiler_run_id = ? AND segment_key = ?",
+            (run_id, _segment_key(segment)),
+        )
+        if rows and rows[0][1] in {"summarized", "skipped"}:
+            existing += 1
+            continue
+        message_ids = [m.discord_message_id for m in segment.messages]
+        await conn.execute_fetchall(
+            f"""
+            SELECT DISTINCT cs.id, cs.status, cs.segment_key
+            FROM conversation_segments cs
+            JOIN segment_messages sm ON sm.segment_id = cs.id
+            WHERE cs.compiler_run_id = ?
+              AND cs.channel_id = ?
+              AND sm.discord_message_id IN ({",".join("?" for _ in message_ids)})
+            ORDER BY cs.id
+            """,
+            (run_id, segment.channel_id, *message_ids),
+        )
+    return existing
+
+
+async def _indexed_plan(conn: aiosqlite.Connection, run_id: int, segments: list[SegmentCandidate]) -> int:
+    index = await load_segment_index(conn, run_id=run_id)
+    existing = 0
+    for segment in segments:
+        found = index.by_key(_segment_key(segment))
+        if found and found.status in {"summarized", "skipped"}:
+            existing += 1
+            continue
+        index.owners(m.discord_message_id for m in segment.messages)
+    return existing
+
+
+async def _time(path: Path, max_messages: int) -> tuple[int, float, float, float]:
+    conn = await connection.open(str(path))
+    segment_config = SegmentConfig(min_human_messages=1, max_messages=max_messages)
+    run_id = await compile_run(
+        conn,
+        config=CompilerConfig(name="bench", compiler_model="stub", segment=segment_config),
+        summarizer=_summarizer,
+        rollup_summarizer=_rollup_summarizer,
+    )
+    segments = [s async for s in iter_segments(store.iter_messages(conn), segment_config)]
+
+    marks: dict[str, float] = {}
+
+    def progress(line: str) -> None:
+        if line.startswith("Segments: "):
+            marks["planned"] = time.perf_counter()
+
+    started = time.perf_counter()
+    await compile_run(
+        conn,
+        config=CompilerConfig(name="bench", compiler_model="stub", segment=segment_config),
+        summarizer=_summarizer,
+        rollup_summarizer=_rollup_summarizer,
+        progress=progress,
+    )
+    planning_s = marks["planned"] - started
+
+    # Failed segments take both lookups, the worst case for the old shape.
+    await conn.execute("UPDATE conversation_segments SET status = 'failed' WHERE compiler_run_id = ?", (run_id,))
+    await conn.commit()
+    started = time.perf_counter()
+    legacy_existing = await _legacy_plan(conn, run_id, segments)
+    legacy_s = time.perf_counter() - started
+    started = time.perf_counter()
+    indexed_existing = await _indexed_plan(conn, run_id, segments)
+    indexed_s = time.perf_counter() - started
+    assert legacy_existing == indexed_existing == 0
+    await conn.close()
+    return len(segments), legacy_s, indexed_s, planning_s
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--max-messages", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        build_database(path, args.rows)
+        segments, legacy_s, indexed_s, planning_s = asyncio.run(_time(path, args.max_messages))
+        print(f"planning {segments} segments over {args.rows} messages:")
+        print(f"  lookups, per-segment queries   {legacy_s * 1000:10.1f} ms")
+        print(f"  lookups, segment index         {indexed_s * 1000:10.1f} ms")
+        print(f"  compile_run planning, no-op    {planning_s * 1000:10.1f} ms  (stream, segment, index)")
+
+
+if __name__ == "__main__":
+    main()
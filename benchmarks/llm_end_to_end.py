@@ -0,0 +1,197 @@
+"""Benchmark: `compile_run` and `!gpt` replies end to end against the local Responses stand-in.
+
+    poetry run python -m benchmarks.llm_end_to_end --conversations 200 --chats 100 --latency-ms 400 --error-rate 0.02
+
+Both paths go through the real `get_client()`, pointed at `klatrebot_v2.llm.fake_server`
+with OPENAI_BASE_URL, so HTTP, JSON parsing, streaming, retries and SQLite writes are all
+measured; only the model is fake.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from klatrebot_v2.db import connection, llm_calls as llm_calls_db, migrations
+from klatrebot_v2.llm import chat, telemetry
+from klatrebot_v2.llm.fake_server import FakeConfig, FakeResponsesServer
+from klatrebot_v2.memory.compiler import CompilerConfig, compile_run
+from klatrebot_v2.time_utils import to_epoch_ms
+
+
+_BASE = datetime(2026, 1, 1, tzinfo=timezone.utc)
+_CHANNEL_ID = 1
+_USERS = ((1, "Nicklas"), (2, "Tobi"), (3, "Kjuge"), (4, "Pelle"))
+_RUN_NAME = "bench"
+
+
+def build_database(path: Path, conversations: int) -> None:
+    """`conversations` chats of 12 messages between all users, two hours apart."""
+    asyncio.run(_migrate(path))
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO users (discord_user_id, display_name) VALUES (?, ?)", _USERS)
+    rng = random.Random(1)
+    rows = []
+    message_id = 0
+    for n in range(conversations):
+        ts = _BASE + timedelta(hours=2 * n)
+        for _ in range(12):
+            message_id += 1
+            ts += timedelta(seconds=rng.randint(10, 120))
+            content = f"samtale {n}: skal vi klatre i Vanløse eller Sydhavn på torsdag? besked {message_id}"
+            rows.append((message_id, _CHANNEL_ID, rng.choice(_USERS)[0], content, ts.isoformat(), to_epoch_ms(ts), 0))
+    conn.executemany(
+        """
+        INSERT INTO messages
+            (discord_message_id, channel_id, user_id, content, timestamp_utc, timestamp_ms, is_bot)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        rows,
+    )
+    conn.commit()
+    conn.close()
+
+
+async def _migrate(path: Path) -> None:
+    conn = await connection.open(str(path))
+    await migrations.run(conn)
+    await conn.close()
+
+
+async def _compile(path: Path, args) -> tuple[float, list[str], list[tuple]]:
+    lines: list[str] = []
+    conn = await connection.open(str(path))
+    try:
+        since = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        await compile_run(
+            conn,
+            config=CompilerConfig(
+                name=_RUN_NAME,
+                compiler_model="stand-in",
+                concurrency=args.concurrency,
+                max_concurrency=args.max_concurrency,
+                pack_token_budget=args.pack_tokens,
+            ),
+            progress=lines.append,
+        )
+        elapsed = time.perf_counter() - started
+        # compile_run records its own calls in llm_calls.
+        return elapsed, lines, await llm_calls_db.calls_since(conn, since)
+    finally:
+        await conn.close()
+
+
+async def _chats(path: Path, args) -> tuple[float, list[float], int]:
+    db = await connection.open_database(str(path))
+    chat.set_db_conn_provider(lambda: db)
+    gate = asyncio.Semaphore(args.chat_concurrency)
+    latencies: list[float] = []
+    errors = 0
+
+    async def on_text_delta(delta: str) -> None:
+        pass
+
+    async def one(n: int) -> None:
+        nonlocal errors
+        async with gate:
+            started = time.perf_counter()
+            try:
+                await chat.reply(
+                    question=f"hvornår klatrede vi sidst i Vanløse? ({n})",
+                    asking_user_id=_USERS[n % len(_USERS)][0],
+                    channel_id=_CHANNEL_ID,
+                    on_text_delta=on_text_delta if args.stream else None,
+                )
+            except Exception:
+                errors += 1
+                return
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(n) for n in range(args.chats)))
+        return time.perf_counter() - started, latencies, errors
+    finally:
+        await db.close()
+
+
+async def _time(path: Path, args) -> None:
+    config = FakeConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        tool_rounds=args.tool_rounds,
+        seed=1,
+    )
+    async with FakeResponsesServer(config) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        compile_s, lines, compile_calls = await _compile(path, args)
+        chat_calls = telemetry.CallBuffer()
+        with telemetry.recording_to(chat_calls):
+            chat_s, latencies, chat_errors = await _chats(path, args)
+
+    compile_errors = sum(row[8] != "ok" for row in compile_calls)
+    compile_latency = [row[3] for row in compile_calls]
+    print(f"compile_run: {compile_s:.2f} s, {len(compile_calls)} LLM calls ({compile_errors} errors)")
+    print(
+        f"  call latency p50 {telemetry.percentile(compile_latency, 50):8.1f} ms"
+        f"   p95 {telemetry.percentile(compile_latency, 95):8.1f} ms"
+    )
+    for line in lines:
+        if line.startswith(("Segments:", "Summarized", "LLM calls:", "Completed")):
+            print(f"  {line}")
+    print(
+        f"!gpt: {args.chats} replies in {chat_s:.2f} s ({args.chats / chat_s:.1f}/s), "
+        f"{len(chat_calls.calls)} LLM calls, {chat_errors} failed replies"
+    )
+    print(
+        f"  reply latency p50 {telemetry.percentile(latencies, 50):8.1f} ms"
+        f"   p95 {telemetry.percentile(latencies, 95):8.1f} ms"
+    )
+    print(
+        f"stand-in: {server.stats.requests} requests, {server.stats.errors} injected errors, "
+        f"{server.stats.function_calls} function calls, {server.stats.streamed} streamed"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--chats", type=int, default=100)
+    parser.add_argument("--chat-concurrency", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--pack-tokens", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=100.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=429)
+    parser.add_argument("--tool-rounds", type=int, default=1)
+    parser.add_argument("--stream", action="store_true", help="Stream !gpt replies like the chat cog does")
+    args = parser.parse_args()
+
+    # Settings and the client singleton are built on first use, after these are in place.
+    os.environ.setdefault("DISCORD_KEY", "bench")
+    os.environ.setdefault("OPENAI_KEY", "bench")
+    os.environ.setdefault("DISCORD_MAIN_CHANNEL_ID", str(_CHANNEL_ID))
+    os.environ.setdefault("DISCORD_SANDBOX_CHANNEL_ID", "2")
+    os.environ.setdefault("ADMIN_USER_ID", "1")
+    os.environ["MEMORY_ENABLED"] = "true"
+    os.environ["MEMORY_ACTIVE_RUN_NAME"] = _RUN_NAME
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        build_database(path, args.conversations)
+        asyncio.run(_time(path, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Benchmark: store.load_messages decoding throughput (rows/second).
+
+    poetry run python -m benchmarks.load_messages --rows 500000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+import aiosqlite
+
+from benchmarks.message_window import build_database
+from klatrebot_v2.memory.store import load_messages
+
+
+@dataclass(frozen=True)
+class _LegacyMessage:
+    discord_message_id: int
+    channel_id: int
+    user_id: int
+    user_display_name: str
+    content: str
+    timestamp_utc: datetime
+    is_bot: bool = False
+
+
+async def _legacy_load(conn: aiosqlite.Connection) -> list[_LegacyMessage]:
+    """The pre-fast-path decoder: frozen dataclass plus fromisoformat per row."""
+    cursor = await conn.execute(
+        """
+        SELECT m.discord_message_id, m.channel_id, m.user_id,
+               COALESCE(u.display_name, '?'), m.content, m.timestamp_utc, m.is_bot
+        FROM messages m
+        LEFT JOIN users u ON u.discord_user_id = m.user_id
+        ORDER BY m.channel_id, m.timestamp_ms, m.discord_message_id
+        """
+    )
+    rows = await cursor.fetchall()
+    return [
+        _LegacyMessage(
+            discord_message_id=r[0],
+            channel_id=r[1],
+            user_id=r[2],
+            user_display_name=r[3],
+            content=r[4],
+            timestamp_utc=datetime.fromisoformat(r[5]),
+            is_bot=bool(r[6]),
+        )
+        for r in rows
+    ]
+
+
+async def _time(path: Path) -> tuple[float, float, int]:
+    conn = await aiosqlite.connect(str(path))
+    await _legacy_load(conn)  # warm the page cache
+    started = time.perf_counter()
+    legacy = await _legacy_load(conn)
+    legacy_s = time.perf_counter() - started
+    started = time.perf_counter()
+    fast = await load_messages(conn)
+    fast_s = time.perf_counter() - started
+    await conn.close()
+    assert len(legacy) == len(fast)
+    return legacy_s, fast_s, len(fast)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        build_database(path, args.rows)
+        legacy_s, fast_s, rows = asyncio.run(_time(path))
+        print(f"load_messages over {rows} rows:")
+        print(f"  dataclass + fromisoformat  {rows / legacy_s:12,.0f} rows/s  ({legacy_s:.2f}s)")
+        print(f"  slotted MessageRow         {rows / fast_s:12,.0f} rows/s  ({fast_s:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
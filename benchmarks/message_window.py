@@ -0,0 +1,137 @@
+"""Benchmark: message window queries on ISO text vs. epoch-ms columns.
+
+    poetry run python -m benchmarks.message_window --rows 2000000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from klatrebot_v2.db import connection, messages as msg_db, migrations
+from klatrebot_v2.time_utils import to_epoch_ms
+
+
+_BASE = datetime(2020, 1, 1, tzinfo=timezone.utc)
+_CHANNELS = (1, 2, 3)
+
+
+def build_database(path: Path, rows: int) -> None:
+    conn = sqlite3.connect(path)
+    asyncio.run(_migrate(path))
+    conn.execute("INSERT INTO users (discord_user_id, display_name) VALUES (1, 'bench')")
+    rng = random.Random(1)
+    ts = _BASE
+    batch = []
+    for message_id in range(1, rows + 1):
+        ts += timedelta(seconds=rng.randint(1, 40))
+        batch.append(
+            (message_id, rng.choice(_CHANNELS), 1, f"besked {message_id}", ts.isoformat(), to_epoch_ms(ts), 0)
+        )
+        if len(batch) == 50_000:
+            _insert(conn, batch)
+            batch = []
+    _insert(conn, batch)
+    # The pre-migration index, so the ISO query gets a fair plan.
+    conn.execute("CREATE INDEX bench_messages_channel_iso ON messages(channel_id, timestamp_utc)")
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+
+def _insert(conn: sqlite3.Connection, batch: list[tuple]) -> None:
+    conn.executemany(
+        """
+        INSERT INTO messages
+            (discord_message_id, channel_id, user_id, content, timestamp_utc, timestamp_ms, is_bot)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        batch,
+    )
+    conn.commit()
+
+
+async def _migrate(path: Path) -> None:
+    conn = await connection.open(str(path))
+    await migrations.run(conn)
+    await conn.close()
+
+
+def _windows(path: Path, count: int, hours: int) -> list[tuple[int, datetime, datetime]]:
+    conn = sqlite3.connect(path)
+    first, last = conn.execute("SELECT MIN(timestamp_ms), MAX(timestamp_ms) FROM messages").fetchone()
+    conn.close()
+    rng = random.Random(2)
+    span = timedelta(hours=hours)
+    out = []
+    for _ in range(count):
+        start_ms = rng.randint(first, last - int(span.total_seconds() * 1000))
+        start = _BASE + timedelta(milliseconds=start_ms - to_epoch_ms(_BASE))
+        out.append((rng.choice(_CHANNELS), start, start + span))
+    return out
+
+
+def time_sql(path: Path, windows, *, iso: bool) -> tuple[float, int]:
+    conn = sqlite3.connect(path)
+    column = "timestamp_utc" if iso else "timestamp_ms"
+    sql = f"""
+        SELECT m.discord_message_id, m.channel_id, m.user_id,
+               COALESCE(u.display_name, '?'), m.content, m.timestamp_utc, m.is_bot
+        FROM messages m
+        LEFT JOIN users u ON u.discord_user_id = m.user_id
+        WHERE m.channel_id = ? AND m.{column} >= ? AND m.{column} < ?
+        ORDER BY m.{column} ASC
+    """
+    timings = []
+    rows = 0
+    for channel_id, start, end in windows:
+        params = (channel_id, start.isoformat(), end.isoformat()) if iso else (channel_id, to_epoch_ms(start), to_epoch_ms(end))
+        started = time.perf_counter()
+        rows += len(conn.execute(sql, params).fetchall())
+        timings.append(time.perf_counter() - started)
+    conn.close()
+    return statistics.median(timings) * 1000, rows
+
+
+async def time_in_window(path: Path, windows) -> float:
+    conn = await connection.open(str(path))
+    timings = []
+    for channel_id, start, end in windows:
+        started = time.perf_counter()
+        await msg_db.in_window(conn, channel_id=channel_id, start=start, end=end)
+        timings.append(time.perf_counter() - started)
+    await conn.close()
+    return statistics.median(timings) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--hours", type=int, default=24)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        started = time.perf_counter()
+        build_database(path, args.rows)
+        print(f"built {args.rows} rows in {time.perf_counter() - started:.1f}s")
+        windows = _windows(path, args.queries, args.hours)
+        iso_ms, iso_rows = time_sql(path, windows, iso=True)
+        epoch_ms, epoch_rows = time_sql(path, windows, iso=False)
+        assert iso_rows == epoch_rows
+        helper_ms = asyncio.run(time_in_window(path, windows))
+        print(f"{args.hours}h window, {iso_rows / len(windows):.0f} rows/query, median of {len(windows)}:")
+        print(f"  iso text range   {iso_ms:8.2f} ms")
+        print(f"  epoch-ms range   {epoch_ms:8.2f} ms")
+        print(f"  in_window()      {helper_ms:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Benchmark: related-memory attachment, per-item queries vs. one batched query.
+
+    poetry run python -m benchmarks.related_memories --items 50000 --results 10
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import aiosqlite
+
+from klatrebot_v2.db import connection, migrations
+from klatrebot_v2.memory.retrieval import MemoryResult, _attach_related_memories, _rank_related
+from klatrebot_v2.time_utils import to_epoch_ms
+
+
+_BASE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+_TYPES = ("decision", "plan", "preference", "fact", "opinion", "open_question", "lore")
+
+
+async def build_database(path: Path, items: int, tags: int) -> None:
+    conn = await connection.open(str(path))
+    await migrations.run(conn)
+    await conn.execute(
+        "INSERT INTO memory_compiler_runs (id, name, status, prompt_version, compiler_model) "
+        "VALUES (1, 'bench', 'completed', 'bench', 'bench')"
+    )
+    await conn.execute(
+        """
+        INSERT INTO conversation_segments
+            (id, compiler_run_id, channel_id, start_time_utc, end_time_utc, message_count,
+             human_message_count, total_chars, status)
+        VALUES (1, 1, 1, ?, ?, 0, 0, 0, 'summarized')
+        """,
+        (_BASE.isoformat(), _BASE.isoformat()),
+    )
+    rng = random.Random(1)
+    item_rows, tag_rows = [], []
+    for item_id in range(1, items + 1):
+        created = _BASE + timedelta(minutes=rng.randint(0, 2 * 365 * 24 * 60))
+        item_rows.append(
+            (item_id, rng.choice(_TYPES), f"emne {item_id}", f"minde {item_id}", created.isoformat(), to_epoch_ms(created))
+        )
+        tag_rows.extend((item_id, f"tag{tag}") for tag in rng.sample(range(tags), 3))
+    await conn.executemany(
+        """
+        INSERT INTO memory_items
+            (id, compiler_run_id, segment_id, type, subject, text, confidence, importance,
+             created_at_source, created_at_source_ms)
+        VALUES (?, 1, 1, ?, ?, ?, 'medium', 'normal', ?, ?)
+        """,
+        item_rows,
+    )
+    await conn.executemany("INSERT INTO memory_item_tags (memory_item_id, tag) VALUES (?, ?)", tag_rows)
+    await conn.execute("ANALYZE")
+    await conn.commit()
+    await conn.close()
+
+
+async def _legacy_attach(conn: aiosqlite.Connection, *, run_id: int, items: list[MemoryResult]) -> None:
+    """The previous shape: a tag query plus a candidate query per item."""
+    for item in items:
+        item_id = int(item.source_handle.partition(":")[2])
+        item_tags = {
+            str(row[0])
+            for row in await conn.execute_fetchall(
+                "SELECT tag FROM memory_item_tags WHERE memory_item_id = ?", (item_id,)
+            )
+        }
+        if not item_tags:
+            continue
+        start = item.created_at_source - timedelta(days=14)
+        end = item.created_at_source + timedelta(days=14)
+        rows = await conn.execute_fetchall(
+            f"""
+            SELECT mi.id, mi.type, mi.subject, mi.text, mi.segment_id, mi.created_at_source,
+                   group_concat(mit.tag)
+            FROM memory_items mi
+            JOIN memory_item_tags mit ON mit.memory_item_id = mi.id
+            WHERE mi.compiler_run_id = ?
+              AND mi.id != ?
+              AND mi.created_at_source_ms >= ?
+              AND mi.created_at_source_ms <= ?
+              AND mit.tag IN ({",".join("?" for _ in item_tags)})
+            GROUP BY mi.id
+            """,
+            (run_id, item_id, to_epoch_ms(start), to_epoch_ms(end), *item_tags),
+        )
+        candidates = [
+            {
+                "id": row[0],
+                "type": row[1],
+                "subject": row[2],
+                "text": row[3],
+                "segment_id": row[4],
+                "created_at_source": datetime.fromisoformat(row[5]) if row[5] else None,
+                "tags": set(str(row[6] or "").split(",")) if row[6] else set(),
+            }
+            for row in rows
+        ]
+        item.related_memories = _rank_related(item, item_tags, candidates, 5)
+
+
+async def _results(conn: aiosqlite.Connection, rng: random.Random, items: int, count: int) -> list[MemoryResult]:
+    ids = rng.sample(range(1, items + 1), count)
+    rows = await conn.execute_fetchall(
+        f"SELECT id, type, created_at_source FROM memory_items WHERE id IN ({','.join('?' for _ in ids)})",
+        ids,
+    )
+    return [
+        MemoryResult(
+            kind="memory_item",
+            source_handle=f"mem:{row[0]}",
+            type=row[1],
+            segment_id=1,
+            created_at_source=datetime.fromisoformat(row[2]),
+        )
+        for row in rows
+    ]
+
+
+async def _time(path: Path, *, items: int, results: int, rounds: int) -> tuple[float, float]:
+    conn = await aiosqlite.connect(str(path))
+    rng = random.Random(2)
+    legacy, batched = [], []
+    for _ in range(rounds):
+        old = await _results(conn, rng, items, results)
+        new = [item.model_copy(deep=True) for item in old]
+        started = time.perf_counter()
+        await _legacy_attach(conn, run_id=1, items=old)
+        legacy.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        await _attach_related_memories(conn, run_id=1, items=new)
+        batched.append(time.perf_counter() - started)
+        assert [item.related_memories for item in old] == [item.related_memories for item in new]
+    await conn.close()
+    return statistics.median(legacy) * 1000, statistics.median(batched) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=50_000)
+    parser.add_argument("--tags", type=int, default=400)
+    parser.add_argument("--results", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=30)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        asyncio.run(build_database(path, args.items, args.tags))
+        legacy_ms, batched_ms = asyncio.run(
+            _time(path, items=args.items, results=args.results, rounds=args.rounds)
+        )
+        print(f"related memories for a {args.results}-item recall over {args.items} items, median of {args.rounds}:")
+        print(f"  per-item queries   {legacy_ms:8.2f} ms")
+        print(f"  batched query      {batched_ms:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
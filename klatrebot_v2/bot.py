@@ -7,6 +7,12 @@ import discord
 from discord.ext import commands
 
 from klatrebot_v2.db import connection, migrations, user_aliases
+from klatrebot_v2.db.ingest import IngestWriter
+from klatrebot_v2.db.recent_buffer import RecentMessageBuffer
+from klatrebot_v2.db.user_cache import UserCache
+from klatrebot_v2.llm import telemetry
+from klatrebot_v2.memory.recall_cache import RecallCache, set_recall_cache
+from klatrebot_v2.memory.rolling import RollingCompiler
 from klatrebot_v2.settings import get_settings
 
 
@@ -17,7 +23,14 @@ class KlatreBot(commands.Bot):
     def __init__(self) -> None:
         intents = discord.Intents.all()
         super().__init__(intents=intents, command_prefix="!")
+        self.db: connection.Database | None = None
         self.db_conn = None
+        self.ingest_conn = None
+        self.ingest: IngestWriter | None = None
+        self.user_cache = UserCache()
+        self.recent_messages = RecentMessageBuffer(get_settings().recent_buffer_size)
+        self.recall_cache: RecallCache | None = None
+        self.rolling: RollingCompiler | None = None
         self.start_time: datetime | None = None
 
     async def setup_hook(self) -> None:
@@ -25,11 +38,36 @@ class KlatreBot(commands.Bot):
         # Fail loudly if SOUL.MD is missing
         Path(s.soul_path).read_text(encoding="utf-8")
         # Open DB and run migrations
-        self.db_conn = await connection.open(s.db_path)
+        self.db = await connection.open_database(s.db_path, readers=s.db_reader_pool_size)
+        self.db_conn = self.db.writer
         await migrations.run(self.db_conn)
         await user_aliases.sync_config_aliases(self.db_conn, s.user_aliases_config_path)
+        await self.user_cache.warm(self.db_conn)
+        for channel_id in {s.discord_main_channel_id, s.discord_sandbox_channel_id}:
+            await self.recent_messages.warm(self.db, channel_id)
+        if s.memory_rolling_enabled and s.memory_rolling_in_bot:
+            self.rolling = RollingCompiler(s.db_path, settings=s)
+        # Ingest commits on its own connection: a failed flush rolls back only its own rows,
+        # never another coroutine's open transaction on the shared writer.
+        self.ingest_conn = self.db_conn if s.db_path == ":memory:" else await connection.open(s.db_path)
+        self.ingest = IngestWriter(
+            self.ingest_conn,
+            flush_interval_ms=s.ingest_flush_interval_ms,
+            max_rows=s.ingest_flush_max_rows,
+            user_cache=self.user_cache,
+            recent_buffer=self.recent_messages,
+            on_message=self.rolling.note_message if self.rolling is not None else None,
+        )
+        self.ingest.start()
+        ingest = self.ingest
+        telemetry.set_default_sink(lambda call: ingest.enqueue_llm_call(telemetry.call_row(call)))
+        if self.rolling is not None:
+            self.rolling.start()
+        self.recall_cache = RecallCache(s.memory_recall_cache_size, s.memory_recall_cache_ttl_seconds)
+        set_recall_cache(self.db, self.recall_cache)
         from klatrebot_v2.llm import chat as llm_chat
-        llm_chat.set_db_conn_provider(lambda: self.db_conn)
+        llm_chat.set_db_conn_provider(lambda: self.db)
+        llm_chat.set_recent_buffer(self.recent_messages)
         # Register cogs
         await self.load_extension("klatrebot_v2.cogs.chat")
         await self.load_extension("klatrebot_v2.cogs.auto_responses")
@@ -45,8 +83,58 @@ class KlatreBot(commands.Bot):
         logger.info("Bot connected to Discord as %s", self.user)
 
     async def close(self) -> None:
-        if self.db_conn is not None:
-            await connection.close(self.db_conn)
+        if self.rolling is not None:
+            await self.rolling.close()
+            logger.info(
+                "memory_rolling.closed compiles=%d failures=%d locked=%d max_duration=%.0fms",
+                self.rolling.stats.compiles,
+                self.rolling.stats.failures,
+                self.rolling.stats.locked,
+                self.rolling.stats.max_duration_ms,
+            )
+        if self.ingest is not None:
+            telemetry.set_default_sink(None)
+            await self.ingest.close()
+            logger.info(
+                "ingest.closed flushes=%d messages=%d avg_flush=%.1fms max_flush=%.1fms max_queue_depth=%d",
+                self.ingest.stats.flushes,
+                self.ingest.stats.messages_written,
+                self.ingest.stats.avg_flush_ms,
+                self.ingest.stats.max_flush_ms,
+                self.ingest.stats.max_queue_depth,
+            )
+        if self.ingest_conn is not None and self.ingest_conn is not self.db_conn:
+            await connection.close(self.ingest_conn)
+        logger.info(
+            "user_cache.closed users=%d writes=%d skipped_writes=%d",
+            len(self.user_cache),
+            self.user_cache.stats.writes,
+            self.user_cache.stats.skipped_writes,
+        )
+        logger.info(
+            "recent_messages.closed hits=%d misses=%d",
+            self.recent_messages.stats.hits,
+            self.recent_messages.stats.misses,
+        )
+        if self.recall_cache is not None:
+            logger.info(
+                "recall_cache.closed entries=%d hits=%d misses=%d hit_rate=%.2f invalidations=%d",
+                len(self.recall_cache),
+                self.recall_cache.stats.hits,
+                self.recall_cache.stats.misses,
+                self.recall_cache.stats.hit_rate,
+                self.recall_cache.stats.invalidations,
+            )
+        if self.db is not None:
+            logger.info(
+                "db.pool_closed readers=%d acquisitions=%d waits=%d avg_wait=%.1fms max_wait=%.1fms",
+                self.db.reader_count,
+                self.db.stats.acquisitions,
+                self.db.stats.waits,
+                self.db.stats.avg_wait_ms,
+                self.db.stats.max_wait_ms,
+            )
+            await self.db.close()
         await super().close()
 
     async def on_command_error(self, ctx: commands.Context, error: Exception) -> None:
@@ -6,7 +6,7 @@ import discord
 import pytz
 from discord.ext import commands
 
-from klatrebot_v2.db import attendance as att_db, users as users_db
+from klatrebot_v2.db import attendance as att_db
 from klatrebot_v2.settings import get_settings
 from klatrebot_v2.tasks import (
     DEFAULT_KLATRETID_DESCRIPTION,
@@ -59,7 +59,7 @@ class AttendanceCog(commands.Cog):
         if payload.user_id == (self.bot.user.id if self.bot.user else 0):
             return
         sess = await att_db.active_session(
-            self.bot.db_conn, channel_id=payload.channel_id, today_local=_today_local_str()
+            self.bot.db, channel_id=payload.channel_id, today_local=_today_local_str()
         )
         if sess is None or sess.message_id != payload.message_id:
             return
@@ -71,7 +71,7 @@ class AttendanceCog(commands.Cog):
         else:
             return
 
-        existing = await users_db.get(self.bot.db_conn, payload.user_id)
+        existing = await self.bot.user_cache.get(self.bot.db_conn, payload.user_id)
         # Prefer guild.get_member: cached Member with current server nickname.
         # payload.member is also Member but its .nick can be stale/missing across raw events.
         member = None
@@ -90,11 +90,11 @@ class AttendanceCog(commands.Cog):
             display_name = _resolve_display_name(user_obj)
         if not display_name:
             display_name = existing.display_name if existing is not None else str(payload.user_id)
-        await users_db.upsert(
+        await self.bot.user_cache.upsert(
             self.bot.db_conn, discord_user_id=payload.user_id, display_name=display_name
         )
         await att_db.record_event(
-            self.bot.db_conn,
+            self.bot.db,
             session_id=sess.id,
             user_id=payload.user_id,
             status=status,
@@ -111,8 +111,8 @@ class AttendanceCog(commands.Cog):
         except discord.HTTPException:
             logger.exception("klatretid: fetch_message failed for %d", sess.message_id)
             return
-        yes, no = await att_db.tally(self.bot.db_conn, session_id=sess.id)
-        bailers = await att_db.bailers(self.bot.db_conn, session_id=sess.id)
+        yes, no = await att_db.tally(self.bot.db, session_id=sess.id)
+        bailers = await att_db.bailers(self.bot.db, session_id=sess.id)
         bailer_ids = {u.discord_user_id for u in bailers}
         location = _location_for_session_date(sess.date_local)
         if not yes and not no:
@@ -140,13 +140,13 @@ class AttendanceCog(commands.Cog):
     @commands.command(name="klatring")
     async def klatring(self, ctx: commands.Context) -> None:
         sess = await att_db.active_session(
-            self.bot.db_conn, channel_id=ctx.channel.id, today_local=_today_local_str()
+            self.bot.db, channel_id=ctx.channel.id, today_local=_today_local_str()
         )
         if sess is None:
             await ctx.reply("Ingen klatretid lige nu.")
             return
-        yes, no = await att_db.tally(self.bot.db_conn, session_id=sess.id)
-        bailers = await att_db.bailers(self.bot.db_conn, session_id=sess.id)
+        yes, no = await att_db.tally(self.bot.db, session_id=sess.id)
+        bailers = await att_db.bailers(self.bot.db, session_id=sess.id)
         bailer_ids = {u.discord_user_id for u in bailers}
         yes_names = ", ".join(
             (f"{u.display_name} 🐔" if u.discord_user_id in bailer_ids else u.display_name) for u in yes
@@ -166,7 +166,7 @@ class AttendanceCog(commands.Cog):
         tz = pytz.timezone(s.timezone)
         now_local = datetime.now(timezone.utc).astimezone(tz)
         existing = await att_db.active_session(
-            self.bot.db_conn, channel_id=ctx.channel.id, today_local=now_local.strftime("%Y-%m-%d")
+            self.bot.db, channel_id=ctx.channel.id, today_local=now_local.strftime("%Y-%m-%d")
         )
         if existing is not None:
             await ctx.reply("Der er allerede en klatretid-session i denne kanal i dag.")
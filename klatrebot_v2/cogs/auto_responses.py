@@ -11,8 +11,6 @@ from typing import Awaitable, Callable
 import discord
 from discord.ext import commands
 
-from klatrebot_v2.db import messages as msg_db, users as users_db
-
 
 logger = logging.getLogger(__name__)
 
@@ -164,16 +162,11 @@ class AutoResponsesCog(commands.Cog):
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message) -> None:
-        await users_db.upsert(
-            self.bot.db_conn,
-            discord_user_id=message.author.id,
-            display_name=_display_name(message.author),
-        )
-        await msg_db.insert(
-            self.bot.db_conn,
+        self.bot.ingest.enqueue_message(
             discord_message_id=message.id,
             channel_id=message.channel.id,
             user_id=message.author.id,
+            display_name=_display_name(message.author),
             content=message.content,
             timestamp_utc=message.created_at.replace(tzinfo=timezone.utc) if message.created_at.tzinfo is None else message.created_at,
             is_bot=message.author.bot,
@@ -1,4 +1,6 @@
 """!gpt command. Thin adapter over llm.chat.reply."""
+import asyncio
+import contextlib
 import logging
 import time
 
@@ -6,10 +8,109 @@ import discord
 from discord.ext import commands
 
 from klatrebot_v2.llm import chat, ratelimit
+from klatrebot_v2.settings import get_settings
 
 
 logger = logging.getLogger(__name__)
 
+_DISCORD_MAX_CHARS = 2000
+_STREAM_CURSOR = " …"
+_ERROR_TEXT = "Der gik noget galt med svaret. Prøv igen."
+_ALLOWED_MENTIONS = discord.AllowedMentions(users=True, everyone=False, roles=False, replied_user=True)
+
+
+class _StreamingReply:
+    """Posts the answer on its first visible token, then edits it at most once per interval.
+
+    Discord calls run in a background task that always sends the newest text,
+    so a slow edit never holds up the stream it is previewing.
+    """
+
+    def __init__(self, ctx: commands.Context, *, edit_interval_s: float, started: float) -> None:
+        self.ctx = ctx
+        self.edit_interval_s = edit_interval_s
+        self.started = started
+        self.text = ""
+        self.message: discord.Message | None = None
+        self.first_token_s: float | None = None
+        self.edits = 0
+        self._changed = asyncio.Event()
+        self._closed = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def on_text_delta(self, delta: str) -> None:
+        self.text += delta
+        if not self.text.strip():
+            return
+        if self.first_token_s is None:
+            self.first_token_s = time.monotonic() - self.started
+        self._changed.set()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def on_round_start(self) -> None:
+        # Text streamed before a tool call is not part of the answer the next round writes.
+        self.text = ""
+
+    async def close(self) -> None:
+        """Stop previewing; an edit already in flight finishes first."""
+        self._closed.set()
+        self._changed.set()
+        task, self._task = self._task, None
+        if task is None:
+            return
+        try:
+            await task
+        except Exception:
+            logger.exception("llm.reply stream_preview_failed")
+
+    async def _run(self) -> None:
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            # The first token is always posted; later previews stop once the answer is in.
+            if self.message is None:
+                self.message = await self.ctx.reply(
+                    self._preview(), suppress_embeds=True, allowed_mentions=_ALLOWED_MENTIONS
+                )
+            elif self._closed.is_set():
+                return
+            else:
+                await self.message.edit(content=self._preview())
+                self.edits += 1
+            # Deltas arriving meanwhile collapse into the next edit.
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._closed.wait(), self.edit_interval_s)
+            if self._closed.is_set():
+                return
+
+    def _preview(self) -> str:
+        return self.text[: _DISCORD_MAX_CHARS - len(_STREAM_CURSOR)] + _STREAM_CURSOR
+
+
+def _split(text: str) -> list[str]:
+    """Discord-sized pieces of `text`, broken at the last newline that fits where there is one."""
+    chunks = []
+    while len(text) > _DISCORD_MAX_CHARS:
+        cut = text.rfind("\n", 0, _DISCORD_MAX_CHARS + 1)
+        if cut <= 0:
+            cut = _DISCORD_MAX_CHARS
+        chunks.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    chunks.append(text)
+    return chunks
+
+
+async def _deliver(ctx: commands.Context, stream: _StreamingReply | None, text: str) -> None:
+    """Put `text` in the streamed message, or a new reply, continuing in follow-ups past Discord's limit."""
+    first, *rest = _split(text)
+    if stream is not None and stream.message is not None:
+        await stream.message.edit(content=first)
+    else:
+        await ctx.reply(first, suppress_embeds=True, allowed_mentions=_ALLOWED_MENTIONS)
+    for chunk in rest:
+        await ctx.send(chunk, suppress_embeds=True, allowed_mentions=_ALLOWED_MENTIONS)
+
 
 class ChatCog(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
@@ -21,17 +122,50 @@ class ChatCog(commands.Cog):
             logger.info("ratelimit.blocked user_id=%d", ctx.author.id)
             await ctx.reply("Nu slapper du fandme lige lidt af med de spørgsmål")
             return
+        s = get_settings()
         start = time.monotonic()
-        async with ctx.typing():
-            mentions = {u.id: u.display_name for u in ctx.message.mentions}
-            result = await chat.reply(
-                question=question,
-                asking_user_id=ctx.author.id,
-                channel_id=ctx.channel.id,
-                mentions=mentions,
-            )
+        stream = (
+            _StreamingReply(ctx, edit_interval_s=s.gpt_stream_edit_interval_ms / 1000, started=start)
+            if s.gpt_streaming_enabled
+            else None
+        )
+        try:
+            async with ctx.typing():
+                mentions = {u.id: u.display_name for u in ctx.message.mentions}
+                result = await chat.reply(
+                    question=question,
+                    asking_user_id=ctx.author.id,
+                    channel_id=ctx.channel.id,
+                    mentions=mentions,
+                    on_text_delta=stream.on_text_delta if stream is not None else None,
+                    on_round_start=stream.on_round_start if stream is not None else None,
+                )
+        except Exception:
+            # Handled here rather than in on_command_error, so a half-streamed answer
+            # loses its cursor and the user gets exactly one error notice.
+            logger.exception("llm.reply failed user_id=%d", ctx.author.id)
+            partial = ""
+            if stream is not None:
+                await stream.close()
+                if stream.message is not None:
+                    partial = stream.text.rstrip()
+            try:
+                await _deliver(ctx, stream, f"{partial}\n\n{_ERROR_TEXT}" if partial else _ERROR_TEXT)
+            except Exception:
+                logger.exception("llm.reply error_notice_failed user_id=%d", ctx.author.id)
+            return
+        finally:
+            if stream is not None:
+                await stream.close()
         elapsed = time.monotonic() - start
-        logger.info("llm.reply duration=%.2fs", elapsed)
+        first_token = stream.first_token_s if stream is not None and stream.first_token_s is not None else elapsed
+        logger.info(
+            "llm.reply duration=%.2fs ttft=%.2fs streamed=%s edits=%d",
+            elapsed,
+            first_token,
+            stream is not None and stream.message is not None,
+            stream.edits if stream is not None else 0,
+        )
 
         text = result.text
         if result.sources:
@@ -39,13 +173,7 @@ class ChatCog(commands.Cog):
         if not text.strip():
             logger.warning("llm.reply empty text user_id=%d", ctx.author.id)
             text = "Jeg kunne ikke finde på et svar. Prøv igen."
-        await ctx.reply(
-            text,
-            suppress_embeds=True,
-            allowed_mentions=discord.AllowedMentions(
-                users=True, everyone=False, roles=False, replied_user=True
-            ),
-        )
+        await _deliver(ctx, stream, text)
 
 
 async def setup(bot: commands.Bot) -> None:
@@ -27,12 +27,14 @@ class RefereatCog(commands.Cog):
 
         try:
             async with ctx.typing():
-                msgs = await msg_db.in_window(
-                    self.bot.db_conn,
-                    channel_id=ctx.channel.id,
-                    start=window_start,
-                    end=now_utc,
-                )
+                msgs = self.bot.recent_messages.window(ctx.channel.id, window_start, now_utc)
+                if msgs is None:
+                    msgs = await msg_db.in_window(
+                        self.bot.db,
+                        channel_id=ctx.channel.id,
+                        start=window_start,
+                        end=now_utc,
+                    )
                 if not msgs:
                     await ctx.reply("Ingen beskeder at opsummere brormand.")
                     return
@@ -1,9 +1,23 @@
-"""Shared aiosqlite connection. Opened once in bot.setup_hook, closed on shutdown."""
+"""SQLite connections: one writer plus a pool of read-only readers. Opened in bot.setup_hook."""
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Union
+
 import aiosqlite
 
 
+# How long a writer waits for another connection's write transaction before "database is locked".
+BUSY_TIMEOUT_MS = 30_000
+
+
 async def open(db_path: str) -> aiosqlite.Connection:
     conn = await aiosqlite.connect(db_path)
+    await conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
     await conn.execute("PRAGMA journal_mode=WAL")
     await conn.execute("PRAGMA synchronous=NORMAL")
     await conn.execute("PRAGMA foreign_keys=ON")
@@ -11,5 +25,97 @@ async def open(db_path: str) -> aiosqlite.Connection:
     return conn
 
 
+async def open_reader(db_path: str) -> aiosqlite.Connection:
+    """A `mode=ro` connection; it waits out checkpoints and recovery like the writer does."""
+    conn = await aiosqlite.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+    await conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    return conn
+
+
 async def close(conn: aiosqlite.Connection) -> None:
     await conn.close()
+
+
+@dataclass
+class PoolStats:
+    acquisitions: int = 0
+    waits: int = 0
+    total_wait_ms: float = 0.0
+    max_wait_ms: float = 0.0
+
+    @property
+    def avg_wait_ms(self) -> float:
+        return self.total_wait_ms / self.acquisitions if self.acquisitions else 0.0
+
+
+class Database:
+    """One dedicated writer connection and a pool of `mode=ro` reader connections.
+
+    WAL lets readers run alongside the writer. Without readers (e.g. `:memory:`),
+    reads fall back to the writer connection.
+    """
+
+    def __init__(self, writer: aiosqlite.Connection, readers: list[aiosqlite.Connection] | None = None) -> None:
+        self.writer = writer
+        self._readers = list(readers or [])
+        self._idle: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+        for conn in self._readers:
+            self._idle.put_nowait(conn)
+        self.stats = PoolStats()
+
+    @property
+    def reader_count(self) -> int:
+        return len(self._readers)
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        if not self._readers:
+            self.stats.acquisitions += 1
+            yield self.writer
+            return
+        started = time.perf_counter()
+        if self._idle.empty():
+            self.stats.waits += 1
+        conn = await self._idle.get()
+        self._record_wait((time.perf_counter() - started) * 1000)
+        try:
+            yield conn
+        finally:
+            self._idle.put_nowait(conn)
+
+    async def close(self) -> None:
+        for conn in self._readers:
+            await conn.close()
+        self._readers = []
+        await self.writer.close()
+
+    def _record_wait(self, wait_ms: float) -> None:
+        self.stats.acquisitions += 1
+        self.stats.total_wait_ms += wait_ms
+        self.stats.max_wait_ms = max(self.stats.max_wait_ms, wait_ms)
+
+
+DbHandle = Union[aiosqlite.Connection, Database]
+
+
+async def open_database(db_path: str, *, readers: int = 3) -> Database:
+    writer = await open(db_path)
+    pool: list[aiosqlite.Connection] = []
+    if db_path != ":memory:":
+        for _ in range(max(readers, 0)):
+            pool.append(await open_reader(db_path))
+    return Database(writer, pool)
+
+
+@asynccontextmanager
+async def reader(db: DbHandle) -> AsyncIterator[aiosqlite.Connection]:
+    """Borrow a read connection; a bare connection is used as-is."""
+    if isinstance(db, Database):
+        async with db.reader() as conn:
+            yield conn
+    else:
+        yield db
+
+
+def writer(db: DbHandle) -> aiosqlite.Connection:
+    return db.writer if isinstance(db, Database) else db
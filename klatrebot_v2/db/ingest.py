@@ -0,0 +1,236 @@
+"""Write-behind ingestion of Discord messages with group commits."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+
+import aiosqlite
+
+from klatrebot_v2.db import llm_calls as llm_calls_db, messages as msg_db, users as users_db
+from klatrebot_v2.db.recent_buffer import RecentMessageBuffer
+from klatrebot_v2.db.rows import MessageRow
+from klatrebot_v2.db.user_cache import UserCache
+
+
+logger = logging.getLogger(__name__)
+
+_MAX_FLUSH_ATTEMPTS = 3
+_SLOW_FLUSH_MS = 500.0
+
+
+@dataclass
+class IngestStats:
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+    flushes: int = 0
+    failed_flushes: int = 0
+    dropped_rows: int = 0
+    messages_written: int = 0
+    users_written: int = 0
+    last_flush_ms: float = 0.0
+    max_flush_ms: float = 0.0
+    total_flush_ms: float = 0.0
+
+    @property
+    def avg_flush_ms(self) -> float:
+        return self.total_flush_ms / self.flushes if self.flushes else 0.0
+
+
+class IngestWriter:
+    """Buffers user, alias and message rows and writes them in one transaction.
+
+    A flush happens `flush_interval_ms` after the first buffered row, or as soon as
+    `max_rows` messages are waiting. `close()` flushes whatever is left. With a
+    `user_cache`, user and alias rows are only queued when the display name changed;
+    with a `recent_buffer`, every message is also appended there immediately.
+    `on_message(channel_id, timestamp_utc)` is called for every enqueued message.
+    `llm_calls` rows from `enqueue_llm_call` ride along with the next flush.
+    A failed flush rolls `conn` back, so nothing else should write on it.
+    """
+
+    def __init__(
+        self,
+        conn: aiosqlite.Connection,
+        *,
+        flush_interval_ms: int = 250,
+        max_rows: int = 200,
+        user_cache: UserCache | None = None,
+        recent_buffer: RecentMessageBuffer | None = None,
+        on_message: Callable[[int, datetime], None] | None = None,
+    ) -> None:
+        self._conn = conn
+        self._user_cache = user_cache
+        self._recent_buffer = recent_buffer
+        self._on_message = on_message
+        self._interval = max(flush_interval_ms, 0) / 1000
+        self._max_rows = max(max_rows, 1)
+        self._users: dict[int, str] = {}
+        self._messages: list[tuple] = []
+        self._llm_calls: list[tuple] = []
+        self._attempts = 0
+        self._has_rows = asyncio.Event()
+        self._full = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._closed = False
+        self.stats = IngestStats()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._messages)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def enqueue_message(
+        self,
+        *,
+        discord_message_id: int,
+        channel_id: int,
+        user_id: int,
+        display_name: str,
+        content: str,
+        timestamp_utc: datetime,
+        is_bot: bool = False,
+    ) -> None:
+        if self._closed:
+            raise RuntimeError("Ingest writer is closed")
+        cache = self._user_cache
+        if cache is None or cache.needs_write(user_id, display_name):
+            self._users[user_id] = display_name
+            if cache is not None:
+                cache.remember(user_id, display_name)
+        row = msg_db.message_row(
+            discord_message_id=discord_message_id,
+            channel_id=channel_id,
+            user_id=user_id,
+            content=content,
+            timestamp_utc=timestamp_utc,
+            is_bot=is_bot,
+        )
+        self._messages.append(row)
+        if self._recent_buffer is not None:
+            self._recent_buffer.append(
+                MessageRow(
+                    discord_message_id,
+                    channel_id,
+                    user_id,
+                    display_name,
+                    content,
+                    timestamp_utc,
+                    is_bot,
+                    timestamp_ms=row[5],
+                )
+            )
+        if self._on_message is not None:
+            self._on_message(channel_id, timestamp_utc)
+        self._note_depth()
+
+    def enqueue_llm_call(self, row: tuple) -> None:
+        """Queue an `llm_calls_db.call_row` tuple; it does not count towards `max_rows`."""
+        if self._closed:
+            raise RuntimeError("Ingest writer is closed")
+        self._llm_calls.append(row)
+        self._has_rows.set()
+
+    async def flush(self) -> int:
+        """Write every buffered row in one transaction. Returns the number of messages written."""
+        async with self._flush_lock:
+            users, messages, calls = self._users, self._messages, self._llm_calls
+            self._users, self._messages, self._llm_calls = {}, [], []
+            self._has_rows.clear()
+            self._full.clear()
+            if not users and not messages and not calls:
+                return 0
+            started = time.perf_counter()
+            try:
+                await users_db.upsert_many(self._conn, list(users.items()))
+                await msg_db.insert_many(self._conn, messages)
+                await llm_calls_db.insert_many(self._conn, calls)
+                await self._conn.commit()
+            except Exception:
+                await self._conn.rollback()
+                self.stats.failed_flushes += 1
+                self._attempts += 1
+                if self._attempts < _MAX_FLUSH_ATTEMPTS and not self._closed:
+                    self._requeue(users, messages, calls)
+                else:
+                    self.stats.dropped_rows += len(messages) + len(calls)
+                    if self._user_cache is not None:
+                        for user_id in users:
+                            self._user_cache.forget(user_id)
+                    self._attempts = 0
+                    logger.error("ingest.flush_dropped messages=%d llm_calls=%d", len(messages), len(calls))
+                raise
+            self._attempts = 0
+            duration_ms = (time.perf_counter() - started) * 1000
+            self._record_flush(len(users), len(messages), duration_ms)
+            return len(messages)
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self.queue_depth or self._users or self._llm_calls:
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("ingest.close_flush_failed")
+
+    async def _run(self) -> None:
+        while True:
+            await self._has_rows.wait()
+            if not self._full.is_set():
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self._interval)
+                except asyncio.TimeoutError:
+                    pass
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("ingest.flush_failed queue_depth=%d", self.queue_depth)
+                await asyncio.sleep(self._interval)
+
+    def _requeue(self, users: dict[int, str], messages: list[tuple], calls: list[tuple]) -> None:
+        self._users = {**users, **self._users}
+        self._messages = messages + self._messages
+        self._llm_calls = calls + self._llm_calls
+        self._note_depth()
+
+    def _note_depth(self) -> None:
+        depth = len(self._messages)
+        self.stats.queue_depth = depth
+        self.stats.max_queue_depth = max(self.stats.max_queue_depth, depth)
+        self._has_rows.set()
+        if depth >= self._max_rows:
+            self._full.set()
+
+    def _record_flush(self, users: int, messages: int, duration_ms: float) -> None:
+        stats = self.stats
+        stats.flushes += 1
+        stats.messages_written += messages
+        stats.users_written += users
+        if self._user_cache is not None:
+            self._user_cache.stats.writes += users
+        stats.last_flush_ms = duration_ms
+        stats.max_flush_ms = max(stats.max_flush_ms, duration_ms)
+        stats.total_flush_ms += duration_ms
+        stats.queue_depth = len(self._messages)
+        log = logger.warning if duration_ms >= _SLOW_FLUSH_MS else logger.debug
+        log(
+            "ingest.flush messages=%d users=%d duration=%.1fms queue_depth=%d",
+            messages,
+            users,
+            duration_ms,
+            stats.queue_depth,
+        )
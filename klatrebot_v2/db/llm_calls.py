@@ -0,0 +1,66 @@
+"""LLM call telemetry queries."""
+from datetime import datetime
+
+from klatrebot_v2.db import connection
+from klatrebot_v2.db.connection import DbHandle
+from klatrebot_v2.time_utils import to_epoch_ms
+
+
+_INSERT_SQL = """
+    INSERT INTO llm_calls
+        (purpose, model, started_at_utc, started_at_ms, latency_ms, input_tokens, cached_tokens,
+         output_tokens, tool_rounds, status, error, compiler_run_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def call_row(
+    *,
+    purpose: str,
+    model: str,
+    started_at_utc: datetime,
+    latency_ms: float,
+    input_tokens: int = 0,
+    cached_tokens: int = 0,
+    output_tokens: int = 0,
+    tool_rounds: int = 0,
+    status: str = "ok",
+    error: str | None = None,
+    compiler_run_id: int | None = None,
+) -> tuple:
+    """Parameter tuple for `_INSERT_SQL`; used by telemetry buffers and the ingestion writer."""
+    return (
+        purpose,
+        model,
+        started_at_utc.isoformat(),
+        to_epoch_ms(started_at_utc),
+        latency_ms,
+        input_tokens,
+        cached_tokens,
+        output_tokens,
+        tool_rounds,
+        status,
+        error,
+        compiler_run_id,
+    )
+
+
+async def insert_many(conn: DbHandle, rows: list[tuple]) -> None:
+    """Insert `call_row` tuples without committing; the caller owns the transaction."""
+    if rows:
+        await connection.writer(conn).executemany(_INSERT_SQL, rows)
+
+
+async def calls_since(conn: DbHandle, since: datetime) -> list[tuple]:
+    """Every call started at or after `since`, oldest first."""
+    async with connection.reader(conn) as read_conn:
+        return await read_conn.execute_fetchall(
+            """
+            SELECT purpose, model, started_at_utc, latency_ms, input_tokens, cached_tokens,
+                   output_tokens, tool_rounds, status, compiler_run_id
+            FROM llm_calls
+            WHERE started_at_ms >= ?
+            ORDER BY started_at_ms
+            """,
+            (to_epoch_ms(since),),
+        )
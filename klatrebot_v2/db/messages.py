@@ -1,13 +1,44 @@
 """Message log queries."""
 from datetime import datetime
-import aiosqlite
 from pydantic import BaseModel
 
+from klatrebot_v2.db import connection
+from klatrebot_v2.db.connection import DbHandle
 from klatrebot_v2.db.models import Message
+from klatrebot_v2.db.rows import MESSAGE_ROW_COLUMNS, MessageRow, decode_message_rows
+from klatrebot_v2.time_utils import to_epoch_ms
+
+
+_INSERT_SQL = """
+    INSERT OR IGNORE INTO messages
+        (discord_message_id, channel_id, user_id, content, timestamp_utc, timestamp_ms, is_bot)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def message_row(
+    *,
+    discord_message_id: int,
+    channel_id: int,
+    user_id: int,
+    content: str,
+    timestamp_utc: datetime,
+    is_bot: bool = False,
+) -> tuple:
+    """Parameter tuple for `_INSERT_SQL`; used by `insert` and the ingestion writer."""
+    return (
+        discord_message_id,
+        channel_id,
+        user_id,
+        content,
+        timestamp_utc.isoformat(),
+        to_epoch_ms(timestamp_utc),
+        1 if is_bot else 0,
+    )
 
 
 async def insert(
-    conn: aiosqlite.Connection,
+    conn: DbHandle,
     *,
     discord_message_id: int,
     channel_id: int,
@@ -16,40 +47,44 @@ async def insert(
     timestamp_utc: datetime,
     is_bot: bool = False,
 ) -> None:
+    conn = connection.writer(conn)
     await conn.execute(
-        """
-        INSERT OR IGNORE INTO messages
-            (discord_message_id, channel_id, user_id, content, timestamp_utc, is_bot)
-        VALUES (?, ?, ?, ?, ?, ?)
-        """,
-        (
-            discord_message_id,
-            channel_id,
-            user_id,
-            content,
-            timestamp_utc.isoformat(),
-            1 if is_bot else 0,
+        _INSERT_SQL,
+        message_row(
+            discord_message_id=discord_message_id,
+            channel_id=channel_id,
+            user_id=user_id,
+            content=content,
+            timestamp_utc=timestamp_utc,
+            is_bot=is_bot,
         ),
     )
     await conn.commit()
 
 
-async def recent(conn: aiosqlite.Connection, *, channel_id: int, limit: int) -> list[Message]:
+async def insert_many(conn: DbHandle, rows: list[tuple]) -> None:
+    """Insert `message_row` tuples without committing; the caller owns the transaction."""
+    if rows:
+        await connection.writer(conn).executemany(_INSERT_SQL, rows)
+
+
+async def recent(conn: DbHandle, *, channel_id: int, limit: int) -> list[Message]:
     """Return the last `limit` messages for `channel_id`, oldest-first within that window."""
-    cursor = await conn.execute(
-        """
-        SELECT discord_message_id, channel_id, user_id, content, timestamp_utc, is_bot
-        FROM (
-            SELECT * FROM messages
-            WHERE channel_id = ?
-            ORDER BY timestamp_utc DESC
-            LIMIT ?
+    async with connection.reader(conn) as read_conn:
+        cursor = await read_conn.execute(
+            """
+            SELECT discord_message_id, channel_id, user_id, content, timestamp_utc, is_bot
+            FROM (
+                SELECT * FROM messages
+                WHERE channel_id = ?
+                ORDER BY timestamp_ms DESC
+                LIMIT ?
+            )
+            ORDER BY timestamp_ms ASC
+            """,
+            (channel_id, limit),
         )
-        ORDER BY timestamp_utc ASC
-        """,
-        (channel_id, limit),
-    )
-    rows = await cursor.fetchall()
+        rows = await cursor.fetchall()
     return [
         Message(
             discord_message_id=r[0],
@@ -64,6 +99,8 @@ async def recent(conn: aiosqlite.Connection, *, channel_id: int, limit: int) ->
 
 
 class MessageWithAuthor(BaseModel):
+    """Validated message with author name, for data that does not come from our own DB."""
+
     discord_message_id: int
     channel_id: int
     user_id: int
@@ -74,69 +111,47 @@ class MessageWithAuthor(BaseModel):
 
 
 async def recent_with_authors(
-    conn: aiosqlite.Connection, *, channel_id: int, limit: int
-) -> list[MessageWithAuthor]:
-    cursor = await conn.execute(
-        """
-        SELECT m.discord_message_id, m.channel_id, m.user_id,
-               COALESCE(u.display_name, '?'), m.content, m.timestamp_utc, m.is_bot
-        FROM (
-            SELECT * FROM messages
-            WHERE channel_id = ?
-            ORDER BY timestamp_utc DESC
-            LIMIT ?
-        ) m
-        LEFT JOIN users u ON u.discord_user_id = m.user_id
-        ORDER BY m.timestamp_utc ASC
-        """,
-        (channel_id, limit),
-    )
-    rows = await cursor.fetchall()
-    return [
-        MessageWithAuthor(
-            discord_message_id=r[0],
-            channel_id=r[1],
-            user_id=r[2],
-            user_display_name=r[3],
-            content=r[4],
-            timestamp_utc=datetime.fromisoformat(r[5]),
-            is_bot=bool(r[6]),
+    conn: DbHandle, *, channel_id: int, limit: int
+) -> list[MessageRow]:
+    async with connection.reader(conn) as read_conn:
+        cursor = await read_conn.execute(
+            f"""
+            SELECT {MESSAGE_ROW_COLUMNS}
+            FROM (
+                SELECT * FROM messages
+                WHERE channel_id = ?
+                ORDER BY timestamp_ms DESC
+                LIMIT ?
+            ) m
+            LEFT JOIN users u ON u.discord_user_id = m.user_id
+            ORDER BY m.timestamp_ms ASC
+            """,
+            (channel_id, limit),
         )
-        for r in rows
-    ]
+        rows = await cursor.fetchall()
+    return decode_message_rows(rows)
 
 
 async def in_window(
-    conn: aiosqlite.Connection,
+    conn: DbHandle,
     *,
     channel_id: int,
     start: datetime,
     end: datetime,
-) -> list[MessageWithAuthor]:
+) -> list[MessageRow]:
     """[start, end) window, oldest-first."""
-    cursor = await conn.execute(
-        """
-        SELECT m.discord_message_id, m.channel_id, m.user_id,
-               COALESCE(u.display_name, '?'), m.content, m.timestamp_utc, m.is_bot
-        FROM messages m
-        LEFT JOIN users u ON u.discord_user_id = m.user_id
-        WHERE m.channel_id = ?
-          AND m.timestamp_utc >= ?
-          AND m.timestamp_utc <  ?
-        ORDER BY m.timestamp_utc ASC
-        """,
-        (channel_id, start.isoformat(), end.isoformat()),
-    )
-    rows = await cursor.fetchall()
-    return [
-        MessageWithAuthor(
-            discord_message_id=r[0],
-            channel_id=r[1],
-            user_id=r[2],
-            user_display_name=r[3],
-            content=r[4],
-            timestamp_utc=datetime.fromisoformat(r[5]),
-            is_bot=bool(r[6]),
+    async with connection.reader(conn) as read_conn:
+        cursor = await read_conn.execute(
+            f"""
+            SELECT {MESSAGE_ROW_COLUMNS}
+            FROM messages m
+            LEFT JOIN users u ON u.discord_user_id = m.user_id
+            WHERE m.channel_id = ?
+              AND m.timestamp_ms >= ?
+              AND m.timestamp_ms <  ?
+            ORDER BY m.timestamp_ms ASC
+            """,
+            (channel_id, to_epoch_ms(start), to_epoch_ms(end)),
         )
-        for r in rows
-    ]
+        rows = await cursor.fetchall()
+    return decode_message_rows(rows)
@@ -1,6 +1,17 @@
-"""Schema bootstrap. Idempotent — safe to run on every startup."""
+"""Numbered schema and data migrations, tracked in PRAGMA user_version."""
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Awaitable, Callable
+
 import aiosqlite
 
+from klatrebot_v2.time_utils import to_epoch_ms
+
+
+logger = logging.getLogger(__name__)
+
 
 _DDL = [
     """
@@ -20,10 +31,10 @@ _DDL = [
         content             TEXT NOT NULL,
         timestamp_utc       TEXT NOT NULL,
         is_bot              INTEGER NOT NULL DEFAULT 0,
+        timestamp_ms        INTEGER,
         FOREIGN KEY(user_id) REFERENCES users(discord_user_id)
     )
     """,
-    "CREATE INDEX IF NOT EXISTS idx_messages_channel_ts ON messages(channel_id, timestamp_utc)",
     """
     CREATE TABLE IF NOT EXISTS user_aliases (
         discord_user_id     INTEGER NOT NULL,
@@ -86,6 +97,8 @@ _DDL = [
         channel_id          INTEGER NOT NULL,
         start_time_utc      TEXT NOT NULL,
         end_time_utc        TEXT NOT NULL,
+        start_time_ms       INTEGER,
+        end_time_ms         INTEGER,
         message_count       INTEGER NOT NULL,
         human_message_count INTEGER NOT NULL,
         total_chars         INTEGER NOT NULL,
@@ -101,7 +114,6 @@ _DDL = [
         FOREIGN KEY(compiler_run_id) REFERENCES memory_compiler_runs(id)
     )
     """,
-    "CREATE INDEX IF NOT EXISTS idx_segments_run_time ON conversation_segments(compiler_run_id, start_time_utc, end_time_utc)",
     """
     CREATE TABLE IF NOT EXISTS segment_messages (
         segment_id          INTEGER NOT NULL,
@@ -125,6 +137,8 @@ _DDL = [
         speaker_ids_json    TEXT NOT NULL DEFAULT '[]',
         created_at_source   TEXT,
         last_seen_at_source TEXT,
+        created_at_source_ms    INTEGER,
+        last_seen_at_source_ms  INTEGER,
         created_at          TEXT NOT NULL DEFAULT (datetime('now')),
         FOREIGN KEY(compiler_run_id) REFERENCES memory_compiler_runs(id),
         FOREIGN KEY(segment_id) REFERENCES conversation_segments(id)
@@ -217,6 +231,8 @@ _DDL = [
         channel_id                  INTEGER NOT NULL,
         day_start_utc               TEXT NOT NULL,
         day_end_utc                 TEXT NOT NULL,
+        day_start_ms                INTEGER,
+        day_end_ms                  INTEGER,
         title                       TEXT NOT NULL DEFAULT '',
         summary                     TEXT NOT NULL DEFAULT '',
         key_items_json              TEXT NOT NULL DEFAULT '[]',
@@ -272,14 +288,65 @@ _ALTER = [
     "ALTER TABLE conversation_segments ADD COLUMN segment_key TEXT",
     "ALTER TABLE conversation_segments ADD COLUMN error TEXT",
     "ALTER TABLE conversation_segments ADD COLUMN retry_count INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE messages ADD COLUMN timestamp_ms INTEGER",
+    "ALTER TABLE conversation_segments ADD COLUMN start_time_ms INTEGER",
+    "ALTER TABLE conversation_segments ADD COLUMN end_time_ms INTEGER",
+    "ALTER TABLE memory_items ADD COLUMN created_at_source_ms INTEGER",
+    "ALTER TABLE memory_items ADD COLUMN last_seen_at_source_ms INTEGER",
+    "ALTER TABLE daily_ambient_memory ADD COLUMN day_start_ms INTEGER",
+    "ALTER TABLE daily_ambient_memory ADD COLUMN day_end_ms INTEGER",
 ]
 
 _POST_DDL = [
     "CREATE UNIQUE INDEX IF NOT EXISTS idx_segments_run_key ON conversation_segments(compiler_run_id, segment_key)",
+    # Range filters use the integer epoch-ms columns; the ISO columns are display-only.
+    "DROP INDEX IF EXISTS idx_messages_channel_ts",
+    "DROP INDEX IF EXISTS idx_segments_run_time",
+    "CREATE INDEX IF NOT EXISTS idx_messages_channel_ts_ms ON messages(channel_id, timestamp_ms)",
+    "CREATE INDEX IF NOT EXISTS idx_segments_run_time_ms ON conversation_segments(compiler_run_id, start_time_ms, end_time_ms)",
+    "CREATE INDEX IF NOT EXISTS idx_memory_items_run_source_ms ON memory_items(compiler_run_id, created_at_source_ms)",
+    "CREATE INDEX IF NOT EXISTS idx_daily_ambient_run_day_ms ON daily_ambient_memory(compiler_run_id, day_start_ms)",
+]
+
+# (table, key column, ((iso column, epoch-ms column), ...)) filled from the ISO text.
+_EPOCH_MS_BACKFILLS = [
+    ("messages", "discord_message_id", (("timestamp_utc", "timestamp_ms"),)),
+    ("conversation_segments", "id", (("start_time_utc", "start_time_ms"), ("end_time_utc", "end_time_ms"))),
+    (
+        "memory_items",
+        "id",
+        (("created_at_source", "created_at_source_ms"), ("last_seen_at_source", "last_seen_at_source_ms")),
+    ),
+    ("daily_ambient_memory", "id", (("day_start_utc", "day_start_ms"), ("day_end_utc", "day_end_ms"))),
 ]
+_BACKFILL_BATCH_SIZE = 5000
+
+
+@dataclass(frozen=True)
+class Migration:
+    """One step of the schema history. `version` is stored in PRAGMA user_version once it succeeds.
+
+    Data migrations commit in batches themselves and must be resumable, since a crash
+    part-way leaves the version unchanged and the step runs again on the next start.
+    """
+
+    version: int
+    name: str
+    apply: Callable[[aiosqlite.Connection], Awaitable[None]]
 
 
-async def run(conn: aiosqlite.Connection) -> None:
+@dataclass
+class MigrationReport:
+    from_version: int
+    to_version: int
+    applied: list[str] = field(default_factory=list)
+    step_ms: dict[str, float] = field(default_factory=dict)
+    duration_ms: float = 0.0
+
+
+async def _baseline_schema(conn: aiosqlite.Connection) -> None:
+    # Databases created before versioning sit at user_version 0 with some of these
+    # columns already present, so the ALTERs tolerate duplicates.
     for stmt in _DDL:
         await conn.execute(stmt)
     for stmt in _ALTER:
@@ -290,4 +357,193 @@ async def run(conn: aiosqlite.Connection) -> None:
                 raise
     for stmt in _POST_DDL:
         await conn.execute(stmt)
-    await conn.commit()
+
+
+async def _backfill_all_epoch_ms(conn: aiosqlite.Connection) -> None:
+    for table, key, columns in _EPOCH_MS_BACKFILLS:
+        await _backfill_epoch_ms(conn, table=table, key=key, columns=columns)
+
+
+async def _summary_cache(conn: aiosqlite.Connection) -> None:
+    # Validated LLM output keyed by a hash of the exact request, shared by every run.
+    await conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS memory_summary_cache (
+            cache_key       TEXT PRIMARY KEY,
+            kind            TEXT NOT NULL,
+            model           TEXT NOT NULL,
+            prompt_version  TEXT NOT NULL,
+            response_json   TEXT NOT NULL,
+            created_at      TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+        """
+    )
+
+
+async def _compiler_batches(conn: aiosqlite.Connection) -> None:
+    # Batch API submissions of a compiler run, collected one round at a time.
+    await conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS memory_compiler_batches (
+            id               INTEGER PRIMARY KEY AUTOINCREMENT,
+            compiler_run_id  INTEGER NOT NULL,
+            batch_id         TEXT NOT NULL,
+            request_count    INTEGER NOT NULL,
+            status           TEXT NOT NULL DEFAULT 'submitted',
+            submitted_at     TEXT NOT NULL DEFAULT (datetime('now')),
+            collected_at     TEXT,
+            FOREIGN KEY(compiler_run_id) REFERENCES memory_compiler_runs(id)
+        )
+        """
+    )
+    await conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_compiler_batches_run ON memory_compiler_batches(compiler_run_id, status)"
+    )
+
+
+async def _dirty_periods(conn: aiosqlite.Connection) -> None:
+    # Days, weeks and months of a run whose rollups must be rebuilt on the next compile.
+    await conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS memory_dirty_periods (
+            compiler_run_id   INTEGER NOT NULL,
+            channel_id        INTEGER NOT NULL,
+            period_type       TEXT NOT NULL CHECK (period_type IN ('day', 'week', 'month')),
+            period_start_utc  TEXT NOT NULL,
+            PRIMARY KEY (compiler_run_id, period_type, channel_id, period_start_utc),
+            FOREIGN KEY(compiler_run_id) REFERENCES memory_compiler_runs(id)
+        )
+        """
+    )
+    # Failed rollups used to be retried by every compile; keep them queued.
+    await conn.execute(
+        """
+        INSERT OR IGNORE INTO memory_dirty_periods (compiler_run_id, channel_id, period_type, period_start_utc)
+        SELECT compiler_run_id, channel_id, period_type, period_start_utc
+        FROM memory_rollups WHERE status = 'failed'
+        """
+    )
+    await conn.execute(
+        """
+        INSERT OR IGNORE INTO memory_dirty_periods (compiler_run_id, channel_id, period_type, period_start_utc)
+        SELECT compiler_run_id, channel_id, 'day', day_start_utc
+        FROM daily_ambient_memory WHERE status = 'failed'
+        """
+    )
+
+
+async def _llm_calls(conn: aiosqlite.Connection) -> None:
+    # One row per Responses API call, for `python -m klatrebot_v2.memory stats`.
+    await conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS llm_calls (
+            id               INTEGER PRIMARY KEY AUTOINCREMENT,
+            purpose          TEXT NOT NULL,
+            model            TEXT NOT NULL,
+            started_at_utc   TEXT NOT NULL,
+            started_at_ms    INTEGER NOT NULL,
+            latency_ms       REAL NOT NULL,
+            input_tokens     INTEGER NOT NULL DEFAULT 0,
+            cached_tokens    INTEGER NOT NULL DEFAULT 0,
+            output_tokens    INTEGER NOT NULL DEFAULT 0,
+            tool_rounds      INTEGER NOT NULL DEFAULT 0,
+            status           TEXT NOT NULL CHECK (status IN ('ok', 'error')),
+            error            TEXT,
+            compiler_run_id  INTEGER
+        )
+        """
+    )
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_started ON llm_calls(started_at_ms)")
+
+
+# Append only; never renumber or edit a step that has shipped.
+MIGRATIONS: list[Migration] = [
+    Migration(1, "baseline_schema", _baseline_schema),
+    Migration(2, "backfill_epoch_ms", _backfill_all_epoch_ms),
+    Migration(3, "summary_cache", _summary_cache),
+    Migration(4, "compiler_batches", _compiler_batches),
+    Migration(5, "dirty_periods", _dirty_periods),
+    Migration(6, "llm_calls", _llm_calls),
+]
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+async def current_version(conn: aiosqlite.Connection) -> int:
+    rows = await conn.execute_fetchall("PRAGMA user_version")
+    return rows[0][0]
+
+
+async def run(conn: aiosqlite.Connection) -> MigrationReport:
+    """Apply pending migrations; an up-to-date database costs one pragma read."""
+    started = time.perf_counter()
+    version = await current_version(conn)
+    report = MigrationReport(from_version=version, to_version=version)
+    if version >= LATEST_VERSION:
+        report.duration_ms = (time.perf_counter() - started) * 1000
+        logger.debug("migrations.current version=%d duration=%.1fms", version, report.duration_ms)
+        return report
+    for migration in MIGRATIONS:
+        if migration.version <= version:
+            continue
+        step_started = time.perf_counter()
+        await migration.apply(conn)
+        await conn.execute(f"PRAGMA user_version = {int(migration.version)}")
+        await conn.commit()
+        step_ms = (time.perf_counter() - step_started) * 1000
+        report.applied.append(migration.name)
+        report.step_ms[migration.name] = step_ms
+        report.to_version = migration.version
+        logger.info("migrations.step version=%d name=%s duration=%.1fms", migration.version, migration.name, step_ms)
+    report.duration_ms = (time.perf_counter() - started) * 1000
+    logger.info(
+        "migrations.applied from=%d to=%d steps=%d duration=%.1fms",
+        report.from_version,
+        report.to_version,
+        len(report.applied),
+        report.duration_ms,
+    )
+    return report
+
+
+async def _backfill_epoch_ms(
+    conn: aiosqlite.Connection,
+    *,
+    table: str,
+    key: str,
+    columns: tuple[tuple[str, str], ...],
+) -> int:
+    """Fill NULL epoch-ms columns from their ISO twins, one committed batch at a time."""
+    iso_sql = ", ".join(iso for iso, _ in columns)
+    pending_sql = " OR ".join(f"({ms} IS NULL AND {iso} IS NOT NULL)" for iso, ms in columns)
+    set_sql = ", ".join(f"{ms} = ?" for _, ms in columns)
+    updated = 0
+    last_key = None
+    while True:
+        key_sql = f"AND {key} > ?" if last_key is not None else ""
+        rows = await conn.execute_fetchall(
+            f"""
+            SELECT {key}, {iso_sql} FROM {table}
+            WHERE ({pending_sql}) {key_sql}
+            ORDER BY {key}
+            LIMIT ?
+            """,
+            (*([last_key] if last_key is not None else []), _BACKFILL_BATCH_SIZE),
+        )
+        if not rows:
+            return updated
+        await conn.executemany(
+            f"UPDATE {table} SET {set_sql} WHERE {key} = ?",
+            [(*(_iso_to_epoch_ms(value) for value in row[1:]), row[0]) for row in rows],
+        )
+        await conn.commit()
+        updated += len(rows)
+        last_key = rows[-1][0]
+
+
+def _iso_to_epoch_ms(value: str | None) -> int | None:
+    if not value:
+        return None
+    try:
+        return to_epoch_ms(datetime.fromisoformat(value))
+    except ValueError:
+        return None
@@ -0,0 +1,93 @@
+"""Per-channel ring buffer of recent messages, filled at ingest."""
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+
+from klatrebot_v2.db import messages as msg_db
+from klatrebot_v2.db.connection import DbHandle
+from klatrebot_v2.db.rows import MessageRow
+from klatrebot_v2.time_utils import to_epoch_ms
+
+
+# Coverage for a channel whose entire history fits in the buffer.
+_ALL_HISTORY = -(2**63)
+
+
+@dataclass
+class RecentBufferStats:
+    hits: int = 0
+    misses: int = 0
+
+
+class RecentMessageBuffer:
+    """Bounded per-channel deques of `MessageRow`, oldest first.
+
+    A channel is cold until it has been seeded from the DB; cold channels return
+    None so callers fall back to SQLite. Per channel the buffer tracks the
+    timestamp from which it holds every message, so window reads are only served
+    when the whole window is covered.
+    """
+
+    def __init__(self, capacity: int = 200) -> None:
+        self.capacity = max(capacity, 1)
+        self._channels: dict[int, deque[MessageRow]] = {}
+        self._covered_from_ms: dict[int, int] = {}
+        self.stats = RecentBufferStats()
+
+    def is_warm(self, channel_id: int) -> bool:
+        return channel_id in self._covered_from_ms
+
+    def append(self, row: MessageRow) -> None:
+        messages = self._channels.setdefault(row.channel_id, deque(maxlen=self.capacity))
+        if len(messages) == self.capacity:
+            evicted = messages[0]
+            if row.channel_id in self._covered_from_ms:
+                self._covered_from_ms[row.channel_id] = max(
+                    self._covered_from_ms[row.channel_id], evicted.timestamp_ms + 1
+                )
+        messages.append(row)
+
+    def seed(self, channel_id: int, rows: list[MessageRow], *, complete: bool) -> None:
+        """Merge DB rows (oldest first) into the channel and mark it warm.
+
+        `complete` means `rows` reaches back to the start of the channel's history.
+        """
+        merged = {row.discord_message_id: row for row in rows}
+        for row in self._channels.get(channel_id, ()):
+            merged.setdefault(row.discord_message_id, row)
+        ordered = sorted(merged.values(), key=lambda r: (r.timestamp_ms, r.discord_message_id))
+        kept = ordered[-self.capacity :]
+        self._channels[channel_id] = deque(kept, maxlen=self.capacity)
+        if complete and len(kept) == len(ordered):
+            self._covered_from_ms[channel_id] = _ALL_HISTORY
+        elif kept:
+            self._covered_from_ms[channel_id] = kept[0].timestamp_ms + 1
+        else:
+            self._covered_from_ms[channel_id] = _ALL_HISTORY
+
+    async def warm(self, conn: DbHandle, channel_id: int) -> None:
+        rows = await msg_db.recent_with_authors(conn, channel_id=channel_id, limit=self.capacity)
+        self.seed(channel_id, rows, complete=len(rows) < self.capacity)
+
+    def tail(self, channel_id: int, limit: int) -> list[MessageRow] | None:
+        """The last `limit` messages, or None when the buffer cannot answer."""
+        messages = self._channels.get(channel_id)
+        if not self.is_warm(channel_id) or messages is None or limit > self.capacity:
+            self.stats.misses += 1
+            return None
+        if len(messages) < limit and self._covered_from_ms[channel_id] != _ALL_HISTORY:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return list(messages)[-limit:] if limit > 0 else []
+
+    def window(self, channel_id: int, start: datetime, end: datetime) -> list[MessageRow] | None:
+        """Messages in [start, end), or None unless the buffer covers the whole window."""
+        start_ms, end_ms = to_epoch_ms(start), to_epoch_ms(end)
+        if not self.is_warm(channel_id) or self._covered_from_ms[channel_id] > start_ms:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return [m for m in self._channels.get(channel_id, ()) if start_ms <= m.timestamp_ms < end_ms]
@@ -0,0 +1,111 @@
+"""Lightweight message rows for hot read paths.
+
+Rows come straight from our own SQLite file, so they skip pydantic validation;
+`MessageWithAuthor` stays the validated model for data from elsewhere.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+
+from klatrebot_v2.time_utils import from_epoch_ms, to_epoch_ms
+
+
+# Column order `MessageRow.from_row` expects.
+MESSAGE_ROW_COLUMNS = """
+    m.discord_message_id, m.channel_id, m.user_id,
+    COALESCE(u.display_name, '?'), m.content, m.timestamp_ms, m.is_bot
+"""
+
+
+class MessageRow:
+    """Slotted message record; `timestamp_utc` is parsed from epoch ms on first access."""
+
+    __slots__ = (
+        "discord_message_id",
+        "channel_id",
+        "user_id",
+        "user_display_name",
+        "content",
+        "timestamp_ms",
+        "is_bot",
+        "_timestamp_utc",
+    )
+
+    def __init__(
+        self,
+        discord_message_id: int,
+        channel_id: int,
+        user_id: int,
+        user_display_name: str,
+        content: str,
+        timestamp_utc: datetime | None = None,
+        is_bot: bool = False,
+        *,
+        timestamp_ms: int | None = None,
+    ) -> None:
+        if timestamp_ms is None:
+            if timestamp_utc is None:
+                raise TypeError("MessageRow needs timestamp_utc or timestamp_ms")
+            timestamp_ms = to_epoch_ms(timestamp_utc)
+        self.discord_message_id = discord_message_id
+        self.channel_id = channel_id
+        self.user_id = user_id
+        self.user_display_name = user_display_name
+        self.content = content
+        self.timestamp_ms = timestamp_ms
+        self.is_bot = bool(is_bot)
+        self._timestamp_utc = timestamp_utc
+
+    @classmethod
+    def from_row(cls, row: tuple) -> MessageRow:
+        """Decode a `MESSAGE_ROW_COLUMNS` tuple without parsing the timestamp."""
+        self = cls.__new__(cls)
+        (
+            self.discord_message_id,
+            self.channel_id,
+            self.user_id,
+            self.user_display_name,
+            self.content,
+            self.timestamp_ms,
+            is_bot,
+        ) = row
+        self.is_bot = bool(is_bot)
+        self._timestamp_utc = None
+        return self
+
+    @property
+    def timestamp_utc(self) -> datetime:
+        if self._timestamp_utc is None:
+            self._timestamp_utc = from_epoch_ms(self.timestamp_ms)
+        return self._timestamp_utc
+
+    def _key(self) -> tuple:
+        return (
+            self.discord_message_id,
+            self.channel_id,
+            self.user_id,
+            self.user_display_name,
+            self.content,
+            self.timestamp_ms,
+            self.is_bot,
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, MessageRow):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __repr__(self) -> str:
+        return (
+            f"MessageRow(discord_message_id={self.discord_message_id}, channel_id={self.channel_id}, "
+            f"user_id={self.user_id}, user_display_name={self.user_display_name!r}, "
+            f"timestamp_utc={self.timestamp_utc.isoformat()}, is_bot={self.is_bot})"
+        )
+
+
+def decode_message_rows(rows: list[tuple]) -> list[MessageRow]:
+    from_row = MessageRow.from_row
+    return [from_row(row) for row in rows]
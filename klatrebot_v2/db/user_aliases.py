@@ -28,6 +28,30 @@ def normalize_alias(alias: str) -> str:
     return normalized.strip(_STRIP_CHARS)
 
 
+_UPSERT_ALIAS_SQL = """
+    INSERT INTO user_aliases (discord_user_id, alias, alias_normalized, source)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(discord_user_id, alias_normalized) DO UPDATE SET
+        alias = excluded.alias,
+        source = CASE
+            WHEN user_aliases.source = 'config' THEN user_aliases.source
+            ELSE excluded.source
+        END,
+        updated_at = datetime('now')
+"""
+
+
+def alias_row(*, discord_user_id: int, alias: str, source: str) -> tuple[int, str, str, str] | None:
+    """Parameter tuple for an alias upsert, or None when the alias normalizes away."""
+    if source not in ALIAS_SOURCES:
+        raise ValueError(f"Unsupported alias source: {source}")
+    clean = alias.strip()
+    normalized = normalize_alias(clean)
+    if not normalized or len(normalized) > 80:
+        return None
+    return (discord_user_id, clean, normalized, source)
+
+
 async def upsert_alias(
     conn: aiosqlite.Connection,
     *,
@@ -35,29 +59,19 @@ async def upsert_alias(
     alias: str,
     source: str,
 ) -> None:
-    if source not in ALIAS_SOURCES:
-        raise ValueError(f"Unsupported alias source: {source}")
-    clean = alias.strip()
-    normalized = normalize_alias(clean)
-    if not normalized or len(normalized) > 80:
+    row = alias_row(discord_user_id=discord_user_id, alias=alias, source=source)
+    if row is None:
         return
-    await conn.execute(
-        """
-        INSERT INTO user_aliases (discord_user_id, alias, alias_normalized, source)
-        VALUES (?, ?, ?, ?)
-        ON CONFLICT(discord_user_id, alias_normalized) DO UPDATE SET
-            alias = excluded.alias,
-            source = CASE
-                WHEN user_aliases.source = 'config' THEN user_aliases.source
-                ELSE excluded.source
-            END,
-            updated_at = datetime('now')
-        """,
-        (discord_user_id, clean, normalized, source),
-    )
+    await conn.execute(_UPSERT_ALIAS_SQL, row)
     await conn.commit()
 
 
+async def upsert_alias_rows(conn: aiosqlite.Connection, rows: list[tuple[int, str, str, str]]) -> None:
+    """Upsert `alias_row` tuples without committing; the caller owns the transaction."""
+    if rows:
+        await conn.executemany(_UPSERT_ALIAS_SQL, rows)
+
+
 async def sync_config_aliases(conn: aiosqlite.Connection, path: str | None) -> None:
     if not path:
         return
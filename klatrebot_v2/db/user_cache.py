@@ -0,0 +1,91 @@
+"""In-process cache of known users; skips user/alias writes when nothing changed."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import aiosqlite
+
+from klatrebot_v2.db import users as users_db
+from klatrebot_v2.db.models import User
+from klatrebot_v2.db.user_aliases import normalize_alias
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    discord_user_id: int
+    display_name: str
+    alias_normalized: str
+    is_admin: bool = False
+
+
+@dataclass
+class UserCacheStats:
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    skipped_writes: int = 0
+
+
+class UserCache:
+    """Known (discord_user_id, display_name, alias_normalized) keyed by user.
+
+    The cache is the single source of "does this row need writing"; callers that
+    write users must go through `needs_write`/`remember` (or `upsert`) so the cache
+    never claims a row the database does not have.
+    """
+
+    def __init__(self) -> None:
+        self._users: dict[int, CachedUser] = {}
+        self.stats = UserCacheStats()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    async def warm(self, conn: aiosqlite.Connection) -> int:
+        cursor = await conn.execute("SELECT discord_user_id, display_name, is_admin FROM users")
+        for user_id, display_name, is_admin in await cursor.fetchall():
+            self.remember(user_id, display_name, is_admin=bool(is_admin))
+        return len(self._users)
+
+    def needs_write(self, discord_user_id: int, display_name: str) -> bool:
+        cached = self._users.get(discord_user_id)
+        if cached is not None and cached.display_name == display_name:
+            self.stats.skipped_writes += 1
+            return False
+        return True
+
+    def remember(self, discord_user_id: int, display_name: str, *, is_admin: bool = False) -> None:
+        self._users[discord_user_id] = CachedUser(
+            discord_user_id=discord_user_id,
+            display_name=display_name,
+            alias_normalized=normalize_alias(display_name),
+            is_admin=is_admin,
+        )
+
+    def forget(self, discord_user_id: int) -> None:
+        self._users.pop(discord_user_id, None)
+
+    async def get(self, conn: aiosqlite.Connection, discord_user_id: int) -> User | None:
+        cached = self._users.get(discord_user_id)
+        if cached is not None:
+            self.stats.hits += 1
+            return User(
+                discord_user_id=cached.discord_user_id,
+                display_name=cached.display_name,
+                is_admin=cached.is_admin,
+            )
+        self.stats.misses += 1
+        user = await users_db.get(conn, discord_user_id)
+        if user is not None:
+            self.remember(user.discord_user_id, user.display_name, is_admin=user.is_admin)
+        return user
+
+    async def upsert(self, conn: aiosqlite.Connection, *, discord_user_id: int, display_name: str) -> bool:
+        """Write the user (and display alias) only if the name changed. Returns True if written."""
+        if not self.needs_write(discord_user_id, display_name):
+            return False
+        await users_db.upsert(conn, discord_user_id=discord_user_id, display_name=display_name)
+        cached = self._users.get(discord_user_id)
+        self.remember(discord_user_id, display_name, is_admin=cached.is_admin if cached else False)
+        self.stats.writes += 1
+        return True
@@ -5,17 +5,18 @@ from klatrebot_v2.db import user_aliases
 from klatrebot_v2.db.models import User
 
 
+_UPSERT_SQL = """
+    INSERT INTO users (discord_user_id, display_name, is_admin)
+    VALUES (?, ?, ?)
+    ON CONFLICT(discord_user_id) DO UPDATE SET
+        display_name = excluded.display_name,
+        updated_at   = datetime('now')
+    WHERE users.display_name IS NOT excluded.display_name
+"""
+
+
 async def upsert(conn: aiosqlite.Connection, *, discord_user_id: int, display_name: str, is_admin: bool = False) -> None:
-    await conn.execute(
-        """
-        INSERT INTO users (discord_user_id, display_name, is_admin)
-        VALUES (?, ?, ?)
-        ON CONFLICT(discord_user_id) DO UPDATE SET
-            display_name = excluded.display_name,
-            updated_at   = datetime('now')
-        """,
-        (discord_user_id, display_name, 1 if is_admin else 0),
-    )
+    await conn.execute(_UPSERT_SQL, (discord_user_id, display_name, 1 if is_admin else 0))
     await conn.commit()
     await user_aliases.upsert_alias(
         conn,
@@ -25,6 +26,19 @@ async def upsert(conn: aiosqlite.Connection, *, discord_user_id: int, display_na
     )
 
 
+async def upsert_many(conn: aiosqlite.Connection, rows: list[tuple[int, str]]) -> None:
+    """Upsert (discord_user_id, display_name) rows and their display aliases without committing."""
+    if not rows:
+        return
+    await conn.executemany(_UPSERT_SQL, [(user_id, name, 0) for user_id, name in rows])
+    alias_rows = [
+        row
+        for user_id, name in rows
+        if (row := user_aliases.alias_row(discord_user_id=user_id, alias=name, source="discord_display"))
+    ]
+    await user_aliases.upsert_alias_rows(conn, alias_rows)
+
+
 async def get(conn: aiosqlite.Connection, discord_user_id: int) -> User | None:
     cursor = await conn.execute(
         "SELECT discord_user_id, display_name, is_admin FROM users WHERE discord_user_id = ?",
@@ -1,7 +1,7 @@
 """Discord-decoupled LLM call pipeline."""
 import json
 import re
-from typing import Callable
+from typing import Awaitable, Callable
 
 from pydantic import BaseModel
 
@@ -16,9 +16,11 @@ def _resolve_mentions(text: str, names: dict[int, str]) -> str:
     return _MENTION_RE.sub(sub, text)
 
 from klatrebot_v2.settings import get_settings
+from klatrebot_v2.llm import telemetry
 from klatrebot_v2.llm.client import get_client
 from klatrebot_v2.llm.prompt import load_soul
-from klatrebot_v2.db import messages as msg_db, user_aliases, users as users_db
+from klatrebot_v2.db import connection, messages as msg_db, user_aliases, users as users_db
+from klatrebot_v2.db.recent_buffer import RecentMessageBuffer
 from klatrebot_v2.memory import tools as memory_tools
 from klatrebot_v2.memory.store import get_compiler_run_by_name
 
@@ -83,41 +85,115 @@ def set_db_conn_provider(provider: Callable) -> None:
     _get_db_conn = provider
 
 
+_recent_buffer: RecentMessageBuffer | None = None
+
+
+def set_recent_buffer(buffer: RecentMessageBuffer | None) -> None:
+    global _recent_buffer
+    _recent_buffer = buffer
+
+
+async def _recent_context(conn, *, channel_id: int, limit: int):
+    if _recent_buffer is not None:
+        rows = _recent_buffer.tail(channel_id, limit)
+        if rows is not None:
+            return rows
+    rows = await msg_db.recent_with_authors(conn, channel_id=channel_id, limit=limit)
+    if _recent_buffer is not None and limit <= _recent_buffer.capacity:
+        _recent_buffer.seed(channel_id, rows, complete=len(rows) < limit)
+    return rows
+
+
+TextDeltaCallback = Callable[[str], Awaitable[None]]
+RoundStartCallback = Callable[[], Awaitable[None]]
+
+
+async def _create_response(
+    client,
+    on_text_delta: TextDeltaCallback | None,
+    on_round_start: RoundStartCallback | None = None,
+    *,
+    tool_rounds: int = 0,
+    **kwargs,
+):
+    """One recorded Responses API call; with `on_text_delta`, streamed and forwarded as text arrives."""
+    return await telemetry.timed(
+        "chat",
+        kwargs["model"],
+        lambda: _responses_call(client, on_text_delta, on_round_start, **kwargs),
+        tool_rounds=tool_rounds,
+    )
+
+
+async def _responses_call(
+    client,
+    on_text_delta: TextDeltaCallback | None,
+    on_round_start: RoundStartCallback | None = None,
+    **kwargs,
+):
+    if on_text_delta is None:
+        return await client.responses.create(**kwargs)
+    stream = await client.responses.create(stream=True, **kwargs)
+    completed = None
+    async for event in stream:
+        event_type = getattr(event, "type", None)
+        if event_type == "response.created":
+            if on_round_start is not None:
+                await on_round_start()
+        elif event_type == "response.output_text.delta":
+            await on_text_delta(event.delta)
+        elif event_type == "response.completed":
+            completed = event.response
+        elif event_type in ("response.failed", "response.incomplete", "error"):
+            raise RuntimeError(f"Responses stream ended with {event_type}")
+    if completed is None:
+        raise RuntimeError("Responses stream ended without response.completed")
+    return completed
+
+
 async def reply(
     *,
     question: str,
     asking_user_id: int,
     channel_id: int,
     mentions: dict[int, str] | None = None,
+    on_text_delta: TextDeltaCallback | None = None,
+    on_round_start: RoundStartCallback | None = None,
 ) -> ChatReply:
+    """Answer a !gpt question. `on_text_delta`, if given, receives answer text as it streams.
+
+    A reply may take several response rounds around tool calls; `on_round_start`
+    is awaited as each streamed round begins, so text from an earlier round can be dropped.
+    """
     if _get_db_conn is None:
         raise RuntimeError("chat.reply called before db conn provider was set")
-    conn = _get_db_conn()
+    db = _get_db_conn()
     s = get_settings()
     soul = load_soul()
 
-    recent = await msg_db.recent_with_authors(conn, channel_id=channel_id, limit=s.gpt_recent_message_count)
+    async with connection.reader(db) as conn:
+        recent = await _recent_context(conn, channel_id=channel_id, limit=s.gpt_recent_message_count)
 
-    history_ids: set[int] = set()
-    for m in recent:
-        history_ids.update(int(x) for x in _MENTION_RE.findall(m.content))
-    question_ids = {int(x) for x in _MENTION_RE.findall(question)}
-    names: dict[int, str] = dict(mentions or {})
-    missing = (history_ids | question_ids) - names.keys()
-    if missing:
-        names.update(await _names_for_ids(conn, missing))
+        history_ids: set[int] = set()
+        for m in recent:
+            history_ids.update(int(x) for x in _MENTION_RE.findall(m.content))
+        question_ids = {int(x) for x in _MENTION_RE.findall(question)}
+        names: dict[int, str] = dict(mentions or {})
+        missing = (history_ids | question_ids) - names.keys()
+        if missing:
+            names.update(await _names_for_ids(conn, missing))
 
-    context_block = "\n".join(
-        f"{m.user_display_name}: {_resolve_mentions(m.content, names)}" for m in recent
-    )
-    resolved_question = _resolve_mentions(question, names)
-    mention_tokens = (
-        "\n".join(f"@{n} -> <@{uid}>" for uid, n in names.items())
-        if names
-        else "(none)"
-    )
-    memory_run_id = await _active_memory_run_id(conn, s) if s.memory_enabled else None
-    alias_map = await user_aliases.format_alias_prompt_map(conn) if memory_run_id is not None else "(memory disabled)"
+        context_block = "\n".join(
+            f"{m.user_display_name}: {_resolve_mentions(m.content, names)}" for m in recent
+        )
+        resolved_question = _resolve_mentions(question, names)
+        mention_tokens = (
+            "\n".join(f"@{n} -> <@{uid}>" for uid, n in names.items())
+            if names
+            else "(none)"
+        )
+        memory_run_id = await _active_memory_run_id(conn, s) if s.memory_enabled else None
+        alias_map = await user_aliases.format_alias_prompt_map(conn) if memory_run_id is not None else "(memory disabled)"
 
     full_input = (
         f"{soul}\n\n"
@@ -134,37 +210,45 @@ async def reply(
     if memory_run_id is not None:
         tools.extend(memory_tools.MEMORY_TOOL_DEFS)
 
-    resp = await client.responses.create(
+    resp = await _create_response(
+        client,
+        on_text_delta,
+        on_round_start,
         model=s.model,
         input=full_input,
         tools=tools,
         reasoning={"effort": "low"},
         text={"verbosity": "medium"},
     )
-    for _ in range(8):
+    for tool_round in range(1, 9):
         if memory_run_id is None:
             break
-        tool_outputs = []
-        for call in _extract_function_calls(resp):
-            arguments = dict(call["arguments"])
-            if call["name"] == "recall_community_memory" and "channel_id" not in arguments:
-                arguments["channel_id"] = channel_id
-            output = await memory_tools.execute_memory_tool(
-                conn,
-                run_id=memory_run_id,
-                name=call["name"],
-                arguments=arguments,
-            )
-            tool_outputs.append(
-                {
-                    "type": "function_call_output",
-                    "call_id": call["call_id"],
-                    "output": output,
-                }
-            )
+        calls = _extract_function_calls(resp)
+        for call in calls:
+            if call["name"] == "recall_community_memory" and "channel_id" not in call["arguments"]:
+                call["arguments"] = {**call["arguments"], "channel_id": channel_id}
+        outputs = await memory_tools.execute_memory_tool_calls(
+            db,
+            calls,
+            run_id=memory_run_id,
+            timeout_s=s.memory_tool_timeout_seconds,
+            execute=memory_tools.execute_memory_tool,
+        )
+        tool_outputs = [
+            {
+                "type": "function_call_output",
+                "call_id": call["call_id"],
+                "output": output,
+            }
+            for call, output in zip(calls, outputs)
+        ]
         if not tool_outputs:
             break
-        resp = await client.responses.create(
+        resp = await _create_response(
+            client,
+            on_text_delta,
+            on_round_start,
+            tool_rounds=tool_round,
             model=s.model,
             input=tool_outputs,
             tools=tools,
@@ -202,10 +286,15 @@ async def summarize(msgs) -> str:
     body = "\n".join(f"{m.user_display_name} ({m.user_id}): {m.content}" for m in msgs)
     full_input = f"{soul}\n\n{_SUMMARY_INSTRUCTIONS}\n\nBESKEDER:\n{body}"
     client = get_client()
-    resp = await client.responses.create(
-        model=get_settings().model,
-        input=full_input,
-        reasoning={"effort": "low"},
-        text={"verbosity": "medium"},
+    model = get_settings().model
+    resp = await telemetry.timed(
+        "referat",
+        model,
+        lambda: client.responses.create(
+            model=model,
+            input=full_input,
+            reasoning={"effort": "low"},
+            text={"verbosity": "medium"},
+        ),
     )
     return resp.output_text or ""
@@ -1,19 +1,44 @@
 """AsyncOpenAI singleton — module-level, lazy."""
+import threading
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from openai import AsyncOpenAI
 
-from klatrebot_v2.settings import get_settings
+from klatrebot_v2.settings import Settings, get_settings
 
 
 _client: AsyncOpenAI | None = None
+# Worker threads with an event loop of their own get their own client; HTTP pools are loop-bound.
+_thread = threading.local()
 
 
 def get_client() -> AsyncOpenAI:
     global _client
+    own = getattr(_thread, "client", None)
+    if own is not None:
+        return own
     if _client is None:
-        s = get_settings()
-        _client = AsyncOpenAI(
-            api_key=s.openai_key,
-            timeout=60.0,
-            max_retries=0,
-        )
+        _client = _new_client()
     return _client
+
+
+@asynccontextmanager
+async def thread_client(settings: Settings | None = None) -> AsyncIterator[AsyncOpenAI]:
+    """Give the calling thread its own client for the duration, closed afterwards."""
+    _thread.client = _new_client(settings)
+    try:
+        yield _thread.client
+    finally:
+        own, _thread.client = _thread.client, None
+        await own.close()
+
+
+def _new_client(settings: Settings | None = None) -> AsyncOpenAI:
+    s = settings or get_settings()
+    return AsyncOpenAI(
+        api_key=s.openai_key,
+        base_url=s.openai_base_url or None,
+        timeout=60.0,
+        max_retries=0,
+    )
@@ -0,0 +1,277 @@
+"""Local stand-in for the OpenAI Responses API, for offline end-to-end runs.
+
+Implements enough of `POST /v1/responses` for `chat.reply`, `summarize` and the
+memory compiler: text answers, JSON-object outputs, function calls while
+function tools are offered, and SSE streaming, with injectable latency and
+errors. Point the client at it with `OPENAI_BASE_URL`:
+
+    poetry run python -m klatrebot_v2.llm.fake_server --port 8765 --latency-ms 800 --error-rate 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 poetry run python -m klatrebot_v2
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from aiohttp import web
+
+
+logger = logging.getLogger(__name__)
+
+_PACK_LABEL_RE = re.compile(r"^SEGMENT (s\d+):", re.MULTILINE)
+
+
+@dataclass
+class FakeConfig:
+    latency_ms: float = 0.0
+    # Uniform extra latency on top of `latency_ms`.
+    jitter_ms: float = 0.0
+    # Share of requests answered with `error_status` instead of a response.
+    error_rate: float = 0.0
+    error_status: int = 500
+    # Function-call rounds before the final answer, when the request offers function tools.
+    tool_rounds: int = 1
+    stream_chunk_chars: int = 16
+    stream_chunk_delay_ms: float = 0.0
+    seed: int | None = None
+
+
+@dataclass
+class FakeServerStats:
+    requests: int = 0
+    errors: int = 0
+    streamed: int = 0
+    function_calls: int = 0
+
+
+Responder = Callable[[dict[str, Any]], str]
+
+
+def default_respond(body: dict[str, Any]) -> str:
+    """Output text for a request: a summary JSON object in JSON mode, a short answer otherwise."""
+    if ((body.get("text") or {}).get("format") or {}).get("type") != "json_object":
+        return "Stand-in svar fra den lokale Responses-server."
+    summary = {
+        "topic_title": "Stand-in emne",
+        "title": "Stand-in periode",
+        "summary": "Opsummering fra den lokale Responses-server.",
+        "importance": "normal",
+        "key_items": ["stand-in punkt"],
+        "tags": ["stand-in"],
+        "memory_items": [],
+    }
+    labels = _PACK_LABEL_RE.findall(_input_text(body.get("input")))
+    return json.dumps({label: summary for label in labels} if labels else summary, ensure_ascii=False)
+
+
+class FakeResponsesServer:
+    """In-process `/v1/responses` server; use as an async context manager or `start`/`close`."""
+
+    def __init__(
+        self,
+        config: FakeConfig | None = None,
+        *,
+        respond: Responder = default_respond,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.config = config or FakeConfig()
+        self.respond = respond
+        self.host = host
+        self.port = port
+        self.stats = FakeServerStats()
+        self.bodies: list[dict[str, Any]] = []
+        self._rng = random.Random(self.config.seed)
+        self._rounds: dict[str, int] = {}
+        self._runner: web.AppRunner | None = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_post("/v1/responses", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        logger.info("fake_openai.started base_url=%s", self.base_url)
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> FakeResponsesServer:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        self.stats.requests += 1
+        self.bodies.append(body)
+        config = self.config
+        await asyncio.sleep((config.latency_ms + self._rng.uniform(0, config.jitter_ms)) / 1000)
+        if self._rng.random() < config.error_rate:
+            self.stats.errors += 1
+            return web.json_response(
+                {"error": {"message": "Injected error", "type": "server_error", "param": None, "code": None}},
+                status=config.error_status,
+            )
+        response = self._response(body)
+        if body.get("stream"):
+            self.stats.streamed += 1
+            return await self._stream(request, response)
+        return web.json_response(response)
+
+    def _response(self, body: dict[str, Any]) -> dict[str, Any]:
+        response_id = f"resp_{uuid.uuid4().hex}"
+        rounds = self._rounds.pop(body.get("previous_response_id") or "", -1) + 1
+        functions = [tool for tool in body.get("tools") or [] if tool.get("type") == "function"]
+        if functions and rounds < self.config.tool_rounds:
+            self._rounds[response_id] = rounds
+            self.stats.function_calls += 1
+            tool = functions[rounds % len(functions)]
+            output = [
+                {
+                    "type": "function_call",
+                    "id": f"fc_{uuid.uuid4().hex}",
+                    "call_id": f"call_{uuid.uuid4().hex}",
+                    "name": tool["name"],
+                    "arguments": json.dumps(_arguments(tool.get("parameters") or {})),
+                    "status": "completed",
+                }
+            ]
+            text = ""
+        else:
+            text = self.respond(body)
+            output = [
+                {
+                    "type": "message",
+                    "id": f"msg_{uuid.uuid4().hex}",
+                    "role": "assistant",
+                    "status": "completed",
+                    "content": [{"type": "output_text", "text": text, "annotations": []}],
+                }
+            ]
+        input_tokens = max(1, len(_input_text(body.get("input"))) // 4)
+        output_tokens = max(1, len(text or output[0].get("arguments", "")) // 4)
+        return {
+            "id": response_id,
+            "object": "response",
+            "created_at": int(time.time()),
+            "status": "completed",
+            "model": body.get("model", "stand-in"),
+            "output": output,
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": body.get("tools") or [],
+            "error": None,
+            "incomplete_details": None,
+            "instructions": None,
+            "metadata": {},
+            "temperature": None,
+            "top_p": None,
+            "previous_response_id": body.get("previous_response_id"),
+            "usage": {
+                "input_tokens": input_tokens,
+                "input_tokens_details": {"cached_tokens": 0},
+                "output_tokens": output_tokens,
+                "output_tokens_details": {"reasoning_tokens": 0},
+                "total_tokens": input_tokens + output_tokens,
+            },
+        }
+
+    async def _stream(self, request: web.Request, response: dict[str, Any]) -> web.StreamResponse:
+        stream = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await stream.prepare(request)
+        sequence = 0
+
+        async def send(event: dict[str, Any]) -> None:
+            nonlocal sequence
+            event["sequence_number"] = sequence
+            sequence += 1
+            await stream.write(f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n".encode())
+
+        await send({"type": "response.created", "response": {**response, "status": "in_progress", "output": []}})
+        item = response["output"][0]
+        if item["type"] == "message":
+            text = item["content"][0]["text"]
+            size = max(1, self.config.stream_chunk_chars)
+            for start in range(0, len(text), size):
+                await send(
+                    {
+                        "type": "response.output_text.delta",
+                        "item_id": item["id"],
+                        "output_index": 0,
+                        "content_index": 0,
+                        "delta": text[start : start + size],
+                        "logprobs": [],
+                    }
+                )
+                if self.config.stream_chunk_delay_ms:
+                    await asyncio.sleep(self.config.stream_chunk_delay_ms / 1000)
+        await send({"type": "response.completed", "response": response})
+        await stream.write_eof()
+        return stream
+
+
+def _arguments(parameters: dict[str, Any]) -> dict[str, Any]:
+    # Only the required fields, with placeholder values of the declared type.
+    placeholders = {"string": "stand-in", "integer": 1, "number": 1, "boolean": False, "array": [], "object": {}}
+    properties = parameters.get("properties") or {}
+    return {
+        name: placeholders.get((properties.get(name) or {}).get("type"), "stand-in")
+        for name in parameters.get("required") or []
+    }
+
+
+def _input_text(value: Any) -> str:
+    return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+
+async def _serve(args) -> None:
+    config = FakeConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        tool_rounds=args.tool_rounds,
+        seed=args.seed,
+    )
+    async with FakeResponsesServer(config, host=args.host, port=args.port) as server:
+        print(f"Serving /v1/responses at {server.base_url}", flush=True)
+        await asyncio.Event().wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500, help="e.g. 429 to exercise throttling")
+    parser.add_argument("--tool-rounds", type=int, default=1)
+    parser.add_argument("--seed", type=int)
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
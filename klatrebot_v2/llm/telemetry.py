@@ -0,0 +1,192 @@
+"""Per-call telemetry for Responses API calls, persisted to `llm_calls`."""
+from __future__ import annotations
+
+import logging
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Iterator, TypeVar
+
+from klatrebot_v2.db import connection, llm_calls as llm_calls_db
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+PURPOSES = ("chat", "segment", "rollup", "ambient", "referat")
+
+
+@dataclass(frozen=True)
+class LlmCall:
+    # One of PURPOSES.
+    purpose: str
+    model: str
+    started_at: datetime
+    latency_ms: float
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+    # Rounds of tool outputs sent before this call: 0 for the first call of a reply.
+    tool_rounds: int = 0
+    # "ok" or "error".
+    status: str = "ok"
+    error: str | None = None
+
+
+CallSink = Callable[[LlmCall], None]
+
+# The bot installs its ingest writer here; compiles route their own calls with `recording_to`.
+_default_sink: CallSink | None = None
+_sink: ContextVar[CallSink | None] = ContextVar("llm_call_sink", default=None)
+
+
+def set_default_sink(sink: CallSink | None) -> None:
+    global _default_sink
+    _default_sink = sink
+
+
+@contextmanager
+def recording_to(sink: CallSink) -> Iterator[None]:
+    """Send calls made in this context, and in tasks it starts, to `sink`."""
+    token = _sink.set(sink)
+    try:
+        yield
+    finally:
+        _sink.reset(token)
+
+
+def record(call: LlmCall) -> None:
+    sink = _sink.get() or _default_sink
+    if sink is None:
+        return
+    try:
+        sink(call)
+    except Exception:
+        # Telemetry never fails the call it describes.
+        logger.exception("llm.telemetry record_failed purpose=%s", call.purpose)
+
+
+async def timed(purpose: str, model: str, call: Callable[[], Awaitable[T]], *, tool_rounds: int = 0) -> T:
+    """Await one Responses API call and record its latency, token counts and outcome."""
+    started_at = datetime.now(timezone.utc)
+    started = time.perf_counter()
+    try:
+        resp = await call()
+    except Exception as exc:
+        record(
+            LlmCall(
+                purpose=purpose,
+                model=model,
+                started_at=started_at,
+                latency_ms=(time.perf_counter() - started) * 1000,
+                tool_rounds=tool_rounds,
+                status="error",
+                error=type(exc).__name__,
+            )
+        )
+        raise
+    record(
+        LlmCall(
+            purpose=purpose,
+            model=model,
+            started_at=started_at,
+            latency_ms=(time.perf_counter() - started) * 1000,
+            tool_rounds=tool_rounds,
+            **token_counts(resp),
+        )
+    )
+    return resp
+
+
+def token_counts(resp) -> dict[str, int]:
+    """Input, cached input and output tokens of a response; 0 where the usage block lacks them."""
+    usage = getattr(resp, "usage", None)
+    details = _field(usage, "input_tokens_details")
+    return {
+        "input_tokens": _count(_field(usage, "input_tokens")),
+        "cached_tokens": _count(_field(details, "cached_tokens")),
+        "output_tokens": _count(_field(usage, "output_tokens")),
+    }
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile `q` (0-100) of `values`; 0.0 when there are none."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(q / 100 * len(ordered))) - 1]
+
+
+def call_cost(
+    model: str,
+    *,
+    input_tokens: int,
+    cached_tokens: int,
+    output_tokens: int,
+    prices: dict[str, tuple[float, float, float]],
+) -> float | None:
+    """USD for one call from per-million (input, cached input, output) prices; None if unpriced."""
+    price = prices.get(model)
+    if price is None:
+        return None
+    input_price, cached_price, output_price = price
+    uncached = max(0, input_tokens - cached_tokens)
+    return (uncached * input_price + cached_tokens * cached_price + output_tokens * output_price) / 1_000_000
+
+
+class CallBuffer:
+    """Sink that keeps calls in memory until `flush` writes them on a connection."""
+
+    def __init__(self, *, compiler_run_id: int | None = None) -> None:
+        self.compiler_run_id = compiler_run_id
+        self.calls: list[LlmCall] = []
+
+    def __call__(self, call: LlmCall) -> None:
+        self.calls.append(call)
+
+    async def flush(self, conn) -> int:
+        calls, self.calls = self.calls, []
+        if not calls:
+            return 0
+        writer = connection.writer(conn)
+        try:
+            await llm_calls_db.insert_many(writer, [call_row(call, compiler_run_id=self.compiler_run_id) for call in calls])
+            await writer.commit()
+        except Exception:
+            await writer.rollback()
+            logger.exception("llm.telemetry flush_failed dropped=%d", len(calls))
+            return 0
+        return len(calls)
+
+
+def call_row(call: LlmCall, *, compiler_run_id: int | None = None) -> tuple:
+    return llm_calls_db.call_row(
+        purpose=call.purpose,
+        model=call.model,
+        started_at_utc=call.started_at,
+        latency_ms=call.latency_ms,
+        input_tokens=call.input_tokens,
+        cached_tokens=call.cached_tokens,
+        output_tokens=call.output_tokens,
+        tool_rounds=call.tool_rounds,
+        status=call.status,
+        error=call.error,
+        compiler_run_id=compiler_run_id,
+    )
+
+
+def _field(value, key: str):
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        return value.get(key)
+    return getattr(value, key, None)
+
+
+def _count(value) -> int:
+    # Test doubles answer every attribute; only real integers are token counts.
+    return value if isinstance(value, int) and not isinstance(value, bool) else 0
@@ -2,18 +2,19 @@
 import argparse
 import asyncio
 import json
-import socket
-import uuid
 from datetime import datetime, timedelta, timezone
+from pathlib import Path
 
-from klatrebot_v2.db import connection, migrations, user_aliases
+from klatrebot_v2.db import connection, llm_calls as llm_calls_db, migrations, user_aliases
+from klatrebot_v2.llm import telemetry
 from klatrebot_v2.llm.client import get_client
 from klatrebot_v2.llm.prompt import load_soul
+from klatrebot_v2.memory.batch import OpenAIBatchBackend, compile_batch
 from klatrebot_v2.memory.compiler import CompilerConfig, compile_run
-from klatrebot_v2.memory.segmentation import SegmentConfig
+from klatrebot_v2.memory.rolling import compile_rolling, lock_owner, segment_config_from_settings
 from klatrebot_v2.memory import store
 from klatrebot_v2.memory.store import get_compiler_run_by_name
-from klatrebot_v2.memory.tools import MEMORY_TOOL_DEFS, execute_memory_tool
+from klatrebot_v2.memory.tools import MEMORY_TOOL_DEFS, execute_memory_tool, execute_memory_tool_calls
 from klatrebot_v2.settings import get_settings
 
 
@@ -26,6 +27,8 @@ async def main(argv: list[str] | None = None) -> int:
         return await _compile_rolling()
     if args.command == "chat":
         return await _chat(args)
+    if args.command == "stats":
+        return await _stats(args)
     parser.print_help()
     return 2
 
@@ -45,7 +48,8 @@ async def chat_once(
 ) -> str:
     s = get_settings()
     effective_channel_id = channel_id or s.discord_main_channel_id
-    alias_map = await user_aliases.format_alias_prompt_map(conn)
+    async with connection.reader(conn) as read_conn:
+        alias_map = await user_aliases.format_alias_prompt_map(read_conn)
     client = get_client()
     prompt = (
         f"{load_soul()}\n\n"
@@ -58,12 +62,16 @@ async def chat_once(
         f"RECENT CLI CHAT:\n{_format_recent_context(recent_context)}\n\n"
         f"QUESTION: {question}"
     )
-    resp = await client.responses.create(
-        model=s.model,
-        input=prompt,
-        tools=MEMORY_TOOL_DEFS,
-        reasoning={"effort": "low"},
-        text={"verbosity": "medium"},
+    resp = await telemetry.timed(
+        "chat",
+        s.model,
+        lambda: client.responses.create(
+            model=s.model,
+            input=prompt,
+            tools=MEMORY_TOOL_DEFS,
+            reasoning={"effort": "low"},
+            text={"verbosity": "medium"},
+        ),
     )
     usage_total = _empty_usage()
     _add_usage(usage_total, resp)
@@ -86,12 +94,15 @@ async def chat_once(
                     "effective_arguments": arguments,
                 }
             )
-            output = await execute_memory_tool(
-                conn,
-                run_id=run_id,
-                name=call["name"],
-                arguments=arguments,
-            )
+            call["arguments"] = arguments
+        outputs = await execute_memory_tool_calls(
+            conn,
+            calls,
+            run_id=run_id,
+            timeout_s=s.memory_tool_timeout_seconds,
+            execute=execute_memory_tool,
+        )
+        for call, output in zip(calls, outputs):
             debug_outputs.append((call["name"], output))
             tool_outputs.append(
                 {
@@ -109,13 +120,19 @@ async def chat_once(
         if show_memory:
             for name, output in debug_outputs:
                 print(f"\n[{name}]\n{_pretty_json(output)}")
-        resp = await client.responses.create(
-            model=s.model,
-            input=tool_outputs,
-            tools=MEMORY_TOOL_DEFS,
-            previous_response_id=getattr(resp, "id"),
-            reasoning={"effort": "low"},
-            text={"verbosity": "medium"},
+        previous_response_id = getattr(resp, "id")
+        resp = await telemetry.timed(
+            "chat",
+            s.model,
+            lambda: client.responses.create(
+                model=s.model,
+                input=tool_outputs,
+                tools=MEMORY_TOOL_DEFS,
+                previous_response_id=previous_response_id,
+                reasoning={"effort": "low"},
+                text={"verbosity": "medium"},
+            ),
+            tool_rounds=response_calls,
         )
         _add_usage(usage_total, resp)
         response_calls += 1
@@ -143,12 +160,50 @@ def _build_parser() -> argparse.ArgumentParser:
     compile_parser.add_argument("--channel-id", action="append", type=int, default=[])
     compile_parser.add_argument("--name", required=True)
     compile_parser.add_argument("--model")
-    compile_parser.add_argument("--concurrency", type=int, default=4)
+    compile_parser.add_argument("--concurrency", type=int, default=4, help="Initial number of concurrent LLM calls")
+    compile_parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=16,
+        help="Upper bound the concurrency window may grow to while the API keeps up",
+    )
+    compile_parser.add_argument(
+        "--retry-budget",
+        type=int,
+        help="Retries the run may spend before earning more from successful calls (default from settings)",
+    )
+    compile_parser.add_argument(
+        "--retry-ratio",
+        type=float,
+        help="Retries earned per successful LLM call (default from settings)",
+    )
+    compile_parser.add_argument(
+        "--pack-tokens",
+        type=int,
+        help="Pack small segments into shared requests up to this many prompt tokens (default from settings)",
+    )
     compile_parser.add_argument(
         "--rebuild",
         action="store_true",
         help="Delete and rebuild an existing memory run instead of updating it",
     )
+    compile_parser.add_argument(
+        "--full-rollups",
+        action="store_true",
+        help="Rebuild daily ambient memory and rollups for every period, not only those touched since the last compile",
+    )
+    batch_mode = compile_parser.add_mutually_exclusive_group()
+    batch_mode.add_argument(
+        "--batch",
+        action="store_true",
+        help="Queue missing summaries as an OpenAI Batch API job instead of calling the API live",
+    )
+    batch_mode.add_argument(
+        "--collect",
+        action="store_true",
+        help="Ingest the run's finished batch and submit the next round, if any",
+    )
+    compile_parser.add_argument("--batch-dir", help="Where batch JSONL files are kept (default: next to --db)")
 
     sub.add_parser("compile-rolling")
 
@@ -161,6 +216,10 @@ def _build_parser() -> argparse.ArgumentParser:
     chat_parser.add_argument("--show-agent", action="store_true")
     chat_parser.add_argument("--channel-id", type=int)
     chat_parser.add_argument("--recent-limit", type=int, default=8)
+
+    stats_parser = sub.add_parser("stats", help="Latency, token spend and cost of recorded LLM calls")
+    stats_parser.add_argument("--db", required=True)
+    stats_parser.add_argument("--days", type=int, default=7, help="Report calls from the last N days")
     return parser
 
 
@@ -168,22 +227,38 @@ async def _compile(args) -> int:
     conn = await connection.open(args.db)
     try:
         await migrations.run(conn)
-        await user_aliases.sync_config_aliases(conn, get_settings().user_aliases_config_path)
-        run_id = await compile_run(
-            conn,
-            config=CompilerConfig(
-                name=args.name,
-                from_time=_parse_dt(args.from_time),
-                to_time=_parse_dt(args.to_time),
-                channel_ids=args.channel_id or None,
-                compiler_model=args.model,
-                source_db_label=args.db,
-                concurrency=args.concurrency,
-                rebuild=args.rebuild,
-                segment=_segment_config_from_settings(),
+        settings = get_settings()
+        await user_aliases.sync_config_aliases(conn, settings.user_aliases_config_path)
+        config = CompilerConfig(
+            name=args.name,
+            from_time=_parse_dt(args.from_time),
+            to_time=_parse_dt(args.to_time),
+            channel_ids=args.channel_id or None,
+            compiler_model=args.model,
+            source_db_label=args.db,
+            concurrency=args.concurrency,
+            max_concurrency=args.max_concurrency,
+            retry_budget=args.retry_budget if args.retry_budget is not None else settings.memory_compiler_retry_budget,
+            retry_ratio=args.retry_ratio if args.retry_ratio is not None else settings.memory_compiler_retry_ratio,
+            full_rollups=args.full_rollups,
+            rebuild=args.rebuild and not args.collect,
+            pack_token_budget=(
+                args.pack_tokens if args.pack_tokens is not None else settings.memory_compiler_pack_token_budget
             ),
-            progress=lambda message: print(message, flush=True),
+            segment=segment_config_from_settings(),
         )
+        progress = lambda message: print(message, flush=True)
+        if args.batch or args.collect:
+            run_id = await compile_batch(
+                conn,
+                config=config,
+                backend=OpenAIBatchBackend(get_client()),
+                batch_dir=Path(args.batch_dir) if args.batch_dir else Path(args.db).with_suffix(".batches"),
+                collect=args.collect,
+                progress=progress,
+            )
+        else:
+            run_id = await compile_run(conn, config=config, progress=progress)
         print(f"compiled run {run_id}: {args.name}")
         return 0
     finally:
@@ -198,72 +273,43 @@ async def _compile_rolling() -> int:
 
     conn = await connection.open(s.db_path)
     run_name = s.memory_rolling_run_name
-    lock_owner = f"{socket.gethostname()}:{uuid.uuid4()}"
-    now = _utcnow()
     try:
         await migrations.run(conn)
         await user_aliases.sync_config_aliases(conn, s.user_aliases_config_path)
-        locked = await store.acquire_rolling_lock(
-            conn,
-            run_name=run_name,
-            owner=lock_owner,
-            now=now,
-            lock_expires_at=now + timedelta(minutes=s.memory_rolling_lock_ttl_minutes),
-        )
-        if not locked:
-            print(f"Rolling memory compile already active for '{run_name}'.")
-            return 0
-
-        state = await store.get_rolling_state(conn, run_name)
-        from_time, to_time = _rolling_window(now=now, state=state, settings=s)
-        if to_time <= from_time:
-            await store.release_rolling_lock(conn, run_name=run_name)
-            print(f"Nothing to compile for rolling memory run '{run_name}'.")
-            return 0
-
-        print(
-            "Rolling memory window: "
-            f"{from_time.isoformat()} -> {to_time.isoformat()} "
-            f"(run '{run_name}').",
-            flush=True,
-        )
-        run_id = await compile_run(
+        result = await compile_rolling(
             conn,
-            config=CompilerConfig(
-                name=run_name,
-                from_time=from_time,
-                to_time=to_time,
-                channel_ids=[s.discord_main_channel_id],
-                compiler_model=s.memory_compiler_model,
-                source_db_label=s.db_path,
-                concurrency=s.memory_rolling_concurrency,
-                rebuild=False,
-                segment=_segment_config_from_settings(),
-            ),
+            settings=s,
+            owner=lock_owner("timer"),
+            clock=_utcnow,
+            compile=compile_run,
             progress=lambda message: print(message, flush=True),
         )
-        await store.complete_rolling_compile(
-            conn,
-            run_name=run_name,
-            completed_to=to_time,
-            completed_at=_utcnow(),
-        )
-        print(f"rolling compiled run {run_id}: {run_name}")
-        return 0
     except Exception as exc:
         await store.fail_rolling_compile(conn, run_name=run_name, error=str(exc))
         print(f"Rolling memory compile failed for '{run_name}': {exc}")
         return 1
     finally:
         await connection.close(conn)
+    if result.status == "locked":
+        print(f"Rolling memory compile already active for '{run_name}'.")
+    elif result.status == "empty":
+        print(f"Nothing to compile for rolling memory run '{run_name}'.")
+    elif result.status == "failed":
+        print(f"Rolling memory compile failed for '{run_name}': {result.error}")
+        return 1
+    else:
+        print(f"rolling compiled run {result.run_id}: {run_name}")
+    return 0
 
 
 async def _chat(args) -> int:
-    conn = await connection.open(args.db)
+    db = await connection.open_database(args.db, readers=get_settings().db_reader_pool_size)
+    conn = db.writer
     try:
         await migrations.run(conn)
         await user_aliases.sync_config_aliases(conn, get_settings().user_aliases_config_path)
         recent_context: list[str] = []
+        calls = telemetry.CallBuffer()
         while True:
             try:
                 question = input("!gpt> ").strip()
@@ -271,26 +317,114 @@ async def _chat(args) -> int:
                 break
             if not question or question.lower() in {"exit", "quit"}:
                 break
-            answer = await chat_once(
-                conn,
-                run_id=await resolve_run_id(conn, args.run),
-                question=question,
-                recent_context=recent_context[-args.recent_limit :] if args.recent_limit > 0 else [],
-                show_memory=args.show_memory,
-                show_sources=args.show_sources,
-                show_usage=args.show_usage,
-                show_agent=args.show_agent,
-                channel_id=args.channel_id,
-                recent_limit=args.recent_limit,
-            )
+            with telemetry.recording_to(calls):
+                answer = await chat_once(
+                    db,
+                    run_id=await resolve_run_id(conn, args.run),
+                    question=question,
+                    recent_context=recent_context[-args.recent_limit :] if args.recent_limit > 0 else [],
+                    show_memory=args.show_memory,
+                    show_sources=args.show_sources,
+                    show_usage=args.show_usage,
+                    show_agent=args.show_agent,
+                    channel_id=args.channel_id,
+                    recent_limit=args.recent_limit,
+                )
+            await calls.flush(db)
             print(f"KlatreBot> {answer}")
             if args.recent_limit > 0:
                 recent_context.extend([f"User: {question}", f"KlatreBot: {answer}"])
                 recent_context = recent_context[-args.recent_limit :]
         return 0
+    finally:
+        await db.close()
+
+
+_COMPILE_PURPOSES = {"segment", "rollup", "ambient"}
+
+
+async def _stats(args) -> int:
+    since = _utcnow() - timedelta(days=args.days)
+    prices = get_settings().llm_prices_per_million_tokens
+    # A report never migrates the database it reads.
+    conn = await connection.open_reader(args.db)
+    try:
+        version = await migrations.current_version(conn)
+        if version < migrations.LATEST_VERSION:
+            print(
+                f"Database schema is at version {version}, but stats needs {migrations.LATEST_VERSION}; "
+                "start the bot or run a compile to migrate it."
+            )
+            return 1
+        rows = await llm_calls_db.calls_since(conn, since)
+        # Per-segment cost only counts segments of the runs whose calls are in the cost.
+        compile_runs = {row[9] for row in rows if row[0] in _COMPILE_PURPOSES and row[9] is not None}
+        segments = await store.count_summarized_segments_since(conn, since, run_ids=compile_runs)
     finally:
         await connection.close(conn)
 
+    print(f"LLM calls since {since.isoformat(timespec='seconds')} ({args.days} days): {len(rows)}")
+    latencies: dict[str, list[float]] = {}
+    errors: dict[str, int] = {}
+    days: dict[str, list[int]] = {}
+    day_cost: dict[str, float | None] = {}
+    compile_cost: float | None = 0.0
+    compile_calls = 0
+    for purpose, model, started_at, latency_ms, input_tokens, cached_tokens, output_tokens, _, status, _ in rows:
+        latencies.setdefault(purpose, []).append(latency_ms)
+        errors[purpose] = errors.get(purpose, 0) + (status != "ok")
+        day = started_at[:10]
+        totals = days.setdefault(day, [0, 0, 0])
+        totals[0] += input_tokens
+        totals[1] += cached_tokens
+        totals[2] += output_tokens
+        cost = telemetry.call_cost(
+            model,
+            input_tokens=input_tokens,
+            cached_tokens=cached_tokens,
+            output_tokens=output_tokens,
+            prices=prices,
+        )
+        day_cost[day] = _add_cost(day_cost.get(day, 0.0), cost)
+        if purpose in _COMPILE_PURPOSES:
+            compile_calls += 1
+            compile_cost = _add_cost(compile_cost, cost)
+
+    print("\n[latency]")
+    for purpose in sorted(latencies, key=lambda p: telemetry.PURPOSES.index(p) if p in telemetry.PURPOSES else 99):
+        values = latencies[purpose]
+        print(
+            f"{purpose}: calls={len(values)} errors={errors[purpose]} "
+            f"p50={telemetry.percentile(values, 50):.0f}ms p95={telemetry.percentile(values, 95):.0f}ms"
+        )
+    print("\n[tokens per day]")
+    for day in sorted(days):
+        input_tokens, cached_tokens, output_tokens = days[day]
+        print(
+            f"{day}: input={input_tokens} cached={cached_tokens} output={output_tokens} "
+            f"cost={_format_cost(day_cost[day])}"
+        )
+    print("\n[compile]")
+    per_segment = compile_cost / segments if compile_cost is not None and segments else None
+    print(
+        f"segments_summarized: {segments}\n"
+        f"compiler_calls: {compile_calls}\n"
+        f"cost: {_format_cost(compile_cost)}\n"
+        f"cost_per_segment: {_format_cost(per_segment)}"
+    )
+    return 0
+
+
+def _add_cost(total: float | None, cost: float | None) -> float | None:
+    # One unpriced call makes the total unknown rather than silently low.
+    if total is None or cost is None:
+        return None
+    return total + cost
+
+
+def _format_cost(cost: float | None) -> str:
+    return "n/a" if cost is None else f"${cost:.4f}"
+
 
 def _extract_function_calls(resp) -> list[dict]:
     calls = []
@@ -326,36 +460,12 @@ def _utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
 
-def _rolling_window(*, now: datetime, state: dict | None, settings) -> tuple[datetime, datetime]:
-    to_time = now - timedelta(minutes=settings.memory_rolling_settle_minutes)
-    last_to = None
-    if state and state.get("last_successful_to_utc"):
-        last_to = datetime.fromisoformat(state["last_successful_to_utc"])
-    if last_to is None:
-        from_time = now - timedelta(hours=settings.memory_rolling_initial_lookback_hours)
-    else:
-        from_time = last_to - timedelta(minutes=settings.memory_rolling_tail_buffer_minutes)
-    return from_time, to_time
-
-
 def _format_recent_context(recent_context: list[str] | None) -> str:
     if not recent_context:
         return "(none)"
     return "\n".join(recent_context)
 
 
-def _segment_config_from_settings() -> SegmentConfig:
-    s = get_settings()
-    return SegmentConfig(
-        gap_minutes=s.memory_segment_gap_minutes,
-        min_human_messages=s.memory_segment_min_human_messages,
-        min_total_chars=s.memory_segment_min_total_chars,
-        min_participants=s.memory_segment_min_participants,
-        max_messages=s.memory_segment_max_messages,
-        max_duration_minutes=s.memory_segment_max_duration_minutes,
-    )
-
-
 def _pretty_json(raw: str) -> str:
     try:
         return json.dumps(json.loads(raw), ensure_ascii=False, indent=2)
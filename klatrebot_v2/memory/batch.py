@@ -0,0 +1,287 @@
+"""Offline Batch API mode for the memory compiler.
+
+A batch compile advances in rounds. Each round runs `compile_run` with
+summarizers that answer from the summary cache and queue every miss as a
+Batch API request; the queued requests are submitted as one JSONL file.
+Collecting a finished batch writes its results into the cache and starts the
+next round, which persists them through the normal compile path and queues
+whatever now depends on them (weekly rollups, then monthly rollups). Results
+that errored or did not validate fail their segment or rollup in that round,
+as a failed live call would, instead of being queued again.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import shutil
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Protocol
+
+import aiosqlite
+from pydantic import BaseModel, ValidationError
+
+from klatrebot_v2.memory import store
+from klatrebot_v2.memory.compiler import (
+    BatchDeferred,
+    CompilerConfig,
+    ProgressCallback,
+    RollupInput,
+    RollupSummary,
+    SegmentSummary,
+    _build_rollup_prompt,
+    _build_summary_prompt,
+    _progress,
+    _rollup_cache_payload,
+    _segment_cache_payload,
+    _summary_cache_key,
+    compile_run,
+    summary_request_body,
+)
+from klatrebot_v2.memory.segmentation import SegmentCandidate
+from klatrebot_v2.settings import get_settings
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = "/v1/responses"
+_RUNNING_STATUSES = {"validating", "in_progress", "finalizing"}
+_SCHEMAS: dict[str, type[BaseModel]] = {"segment": SegmentSummary, "rollup": RollupSummary}
+
+
+class BatchBackend(Protocol):
+    async def submit(self, input_path: Path) -> str: ...
+
+    async def status(self, batch_id: str) -> str: ...
+
+    async def download(self, batch_id: str, output_path: Path) -> bool: ...
+
+
+class OpenAIBatchBackend:
+    """Batch API through the configured OpenAI client."""
+
+    def __init__(self, client) -> None:
+        self.client = client
+
+    async def submit(self, input_path: Path) -> str:
+        with input_path.open("rb") as fh:
+            uploaded = await self.client.files.create(file=fh, purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window="24h",
+        )
+        return batch.id
+
+    async def status(self, batch_id: str) -> str:
+        return (await self.client.batches.retrieve(batch_id)).status
+
+    async def download(self, batch_id: str, output_path: Path) -> bool:
+        batch = await self.client.batches.retrieve(batch_id)
+        if not batch.output_file_id:
+            return False
+        content = await self.client.files.content(batch.output_file_id)
+        output_path.write_bytes(content.read())
+        return True
+
+
+class LocalBatchBackend:
+    """Stand-in that answers a batch file at submit time, for tests and dry runs.
+
+    `respond` receives each request body and returns the response's output text.
+    """
+
+    def __init__(self, directory: Path, respond: Callable[[dict[str, Any]], str]) -> None:
+        self.directory = directory
+        self.respond = respond
+        self.submitted: list[Path] = []
+
+    async def submit(self, input_path: Path) -> str:
+        batch_id = f"local-{uuid.uuid4().hex}"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with input_path.open(encoding="utf-8") as src, self._output(batch_id).open("w", encoding="utf-8") as out:
+            for line in src:
+                request = json.loads(line)
+                text = self.respond(request["body"])
+                body = {"output": [{"type": "message", "content": [{"type": "output_text", "text": text}]}]}
+                result = {"custom_id": request["custom_id"], "response": {"status_code": 200, "body": body}}
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self.submitted.append(input_path)
+        return batch_id
+
+    async def status(self, batch_id: str) -> str:
+        return "completed" if self._output(batch_id).exists() else "failed"
+
+    async def download(self, batch_id: str, output_path: Path) -> bool:
+        if not self._output(batch_id).exists():
+            return False
+        shutil.copyfile(self._output(batch_id), output_path)
+        return True
+
+    def _output(self, batch_id: str) -> Path:
+        return self.directory / f"{batch_id}.output.jsonl"
+
+
+class BatchQueue:
+    """Summarizers for `compile_run` that serve cached results and queue the rest.
+
+    `failures` maps custom ids from the collected batch to their error; those
+    raise instead of being queued, so `compile_run` records them as failed.
+    """
+
+    def __init__(self, conn: aiosqlite.Connection, *, model: str, failures: dict[str, str] | None = None) -> None:
+        self.conn = conn
+        self.model = model
+        self.failures = failures or {}
+        self.requests: dict[str, dict[str, Any]] = {}
+        self.cache_hits = 0
+
+    async def segment(self, segment: SegmentCandidate) -> SegmentSummary:
+        cache_key = _summary_cache_key("segment", _segment_cache_payload(segment), self.model)
+        return await self._answer("segment", cache_key, lambda: _build_summary_prompt(segment))
+
+    async def rollup(self, rollup: RollupInput) -> RollupSummary:
+        cache_key = _summary_cache_key("rollup", _rollup_cache_payload(rollup), self.model)
+        return await self._answer("rollup", cache_key, lambda: _build_rollup_prompt(rollup))
+
+    async def _answer(self, kind: str, cache_key: str, prompt: Callable[[], str]) -> Any:
+        cached = await store.get_cached_summary(self.conn, cache_key)
+        if cached is not None:
+            self.cache_hits += 1
+            return _SCHEMAS[kind].model_validate_json(cached)
+        custom_id = f"{kind}:{cache_key}"
+        if custom_id in self.failures:
+            raise ValueError(self.failures[custom_id])
+        self.requests[custom_id] = summary_request_body(prompt(), model=self.model)
+        raise BatchDeferred(kind)
+
+
+async def compile_batch(
+    conn: aiosqlite.Connection,
+    *,
+    config: CompilerConfig,
+    backend: BatchBackend,
+    batch_dir: Path,
+    collect: bool = False,
+    progress: ProgressCallback | None = None,
+) -> int:
+    """Run one batch round: collect the previous batch if asked, compile, submit what is missing."""
+    model = config.compiler_model or get_settings().memory_compiler_model
+    existing = await store.get_compiler_run_by_name(conn, config.name)
+    open_batch = await store.get_open_compiler_batch(conn, int(existing["id"])) if existing else None
+    failures: dict[str, str] = {}
+    if collect:
+        if open_batch is None:
+            raise ValueError(f"No submitted batch for memory run '{config.name}'.")
+        status = await backend.status(open_batch["batch_id"])
+        if status in _RUNNING_STATUSES:
+            _progress(progress, f"Batch {open_batch['batch_id']} is {status}; collect again later.")
+            return int(existing["id"])
+        failures = await _collect(conn, open_batch, backend=backend, batch_dir=batch_dir, model=model, progress=progress)
+    elif open_batch is not None:
+        raise ValueError(f"Memory run '{config.name}' has a submitted batch; use --collect.")
+
+    queue = BatchQueue(conn, model=model, failures=failures)
+    run_id = await compile_run(
+        conn,
+        config=config,
+        summarizer=queue.segment,
+        rollup_summarizer=queue.rollup,
+        progress=progress,
+    )
+    if not queue.requests:
+        return run_id
+    batch_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    input_path = batch_dir / f"{config.name}-{stamp}.jsonl"
+    write_batch_file(input_path, queue.requests)
+    batch_id = await backend.submit(input_path)
+    await store.insert_compiler_batch(conn, run_id=run_id, batch_id=batch_id, request_count=len(queue.requests))
+    logger.info("memory.batch submitted run_id=%d batch_id=%s requests=%d", run_id, batch_id, len(queue.requests))
+    _progress(
+        progress,
+        f"Submitted batch {batch_id} with {len(queue.requests)} requests; run compile --collect when it completes.",
+    )
+    return run_id
+
+
+def write_batch_file(path: Path, requests: dict[str, dict[str, Any]]) -> None:
+    with path.open("w", encoding="utf-8") as fh:
+        for custom_id, body in requests.items():
+            line = {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+            fh.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+
+def read_batch_results(path: Path) -> dict[str, str | None]:
+    """Output text per custom id; None for requests that errored."""
+    results: dict[str, str | None] = {}
+    with path.open(encoding="utf-8") as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            response = row.get("response") or {}
+            if row.get("error") or response.get("status_code") != 200:
+                results[row["custom_id"]] = None
+                continue
+            results[row["custom_id"]] = _output_text(response.get("body") or {})
+    return results
+
+
+async def _collect(
+    conn: aiosqlite.Connection,
+    batch: dict[str, Any],
+    *,
+    backend: BatchBackend,
+    batch_dir: Path,
+    model: str,
+    progress: ProgressCallback | None,
+) -> dict[str, str]:
+    """Cache the batch's valid results; returns the error of each one that was not."""
+    batch_dir.mkdir(parents=True, exist_ok=True)
+    output_path = batch_dir / f"{batch['batch_id']}.output.jsonl"
+    if not await backend.download(batch["batch_id"], output_path):
+        await store.finish_compiler_batch(conn, int(batch["id"]), status="failed")
+        _progress(progress, f"Batch {batch['batch_id']} produced no output; its requests will be queued again.")
+        return {}
+    stored = 0
+    failures: dict[str, str] = {}
+    async with store.unit_of_work(conn):
+        for custom_id, text in read_batch_results(output_path).items():
+            kind, _, cache_key = custom_id.partition(":")
+            schema = _SCHEMAS.get(kind)
+            if schema is None or text is None:
+                failures[custom_id] = f"Batch request {custom_id} returned no result."
+                continue
+            try:
+                summary = schema.model_validate_json(text)
+            except ValidationError as exc:
+                failures[custom_id] = f"Batch result for {kind} did not validate: {exc}"
+                continue
+            await store.put_cached_summary(
+                conn,
+                cache_key=cache_key,
+                kind=kind,
+                model=model,
+                response_json=summary.model_dump_json(),
+                commit=False,
+            )
+            stored += 1
+    await store.finish_compiler_batch(conn, int(batch["id"]), status="collected")
+    logger.info("memory.batch collected batch_id=%s stored=%d failed=%d", batch["batch_id"], stored, len(failures))
+    _progress(progress, f"Collected batch {batch['batch_id']}: {stored} results, {len(failures)} failed.")
+    return failures
+
+
+def _output_text(body: dict[str, Any]) -> str | None:
+    if body.get("output_text"):
+        return body["output_text"]
+    parts = [
+        content.get("text", "")
+        for item in body.get("output") or []
+        if item.get("type") == "message"
+        for content in item.get("content") or []
+        if content.get("type") == "output_text"
+    ]
+    return "".join(parts) if parts else None
@@ -4,23 +4,30 @@ import hashlib
 from dataclasses import asdict, dataclass, field
 from datetime import datetime, time, timedelta
 import json
+import logging
 from typing import Any, Awaitable, Callable
 
 import aiosqlite
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 
+from klatrebot_v2.llm import telemetry
 from klatrebot_v2.llm.client import get_client
 from klatrebot_v2.memory import store
+from klatrebot_v2.memory.limiter import AdaptiveLimiter
+from klatrebot_v2.memory.segment_index import IndexedSegment, load_segment_index
 from klatrebot_v2.memory.segmentation import (
     SegmentCandidate,
     SegmentConfig,
-    build_segments,
+    SegmentSpan,
     is_meaningful,
+    iter_segments,
 )
 from klatrebot_v2.memory.tags import normalize_tags
 from klatrebot_v2.settings import get_settings
 
 
+logger = logging.getLogger(__name__)
+
 MEMORY_ITEM_TYPES = {"decision", "plan", "preference", "fact", "opinion", "open_question", "lore"}
 CONFIDENCE_VALUES = {"low", "medium", "high"}
 IMPORTANCE_VALUES = {"low", "normal", "high"}
@@ -57,6 +64,10 @@ class CompileStats:
     weekly_rollups_failed: int = 0
     monthly_rollups_completed: int = 0
     monthly_rollups_failed: int = 0
+    segment_cache_hits: int = 0
+    rollup_cache_hits: int = 0
+    segments_deferred: int = 0
+    rollups_deferred: int = 0
 
 
 class RollupSummary(BaseModel):
@@ -85,15 +96,38 @@ class CompilerConfig:
     compiler_model: str | None = None
     source_db_label: str | None = None
     concurrency: int = 4
+    # Ceiling the adaptive window may grow to; never below `concurrency`.
+    max_concurrency: int = 16
+    # Retries the run may spend up front, plus this many per successful LLM call.
+    retry_budget: int = 20
+    retry_ratio: float = 0.1
     resume: bool = False
     rebuild: bool = False
+    # Pack small segments into shared LLM requests up to this many prompt tokens; 0 disables.
+    pack_token_budget: int = 0
+    # Rebuild every day, week and month of the run instead of only the touched ones.
+    full_rollups: bool = False
     segment: SegmentConfig = field(default_factory=SegmentConfig)
 
 
+class BatchDeferred(Exception):
+    """Raised by a summarizer that queued its request for the Batch API instead of answering.
+
+    Deferred segments and rollups are left unpersisted, so the next compile plans them again.
+    """
+
+
 Summarizer = Callable[[SegmentCandidate], Awaitable[SegmentSummary]]
+# One result per segment, in order; an exception marks only that segment failed.
+PackSummarizer = Callable[[list[SegmentCandidate]], Awaitable[list[SegmentSummary | Exception]]]
 RollupSummarizer = Callable[[RollupInput], Awaitable[RollupSummary]]
 ProgressCallback = Callable[[str], None]
 
+# Planning commits after this many segment deletes/inserts, or once its oldest
+# uncommitted write is this old, whichever comes first.
+_PLANNING_BATCH_WRITES = 200
+_PLANNING_BATCH_SECONDS = 0.25
+
 
 async def compile_run(
     conn: aiosqlite.Connection,
@@ -124,107 +158,185 @@ async def compile_run(
     )
     usage = TokenUsage()
     stats = CompileStats()
-    summarizer = summarizer or (lambda segment: summarize_segment_with_llm(segment, model=model, usage=usage))
-    rollup_summarizer = rollup_summarizer or (
-        lambda rollup: summarize_rollup_with_llm(rollup, model=model, usage=usage)
+    calls = telemetry.CallBuffer(compiler_run_id=run_id)
+    db_lock = asyncio.Lock()
+    # One window for every LLM call of the run: segments first, then days, weeks and months.
+    limiter = AdaptiveLimiter(
+        initial=max(1, config.concurrency),
+        maximum=max(config.concurrency, config.max_concurrency),
+        retry_budget=config.retry_budget,
+        retry_ratio=config.retry_ratio,
     )
-    try:
-        messages = await store.load_messages(
-            conn,
-            from_time=config.from_time,
-            to_time=config.to_time,
-            channel_ids=config.channel_ids,
-        )
-        _progress(progress, f"Loaded {len(messages)} messages.")
-        segments = build_segments(messages, config.segment)
-        _progress(progress, f"Built {len(segments)} segments.")
-        db_lock = asyncio.Lock()
-        pending = []
-        for index, segment in enumerate(segments):
-            segment_key = _segment_key(segment)
-            existing_segment = await store.get_segment_by_key(conn, run_id=run_id, segment_key=segment_key)
-            if existing_segment and existing_segment["status"] in {"summarized", "skipped"}:
-                stats.segments_existing += 1
-                continue
-            overlapping = await store.overlapping_segments_for_messages(
-                conn,
-                run_id=run_id,
-                channel_id=segment.channel_id,
-                message_ids=[m.discord_message_id for m in segment.messages],
-            )
-            existing_segment_id = int(existing_segment["id"]) if existing_segment else None
-            for overlap in overlapping:
-                overlap_id = int(overlap["id"])
-                if overlap_id == existing_segment_id:
-                    continue
-                await store.delete_segment_tree(conn, overlap_id)
-            retry_count = 0
-            if existing_segment:
-                retry_count = int(existing_segment.get("retry_count") or 0) + 1
-                stats.segments_retried += 1
-                await store.delete_segment_tree(conn, int(existing_segment["id"]))
-            else:
-                stats.segments_missing += 1
-            if not is_meaningful(segment, config.segment):
-                await _persist_skipped_segment(
-                    conn,
-                    run_id=run_id,
-                    segment=segment,
-                    segment_key=segment_key,
-                    retry_count=retry_count,
-                )
-                stats.segments_skipped += 1
-                continue
-            pending.append((index, segment_key, retry_count))
-        _progress(
-            progress,
-            "Segments: "
-            f"existing={stats.segments_existing}, missing={stats.segments_missing}, "
-            f"retry={stats.segments_retried}, pending={len(pending)}.",
+    # Only the built-in LLM path is cached and packed; injected summarizers always run alone.
+    pack_summarizer: PackSummarizer | None = None
+    if summarizer is None and config.pack_token_budget > 0:
+        pack_summarizer = lambda segments: _cached_pack_summary(
+            conn, segments, model=model, usage=usage, stats=stats, db_lock=db_lock
         )
-        await _summarize_segments(
+    summarizer = summarizer or (
+        lambda segment: _cached_llm_summary(
             conn,
-            run_id,
-            segments,
-            pending=pending,
-            summarizer=summarizer,
-            concurrency=config.concurrency,
-            progress=progress,
-            db_lock=db_lock,
-            stats=stats,
-        )
-        await _build_daily_ambient_memory(
-            conn,
-            run_id=run_id,
-            ambient_summarizer=rollup_summarizer,
-            progress=progress,
+            kind="segment",
+            payload=_segment_cache_payload(segment),
+            model=model,
+            parse=SegmentSummary,
+            call=lambda: summarize_segment_with_llm(segment, model=model, usage=usage),
             stats=stats,
+            db_lock=db_lock,
         )
-        await _build_rollups(
+    )
+    rollup_summarizer = rollup_summarizer or (
+        lambda rollup: _cached_llm_summary(
             conn,
-            run_id=run_id,
-            rollup_summarizer=rollup_summarizer,
-            progress=progress,
+            kind="rollup",
+            payload=_rollup_cache_payload(rollup),
+            model=model,
+            parse=RollupSummary,
+            call=lambda: summarize_rollup_with_llm(rollup, model=model, usage=usage),
             stats=stats,
+            db_lock=db_lock,
         )
-        await store.complete_compiler_run(conn, run_id)
-        _report_counts(progress, stats)
-        _report_usage(progress, usage)
-        _progress(progress, f"Completed memory run '{config.name}'.")
-    except Exception as exc:
-        await store.fail_compiler_run(conn, run_id, str(exc))
-        raise
+    )
+    # Every Responses call of the run, including those in tasks it starts, is buffered in `calls`.
+    with telemetry.recording_to(calls):
+        try:
+            messages = store.iter_messages(
+                conn,
+                from_time=config.from_time,
+                to_time=config.to_time,
+                channel_ids=config.channel_ids,
+            )
+            pending: list[tuple[SegmentSpan, str, int, int]] = []
+            touched: list[tuple[int, str, datetime]] = []
+            message_count = segment_count = 0
+            index = await load_segment_index(
+                conn,
+                run_id=run_id,
+                from_time=config.from_time,
+                to_time=config.to_time,
+                channel_ids=config.channel_ids,
+            )
+            # Segments are planned as the message stream closes them; only the
+            # bounds of pending ones are kept, so memory tracks the largest segment.
+            # Deletes and skipped segments from planning are committed in small
+            # batches, together with the periods they dirty, so the write lock is
+            # never held across the whole scan while the bot is ingesting.
+            clock = asyncio.get_running_loop().time
+            batch_writes = 0
+            batch_started = 0.0
+
+            def note_write() -> None:
+                nonlocal batch_writes, batch_started
+                if not batch_writes:
+                    batch_started = clock()
+                batch_writes += 1
+
+            async with store.unit_of_work(conn):
+                async for segment in iter_segments(messages, config.segment):
+                    if batch_writes and (
+                        batch_writes >= _PLANNING_BATCH_WRITES or clock() - batch_started >= _PLANNING_BATCH_SECONDS
+                    ):
+                        await store.mark_dirty_periods(conn, run_id, touched, commit=False)
+                        await conn.commit()
+                        touched, batch_writes = [], 0
+                    message_count += segment.message_count
+                    segment_count += 1
+                    segment_key = _segment_key(segment)
+                    existing_segment = index.by_key(segment_key)
+                    if existing_segment and existing_segment.status in {"summarized", "skipped"}:
+                        stats.segments_existing += 1
+                        continue
+                    existing_segment_id = existing_segment.id if existing_segment else None
+                    for overlap_id in index.owners(m.discord_message_id for m in segment.messages):
+                        if overlap_id == existing_segment_id:
+                            continue
+                        touched.extend(_touched_periods(await store.delete_segment_tree(conn, overlap_id, commit=False)))
+                        index.remove(overlap_id)
+                        note_write()
+                    retry_count = 0
+                    if existing_segment:
+                        retry_count = existing_segment.retry_count + 1
+                        stats.segments_retried += 1
+                        deleted = await store.delete_segment_tree(conn, existing_segment.id, commit=False)
+                        touched.extend(_touched_periods(deleted))
+                        index.remove(existing_segment.id)
+                        note_write()
+                    else:
+                        stats.segments_missing += 1
+                    if not is_meaningful(segment, config.segment):
+                        segment_id = await _persist_skipped_segment(
+                            conn,
+                            run_id=run_id,
+                            segment=segment,
+                            segment_key=segment_key,
+                            retry_count=retry_count,
+                            commit=False,
+                        )
+                        index.add(segment_key, IndexedSegment(id=segment_id, status="skipped", retry_count=retry_count))
+                        touched.extend(_segment_periods(segment.channel_id, segment.start_time_utc))
+                        stats.segments_skipped += 1
+                        note_write()
+                        continue
+                    pending.append((SegmentSpan.of(segment), segment_key, retry_count, _estimate_tokens(segment)))
+                await store.mark_dirty_periods(conn, run_id, touched, commit=False)
+            _progress(progress, f"Loaded {message_count} messages.")
+            _progress(progress, f"Built {segment_count} segments.")
+            _progress(
+                progress,
+                "Segments: "
+                f"existing={stats.segments_existing}, missing={stats.segments_missing}, "
+                f"retry={stats.segments_retried}, pending={len(pending)}.",
+            )
+            await _summarize_segments(
+                conn,
+                run_id,
+                pending=pending,
+                summarizer=summarizer,
+                pack_summarizer=pack_summarizer,
+                pack_token_budget=config.pack_token_budget,
+                limiter=limiter,
+                progress=progress,
+                db_lock=db_lock,
+                stats=stats,
+            )
+            # Segment calls land in llm_calls before the slower rollup phase starts.
+            await calls.flush(conn)
+            await _build_period_summaries(
+                conn,
+                run_id=run_id,
+                rollup_summarizer=rollup_summarizer,
+                limiter=limiter,
+                db_lock=db_lock,
+                progress=progress,
+                stats=stats,
+                full=config.full_rollups,
+            )
+            # A run waiting on a batch stays 'running' until the last round completes it.
+            if not (stats.segments_deferred or stats.rollups_deferred):
+                await store.complete_compiler_run(conn, run_id)
+            _report_counts(progress, stats)
+            _report_usage(progress, usage)
+            if stats.segments_deferred or stats.rollups_deferred:
+                _progress(progress, f"Memory run '{config.name}' is waiting for a batch.")
+            else:
+                _progress(progress, f"Completed memory run '{config.name}'.")
+        except Exception as exc:
+            await store.fail_compiler_run(conn, run_id, str(exc))
+            raise
+        finally:
+            await calls.flush(conn)
     return run_id
 
 
 async def _summarize_segments(
     conn: aiosqlite.Connection,
     run_id: int,
-    segments: list[SegmentCandidate],
     *,
-    pending: list[tuple[int, str, int]],
+    pending: list[tuple[SegmentSpan, str, int, int]],
     summarizer: Summarizer,
-    concurrency: int,
+    pack_summarizer: PackSummarizer | None = None,
+    pack_token_budget: int = 0,
+    limiter: AdaptiveLimiter,
     progress: ProgressCallback | None,
     db_lock: asyncio.Lock,
     stats: CompileStats,
@@ -232,47 +344,104 @@ async def _summarize_segments(
     total = len(pending)
     if total == 0:
         return
-    concurrency = max(1, concurrency)
-    _progress(progress, f"Summarizing {total} meaningful segments with concurrency {concurrency}.")
-    semaphore = asyncio.Semaphore(concurrency)
+    _progress(progress, f"Summarizing {total} meaningful segments with concurrency {limiter.limit}.")
+    packs = _pack_pending(pending, pack_token_budget if pack_summarizer is not None else 0)
+    if len(packs) < total:
+        _progress(progress, f"Packed {total} segments into {len(packs)} requests.")
     completed = 0
 
-    async def run_one(index: int, segment_key: str, retry_count: int) -> None:
+    async def run_pack(entries: list[tuple[SegmentSpan, str, int, int]]) -> None:
         nonlocal completed
-        segment = segments[index]
-        async with semaphore:
-            try:
-                summary = await summarizer(segment)
-            except Exception as exc:
-                async with db_lock:
+        segments: list[SegmentCandidate] = []
+
+        # Segments are loaded inside the first window slot, so waiting packs hold no messages.
+        async def attempt() -> list[SegmentSummary | Exception]:
+            if not segments:
+                segments.extend([await _load_planned_segment(conn, run_id, span) for span, *_ in entries])
+            if len(segments) == 1:
+                return [await summarizer(segments[0])]
+            return list(await pack_summarizer(segments))
+
+        try:
+            results = await limiter.run(attempt)
+        except Exception as exc:
+            if not segments:
+                segments.extend([await _load_planned_segment(conn, run_id, span) for span, *_ in entries])
+            results = [exc] * len(segments)
+        for segment, (_, _, retry_count, _), result in zip(segments, entries, results):
+            # Messages ingested or deleted inside the span since planning change the
+            # key; store the one the next compile will compute, so it is recognised.
+            segment_key = _segment_key(segment)
+            async with db_lock:
+                if isinstance(result, BatchDeferred):
+                    stats.segments_deferred += 1
+                elif isinstance(result, Exception):
                     await _persist_failed_segment(
                         conn,
                         run_id=run_id,
                         segment=segment,
                         segment_key=segment_key,
-                        error=str(exc),
+                        error=str(result),
                         retry_count=max(1, retry_count),
                     )
                     stats.segments_failed += 1
-                completed += 1
-                if completed == 1 or completed == total or completed % 10 == 0:
-                    _progress(progress, f"Summarized {completed}/{total} meaningful segments.")
-                return
-        async with db_lock:
-            await _persist_summary(
-                conn,
-                run_id=run_id,
-                segment=segment,
-                segment_key=segment_key,
-                summary=summary,
-                retry_count=retry_count,
-            )
-            stats.segments_summarized += 1
-        completed += 1
-        if completed == 1 or completed == total or completed % 10 == 0:
-            _progress(progress, f"Summarized {completed}/{total} meaningful segments.")
-
-    await asyncio.gather(*(run_one(index, segment_key, retry_count) for index, segment_key, retry_count in pending))
+                else:
+                    await _persist_summary(
+                        conn,
+                        run_id=run_id,
+                        segment=segment,
+                        segment_key=segment_key,
+                        summary=result,
+                        retry_count=retry_count,
+                    )
+                    stats.segments_summarized += 1
+            completed += 1
+            if completed == 1 or completed == total or completed % 10 == 0:
+                _progress(progress, f"Summarized {completed}/{total} meaningful segments.")
+                _progress(progress, f"LLM calls: {limiter.describe()}.")
+
+    await asyncio.gather(*(run_pack(entries) for entries in packs))
+
+
+_MAX_PACK_SEGMENTS = 8
+
+
+def _pack_pending(
+    pending: list[tuple[SegmentSpan, str, int, int]],
+    token_budget: int,
+) -> list[list[tuple[SegmentSpan, str, int, int]]]:
+    """Group consecutive small segments up to `token_budget`; larger ones go alone."""
+    if token_budget <= 0:
+        return [[entry] for entry in pending]
+    packs: list[list[tuple[SegmentSpan, str, int, int]]] = []
+    current: list[tuple[SegmentSpan, str, int, int]] = []
+    used = 0
+    for entry in pending:
+        tokens = entry[3]
+        if tokens > token_budget // 2:
+            packs.append([entry])
+            continue
+        if current and (used + tokens > token_budget or len(current) >= _MAX_PACK_SEGMENTS):
+            packs.append(current)
+            current, used = [], 0
+        current.append(entry)
+        used += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+
+async def _load_planned_segment(conn: aiosqlite.Connection, run_id: int, span: SegmentSpan) -> SegmentCandidate:
+    segment = await store.load_segment(conn, span)
+    if segment.message_count != span.message_count:
+        logger.warning(
+            "memory.compile segment_changed run_id=%d channel_id=%d planned=%d loaded=%d",
+            run_id,
+            span.channel_id,
+            span.message_count,
+            segment.message_count,
+        )
+    return segment
 
 
 async def _persist_skipped_segment(
@@ -282,8 +451,9 @@ async def _persist_skipped_segment(
     segment: SegmentCandidate,
     segment_key: str,
     retry_count: int,
-) -> None:
-    await store.insert_segment(
+    commit: bool = True,
+) -> int:
+    return await store.insert_segment(
         conn,
         compiler_run_id=run_id,
         segment=segment,
@@ -295,6 +465,7 @@ async def _persist_skipped_segment(
         status="skipped",
         skip_reason="Segmentet var for kort til holdbar hukommelse.",
         retry_count=retry_count,
+        commit=commit,
     )
 
 
@@ -334,118 +505,217 @@ async def _persist_summary(
 ) -> None:
     summary = _normalize_summary(summary, segment)
     status = "skipped" if summary.skip_reason else "summarized"
-    segment_id = await store.insert_segment(
-        conn,
-        compiler_run_id=run_id,
-        segment=segment,
-        segment_key=segment_key,
-        topic_title=summary.topic_title,
-        summary=summary.summary,
-        importance=summary.importance,
-        tags=summary.tags,
-        status=status,
-        skip_reason=summary.skip_reason,
-        retry_count=retry_count,
-    )
-    if status == "summarized":
-        for item in summary.memory_items:
-            await store.insert_memory_item(
-                conn,
-                compiler_run_id=run_id,
-                segment_id=segment_id,
-                item=item,
-                segment=segment,
-            )
+    async with store.unit_of_work(conn):
+        segment_id = await store.insert_segment(
+            conn,
+            compiler_run_id=run_id,
+            segment=segment,
+            segment_key=segment_key,
+            topic_title=summary.topic_title,
+            summary=summary.summary,
+            importance=summary.importance,
+            tags=summary.tags,
+            status=status,
+            skip_reason=summary.skip_reason,
+            retry_count=retry_count,
+            commit=False,
+        )
+        if status == "summarized":
+            for item in summary.memory_items:
+                await store.insert_memory_item(
+                    conn,
+                    compiler_run_id=run_id,
+                    segment_id=segment_id,
+                    item=item,
+                    segment=segment,
+                    commit=False,
+                )
+        await store.mark_dirty_periods(
+            conn, run_id, _segment_periods(segment.channel_id, segment.start_time_utc), commit=False
+        )
 
 
-async def _build_rollups(
+async def _build_period_summaries(
     conn: aiosqlite.Connection,
     *,
     run_id: int,
     rollup_summarizer: RollupSummarizer,
+    limiter: AdaptiveLimiter,
+    db_lock: asyncio.Lock,
     progress: ProgressCallback | None,
     stats: CompileStats,
+    full: bool = False,
 ) -> None:
-    segments = await store.completed_segments_for_rollups(conn, run_id)
-    weekly_groups: dict[tuple[int, datetime, datetime], list[dict[str, Any]]] = {}
-    for segment in segments:
-        start = datetime.fromisoformat(segment["start_time_utc"])
-        period_start, period_end = _week_bounds(start)
-        weekly_groups.setdefault((int(segment["channel_id"]), period_start, period_end), []).append(segment)
-    if weekly_groups:
-        _progress(progress, f"Building {len(weekly_groups)} weekly rollups.")
-    for (channel_id, period_start, period_end), group in sorted(weekly_groups.items(), key=lambda entry: (entry[0][1], entry[0][0])):
-        segment_ids = [int(row["id"]) for row in group]
-        items = await store.memory_items_for_segments(conn, segment_ids)
-        sources = [_segment_source(row) for row in group] + [_memory_item_source(row) for row in items]
-        await _build_one_rollup(
-            conn,
-            run_id=run_id,
-            channel_id=channel_id,
-            period_type="week",
-            period_start=period_start,
-            period_end=period_end,
-            sources=sources,
-            source_segments=segment_ids,
-            source_memory_items=[int(item["id"]) for item in items],
-            source_rollups=[],
-            rollup_summarizer=rollup_summarizer,
-            stats=stats,
-        )
+    """Build daily ambient memories and weekly and monthly rollups concurrently.
 
-    weekly_rollups = await store.completed_rollups_for_months(conn, run_id)
-    monthly_groups: dict[tuple[int, datetime, datetime], list[dict[str, Any]]] = {}
-    for rollup in weekly_rollups:
-        start = datetime.fromisoformat(rollup["period_start_utc"])
-        period_start, period_end = _month_bounds(start)
-        monthly_groups.setdefault((int(rollup["channel_id"]), period_start, period_end), []).append(rollup)
-    if monthly_groups:
-        _progress(progress, f"Building {len(monthly_groups)} monthly rollups.")
-    for (channel_id, period_start, period_end), group in sorted(monthly_groups.items(), key=lambda entry: (entry[0][1], entry[0][0])):
-        sources = [_rollup_source(row) for row in group]
-        await _build_one_rollup(
-            conn,
-            run_id=run_id,
-            channel_id=channel_id,
-            period_type="month",
-            period_start=period_start,
-            period_end=period_end,
-            sources=sources,
-            source_segments=[],
-            source_memory_items=[],
-            source_rollups=[int(row["id"]) for row in group],
-            rollup_summarizer=rollup_summarizer,
-            stats=stats,
-        )
+    Days and weeks are independent and share `limiter`. A month waits for the
+    weeks of its channel that start inside it, since it summarizes their
+    rollups. Writes go through `db_lock`, like segment persistence.
+    """
+    day_groups, dirty_days = await _period_groups(
+        conn,
+        run_id,
+        period_type="day",
+        bounds=_day_bounds,
+        load=store.skipped_segments_for_daily_ambient,
+        start_column="start_time_utc",
+        full=full,
+    )
+    week_groups, dirty_weeks = await _period_groups(
+        conn,
+        run_id,
+        period_type="week",
+        bounds=_week_bounds,
+        load=store.completed_segments_for_rollups,
+        start_column="start_time_utc",
+        full=full,
+    )
+    dirty_months = set(await store.dirty_periods(conn, run_id, "month"))
+    months = dirty_months | {(channel_id, _month_bounds(start)[0]) for channel_id, start, _ in week_groups}
+    if full:
+        months |= {
+            (int(row["channel_id"]), _month_bounds(datetime.fromisoformat(row["period_start_utc"]))[0])
+            for row in await store.completed_rollups_for_months(conn, run_id)
+        }
+    day_count = sum(1 for group in day_groups.values() if group)
+    week_count = sum(1 for group in week_groups.values() if group)
+    if day_count:
+        _progress(progress, f"Building {day_count} daily ambient memories.")
+    if week_count:
+        _progress(progress, f"Building {week_count} weekly rollups.")
+
+    async def build_day(channel_id: int, day_start: datetime, day_end: datetime, group: list[dict[str, Any]]) -> None:
+        outcome = "unchanged"
+        if group:
+            outcome = await _build_one_daily_ambient_memory(
+                conn,
+                run_id=run_id,
+                channel_id=channel_id,
+                day_start=day_start,
+                day_end=day_end,
+                segments=group,
+                ambient_summarizer=rollup_summarizer,
+                limiter=limiter,
+                db_lock=db_lock,
+                stats=stats,
+            )
+        if (channel_id, day_start) in dirty_days and outcome in {"unchanged", "completed"}:
+            async with db_lock:
+                await store.clear_dirty_period(
+                    conn, run_id, channel_id=channel_id, period_type="day", period_start=day_start
+                )
 
+    async def build_week(channel_id: int, period_start: datetime, period_end: datetime, group: list[dict[str, Any]]) -> bool:
+        """Returns whether the week's month has to be rebuilt."""
+        outcome = "unchanged"
+        if group:
+            segment_ids = [int(row["id"]) for row in group]
+            items = await store.memory_items_for_segments(conn, segment_ids)
+            sources = [_segment_source(row) for row in group] + [_memory_item_source(row) for row in items]
+            outcome = await _build_one_rollup(
+                conn,
+                run_id=run_id,
+                channel_id=channel_id,
+                period_type="week",
+                period_start=period_start,
+                period_end=period_end,
+                sources=sources,
+                source_segments=segment_ids,
+                source_memory_items=[int(item["id"]) for item in items],
+                source_rollups=[],
+                rollup_summarizer=rollup_summarizer,
+                limiter=limiter,
+                db_lock=db_lock,
+                stats=stats,
+            )
+        dirty = (channel_id, period_start) in dirty_weeks
+        if outcome == "deferred" or not (dirty or outcome in {"completed", "failed"}):
+            return False
+        # The month is queued in the same transaction that clears the week, so a crash cannot drop it.
+        async with db_lock, store.unit_of_work(conn):
+            await store.mark_dirty_periods(
+                conn, run_id, [(channel_id, "month", _month_bounds(period_start)[0])], commit=False
+            )
+            if dirty and outcome != "failed":
+                await store.clear_dirty_period(
+                    conn, run_id, channel_id=channel_id, period_type="week", period_start=period_start, commit=False
+                )
+        return True
 
-async def _build_daily_ambient_memory(
+    week_tasks = {
+        (channel_id, period_start): asyncio.ensure_future(build_week(channel_id, period_start, period_end, group))
+        for (channel_id, period_start, period_end), group in sorted(week_groups.items(), key=lambda entry: (entry[0][1], entry[0][0]))
+    }
+
+    async def build_month(channel_id: int, period_start: datetime) -> None:
+        period_end = _month_bounds(period_start)[1]
+        weeks = [
+            task
+            for (week_channel_id, week_start), task in week_tasks.items()
+            if week_channel_id == channel_id and period_start <= week_start < period_end
+        ]
+        changed = any(await asyncio.gather(*weeks))
+        dirty = (channel_id, period_start) in dirty_months
+        if not (changed or dirty or full):
+            return
+        group = await store.completed_rollups_for_months(conn, run_id, period=(channel_id, period_start, period_end))
+        outcome = "unchanged"
+        if group:
+            outcome = await _build_one_rollup(
+                conn,
+                run_id=run_id,
+                channel_id=channel_id,
+                period_type="month",
+                period_start=period_start,
+                period_end=period_end,
+                sources=[_rollup_source(row) for row in group],
+                source_segments=[],
+                source_memory_items=[],
+                source_rollups=[int(row["id"]) for row in group],
+                rollup_summarizer=rollup_summarizer,
+                limiter=limiter,
+                db_lock=db_lock,
+                stats=stats,
+            )
+        if (changed or dirty) and outcome in {"unchanged", "completed"}:
+            async with db_lock:
+                await store.clear_dirty_period(
+                    conn, run_id, channel_id=channel_id, period_type="month", period_start=period_start
+                )
+
+    await asyncio.gather(
+        *(build_day(*period, group) for period, group in sorted(day_groups.items(), key=lambda entry: (entry[0][1], entry[0][0]))),
+        *week_tasks.values(),
+        *(build_month(channel_id, start) for channel_id, start in sorted(months, key=lambda key: (key[1], key[0]))),
+    )
+
+
+async def _period_groups(
     conn: aiosqlite.Connection,
-    *,
     run_id: int,
-    ambient_summarizer: RollupSummarizer,
-    progress: ProgressCallback | None,
-    stats: CompileStats,
-) -> None:
-    skipped_segments = await store.skipped_segments_for_daily_ambient(conn, run_id)
+    *,
+    period_type: str,
+    bounds: Callable[[datetime], tuple[datetime, datetime]],
+    load: Callable[..., Awaitable[list[dict[str, Any]]]],
+    start_column: str,
+    full: bool,
+) -> tuple[dict[tuple[int, datetime, datetime], list[dict[str, Any]]], set[tuple[int, datetime]]]:
+    """Source rows per (channel_id, start, end) period to rebuild, and the dirty periods among them.
+
+    Only dirty periods are loaded unless `full`; a dirty period that no longer
+    has any source rows maps to an empty group.
+    """
+    dirty = set(await store.dirty_periods(conn, run_id, period_type))
     groups: dict[tuple[int, datetime, datetime], list[dict[str, Any]]] = {}
-    for segment in skipped_segments:
-        start = datetime.fromisoformat(segment["start_time_utc"])
-        day_start, day_end = _day_bounds(start)
-        groups.setdefault((int(segment["channel_id"]), day_start, day_end), []).append(segment)
-    if groups:
-        _progress(progress, f"Building {len(groups)} daily ambient memories.")
-    for (channel_id, day_start, day_end), group in sorted(groups.items(), key=lambda entry: (entry[0][1], entry[0][0])):
-        await _build_one_daily_ambient_memory(
-            conn,
-            run_id=run_id,
-            channel_id=channel_id,
-            day_start=day_start,
-            day_end=day_end,
-            segments=group,
-            ambient_summarizer=ambient_summarizer,
-            stats=stats,
-        )
+    if full:
+        for row in await load(conn, run_id):
+            period_start, period_end = bounds(datetime.fromisoformat(row[start_column]))
+            groups.setdefault((int(row["channel_id"]), period_start, period_end), []).append(row)
+    for channel_id, start in dirty:
+        period = (channel_id, *bounds(start))
+        if period not in groups:
+            groups[period] = [] if full else await load(conn, run_id, period=period)
+    return groups, dirty
 
 
 async def _build_one_daily_ambient_memory(
@@ -457,22 +727,12 @@ async def _build_one_daily_ambient_memory(
     day_end: datetime,
     segments: list[dict[str, Any]],
     ambient_summarizer: RollupSummarizer,
+    limiter: AdaptiveLimiter,
+    db_lock: asyncio.Lock,
     stats: CompileStats,
-) -> None:
+) -> str:
     sources = [_skipped_segment_source(row) for row in segments]
-    fingerprint = _stable_hash(
-        {
-            "sources": [
-                {
-                    "kind": source["kind"],
-                    "id": source["id"],
-                    "summary": source.get("summary", ""),
-                    "message_count": source.get("message_count", 0),
-                }
-                for source in sources
-            ]
-        }
-    )
+    fingerprint = _source_fingerprint("daily_ambient", sources)
     existing = await store.get_daily_ambient_by_day(
         conn,
         run_id=run_id,
@@ -481,7 +741,7 @@ async def _build_one_daily_ambient_memory(
         day_end_utc=day_end.isoformat(),
     )
     if existing and existing["status"] == "completed" and existing["source_fingerprint"] == fingerprint:
-        return
+        return "unchanged"
     ambient_input = RollupInput(
         period_type="daily_ambient",
         period_start=day_start,
@@ -491,43 +751,49 @@ async def _build_one_daily_ambient_memory(
     )
     source_segment_ids = [int(segment["id"]) for segment in segments]
     try:
-        summary = _normalize_rollup_summary(await ambient_summarizer(ambient_input))
+        summary = _normalize_rollup_summary(await limiter.run(lambda: ambient_summarizer(ambient_input)))
+    except BatchDeferred:
+        stats.rollups_deferred += 1
+        return "deferred"
     except Exception as exc:
+        async with db_lock:
+            await store.upsert_daily_ambient_memory(
+                conn,
+                run_id=run_id,
+                channel_id=channel_id,
+                day_start_utc=day_start.isoformat(),
+                day_end_utc=day_end.isoformat(),
+                title="",
+                summary="",
+                key_items=[],
+                tags=[],
+                importance="low",
+                status="failed",
+                error=str(exc),
+                source_fingerprint=fingerprint,
+                source_segments=source_segment_ids,
+            )
+        stats.daily_ambient_failed += 1
+        return "failed"
+    async with db_lock:
         await store.upsert_daily_ambient_memory(
             conn,
             run_id=run_id,
             channel_id=channel_id,
             day_start_utc=day_start.isoformat(),
             day_end_utc=day_end.isoformat(),
-            title="",
-            summary="",
-            key_items=[],
-            tags=[],
+            title=summary.title,
+            summary=summary.summary,
+            key_items=summary.key_items,
+            tags=summary.tags,
             importance="low",
-            status="failed",
-            error=str(exc),
+            status="completed",
+            error=None,
             source_fingerprint=fingerprint,
             source_segments=source_segment_ids,
         )
-        stats.daily_ambient_failed += 1
-        return
-    await store.upsert_daily_ambient_memory(
-        conn,
-        run_id=run_id,
-        channel_id=channel_id,
-        day_start_utc=day_start.isoformat(),
-        day_end_utc=day_end.isoformat(),
-        title=summary.title,
-        summary=summary.summary,
-        key_items=summary.key_items,
-        tags=summary.tags,
-        importance="low",
-        status="completed",
-        error=None,
-        source_fingerprint=fingerprint,
-        source_segments=source_segment_ids,
-    )
     stats.daily_ambient_completed += 1
+    return "completed"
 
 
 async def _build_one_rollup(
@@ -543,21 +809,11 @@ async def _build_one_rollup(
     source_memory_items: list[int],
     source_rollups: list[int],
     rollup_summarizer: RollupSummarizer,
+    limiter: AdaptiveLimiter,
+    db_lock: asyncio.Lock,
     stats: CompileStats,
-) -> None:
-    fingerprint = _stable_hash(
-        {
-            "sources": [
-                {
-                    "kind": source["kind"],
-                    "id": source["id"],
-                    "summary": source.get("summary", ""),
-                    "text": source.get("text", ""),
-                }
-                for source in sources
-            ]
-        }
-    )
+) -> str:
+    fingerprint = _source_fingerprint(period_type, sources)
     existing = await store.get_rollup_by_period(
         conn,
         run_id=run_id,
@@ -567,7 +823,7 @@ async def _build_one_rollup(
         period_end_utc=period_end.isoformat(),
     )
     if existing and existing["status"] == "completed" and existing["source_fingerprint"] == fingerprint:
-        return
+        return "unchanged"
     rollup_input = RollupInput(
         period_type=period_type,
         period_start=period_start,
@@ -576,8 +832,37 @@ async def _build_one_rollup(
         sources=sources,
     )
     try:
-        summary = _normalize_rollup_summary(await rollup_summarizer(rollup_input))
+        summary = _normalize_rollup_summary(await limiter.run(lambda: rollup_summarizer(rollup_input)))
+    except BatchDeferred:
+        stats.rollups_deferred += 1
+        return "deferred"
     except Exception as exc:
+        async with db_lock:
+            await store.upsert_rollup(
+                conn,
+                run_id=run_id,
+                channel_id=channel_id,
+                period_type=period_type,
+                period_start_utc=period_start.isoformat(),
+                period_end_utc=period_end.isoformat(),
+                title="",
+                summary="",
+                key_items=[],
+                tags=[],
+                importance="low",
+                status="failed",
+                error=str(exc),
+                source_fingerprint=fingerprint,
+                source_segments=source_segments,
+                source_memory_items=source_memory_items,
+                source_rollups=source_rollups,
+            )
+        if period_type == "week":
+            stats.weekly_rollups_failed += 1
+        else:
+            stats.monthly_rollups_failed += 1
+        return "failed"
+    async with db_lock:
         await store.upsert_rollup(
             conn,
             run_id=run_id,
@@ -585,46 +870,128 @@ async def _build_one_rollup(
             period_type=period_type,
             period_start_utc=period_start.isoformat(),
             period_end_utc=period_end.isoformat(),
-            title="",
-            summary="",
-            key_items=[],
-            tags=[],
-            importance="low",
-            status="failed",
-            error=str(exc),
+            title=summary.title,
+            summary=summary.summary,
+            key_items=summary.key_items,
+            tags=summary.tags,
+            importance=summary.importance,
+            status="completed",
+            error=None,
             source_fingerprint=fingerprint,
             source_segments=source_segments,
             source_memory_items=source_memory_items,
             source_rollups=source_rollups,
         )
-        if period_type == "week":
-            stats.weekly_rollups_failed += 1
-        else:
-            stats.monthly_rollups_failed += 1
-        return
-    await store.upsert_rollup(
-        conn,
-        run_id=run_id,
-        channel_id=channel_id,
-        period_type=period_type,
-        period_start_utc=period_start.isoformat(),
-        period_end_utc=period_end.isoformat(),
-        title=summary.title,
-        summary=summary.summary,
-        key_items=summary.key_items,
-        tags=summary.tags,
-        importance=summary.importance,
-        status="completed",
-        error=None,
-        source_fingerprint=fingerprint,
-        source_segments=source_segments,
-        source_memory_items=source_memory_items,
-        source_rollups=source_rollups,
-    )
     if period_type == "week":
         stats.weekly_rollups_completed += 1
     else:
         stats.monthly_rollups_completed += 1
+    return "completed"
+
+
+async def _cached_llm_summary(
+    conn: aiosqlite.Connection,
+    *,
+    kind: str,
+    payload: Any,
+    model: str,
+    parse: type[BaseModel],
+    call: Callable[[], Awaitable[BaseModel]],
+    stats: CompileStats,
+    db_lock: asyncio.Lock,
+) -> Any:
+    """Serve a validated LLM summary from `memory_summary_cache`, calling the API on a miss."""
+    cache_key = _summary_cache_key(kind, payload, model)
+    cached = await store.get_cached_summary(conn, cache_key)
+    if cached is not None:
+        if kind == "segment":
+            stats.segment_cache_hits += 1
+        else:
+            stats.rollup_cache_hits += 1
+        return parse.model_validate_json(cached)
+    summary = await call()
+    async with db_lock:
+        await store.put_cached_summary(
+            conn,
+            cache_key=cache_key,
+            kind=kind,
+            model=model,
+            response_json=summary.model_dump_json(),
+        )
+    return summary
+
+
+async def _cached_pack_summary(
+    conn: aiosqlite.Connection,
+    segments: list[SegmentCandidate],
+    *,
+    model: str,
+    usage: TokenUsage,
+    stats: CompileStats,
+    db_lock: asyncio.Lock,
+) -> list[SegmentSummary | Exception]:
+    """Packed counterpart of `_cached_llm_summary`: only cache misses are sent, in one request."""
+    keys = [_summary_cache_key("segment", _segment_cache_payload(segment), model) for segment in segments]
+    results: list[SegmentSummary | Exception | None] = []
+    for cache_key in keys:
+        cached = await store.get_cached_summary(conn, cache_key)
+        results.append(SegmentSummary.model_validate_json(cached) if cached is not None else None)
+    # This runs inside the limiter's retried attempt; hits count once, when it returns.
+    hits = sum(result is not None for result in results)
+    misses = [index for index, result in enumerate(results) if result is None]
+    if not misses:
+        stats.segment_cache_hits += hits
+        return results
+    if len(misses) == 1:
+        fresh = [await summarize_segment_with_llm(segments[misses[0]], model=model, usage=usage)]
+    else:
+        fresh = await summarize_pack_with_llm([segments[index] for index in misses], model=model, usage=usage)
+    async with db_lock:
+        async with store.unit_of_work(conn):
+            for index, result in zip(misses, fresh):
+                results[index] = result
+                if isinstance(result, SegmentSummary):
+                    await store.put_cached_summary(
+                        conn,
+                        cache_key=keys[index],
+                        kind="segment",
+                        model=model,
+                        response_json=result.model_dump_json(),
+                        commit=False,
+                    )
+    stats.segment_cache_hits += hits
+    return results
+
+
+def _summary_cache_key(kind: str, payload: Any, model: str) -> str:
+    return _stable_hash({"kind": kind, "payload": payload, "model": model, "prompt_version": store.PROMPT_VERSION})
+
+
+def _segment_cache_payload(segment: SegmentCandidate) -> list[list[Any]]:
+    return [
+        [m.discord_message_id, m.timestamp_ms, m.user_display_name, m.content, m.is_bot]
+        for m in segment.messages
+    ]
+
+
+def _rollup_cache_payload(rollup: RollupInput) -> dict[str, Any]:
+    return {
+        "period_type": rollup.period_type,
+        "period_start": rollup.period_start.isoformat(),
+        "period_end": rollup.period_end.isoformat(),
+        "channel_id": rollup.channel_id,
+        "source_fingerprint": _source_fingerprint(rollup.period_type, rollup.sources),
+    }
+
+
+def summary_request_body(prompt: str, *, model: str) -> dict[str, Any]:
+    """`responses.create` arguments shared by live calls and Batch API lines."""
+    return {
+        "model": model,
+        "input": prompt,
+        "reasoning": {"effort": "low"},
+        "text": {"format": {"type": "json_object"}, "verbosity": "low"},
+    }
 
 
 async def summarize_segment_with_llm(
@@ -635,17 +1002,39 @@ async def summarize_segment_with_llm(
 ) -> SegmentSummary:
     """Summarize one segment through the configured OpenAI client."""
     client = get_client()
-    resp = await client.responses.create(
-        model=model,
-        input=_build_summary_prompt(segment),
-        reasoning={"effort": "low"},
-        text={"format": {"type": "json_object"}, "verbosity": "low"},
-    )
+    body = summary_request_body(_build_summary_prompt(segment), model=model)
+    resp = await telemetry.timed("segment", model, lambda: client.responses.create(**body))
     if usage is not None:
         _add_usage(usage, resp)
     return SegmentSummary.model_validate_json(resp.output_text or "{}")
 
 
+async def summarize_pack_with_llm(
+    segments: list[SegmentCandidate],
+    *,
+    model: str,
+    usage: TokenUsage | None = None,
+) -> list[SegmentSummary | Exception]:
+    """Summarize several segments in one request; each keyed result is validated on its own."""
+    client = get_client()
+    body = summary_request_body(_build_pack_prompt(segments), model=model)
+    resp = await telemetry.timed("segment", model, lambda: client.responses.create(**body))
+    if usage is not None:
+        _add_usage(usage, resp)
+    payload = json.loads(resp.output_text or "{}")
+    if not isinstance(payload, dict):
+        raise ValueError("Packed summary response is not a JSON object.")
+    results: list[SegmentSummary | Exception] = []
+    for label in _pack_labels(len(segments)):
+        try:
+            results.append(SegmentSummary.model_validate(payload[label]))
+        except KeyError:
+            results.append(ValueError(f"Packed summary response has no result for {label}."))
+        except ValidationError as exc:
+            results.append(exc)
+    return results
+
+
 async def summarize_rollup_with_llm(
     rollup: RollupInput,
     *,
@@ -653,12 +1042,9 @@ async def summarize_rollup_with_llm(
     usage: TokenUsage | None = None,
 ) -> RollupSummary:
     client = get_client()
-    resp = await client.responses.create(
-        model=model,
-        input=_build_rollup_prompt(rollup),
-        reasoning={"effort": "low"},
-        text={"format": {"type": "json_object"}, "verbosity": "low"},
-    )
+    body = summary_request_body(_build_rollup_prompt(rollup), model=model)
+    purpose = "ambient" if rollup.period_type == "daily_ambient" else "rollup"
+    resp = await telemetry.timed(purpose, model, lambda: client.responses.create(**body))
     if usage is not None:
         _add_usage(usage, resp)
     return RollupSummary.model_validate_json(resp.output_text or "{}")
@@ -707,43 +1093,75 @@ def _build_daily_ambient_prompt(rollup: RollupInput) -> str:
     )
 
 
-def _build_summary_prompt(segment: SegmentCandidate) -> str:
-    body = "\n".join(
+_SUMMARY_SCHEMA = {
+    "topic_title": "kort dansk titel",
+    "summary": "dansk opsummering af samtalen",
+    "importance": "low|normal|high",
+    "skip_reason": None,
+    "memory_items": [
+        {
+            "type": "decision|plan|preference|fact|opinion|open_question|lore",
+            "subject": "person, emne eller gruppe",
+            "text": "dansk holdbar hukommelse",
+            "confidence": "low|medium|high",
+            "importance": "low|normal|high",
+            "tags": ["dansk tag", "kjugekull", "udendørs klatring"],
+            "speaker_ids": [123],
+            "source_message_ids": [456],
+        }
+    ],
+}
+
+_SUMMARY_INSTRUCTIONS = (
+    "Du komprimerer Discord-chat for KlatreBot til holdbar dansk hukommelse.\n"
+    "Bevar praktiske planer, beslutninger, præferencer, fakta, åbne spørgsmål og vigtig social/lore-kontekst. "
+    "Spring kun over hvis segmentet er klart tomt, usammenhængende eller uden brugbar hukommelse. "
+    "Lav tags som rene danske hukommelsesnøgler, også når chatten bruger engelsk/blandet sprog. "
+    "Tags skal være lowercase, korte, konkrete begreber i ental hvor naturligt, fx kjugekull, tobi, udendørs klatring, klatretur. "
+    "Undgå sætninger, datoer som tags, emojis og jokes medmindre joken/lore er selve emnet. "
+    "Brug kun de givne beskeder som grundlag, og referer til message ids i source_message_ids.\n\n"
+)
+
+
+def _segment_prompt_body(segment: SegmentCandidate) -> str:
+    return "\n".join(
         f"[{m.discord_message_id}] {m.timestamp_utc.isoformat()} {m.user_display_name}: {m.content}"
         for m in segment.messages
         if not m.is_bot
     )
-    schema = {
-        "topic_title": "kort dansk titel",
-        "summary": "dansk opsummering af samtalen",
-        "importance": "low|normal|high",
-        "skip_reason": None,
-        "memory_items": [
-            {
-                "type": "decision|plan|preference|fact|opinion|open_question|lore",
-                "subject": "person, emne eller gruppe",
-                "text": "dansk holdbar hukommelse",
-                "confidence": "low|medium|high",
-                "importance": "low|normal|high",
-                "tags": ["dansk tag", "kjugekull", "udendørs klatring"],
-                "speaker_ids": [123],
-                "source_message_ids": [456],
-            }
-        ],
-    }
+
+
+def _build_summary_prompt(segment: SegmentCandidate) -> str:
     return (
-        "Du komprimerer Discord-chat for KlatreBot til holdbar dansk hukommelse.\n"
-        "Bevar praktiske planer, beslutninger, præferencer, fakta, åbne spørgsmål og vigtig social/lore-kontekst. "
-        "Spring kun over hvis segmentet er klart tomt, usammenhængende eller uden brugbar hukommelse. "
-        "Lav tags som rene danske hukommelsesnøgler, også når chatten bruger engelsk/blandet sprog. "
-        "Tags skal være lowercase, korte, konkrete begreber i ental hvor naturligt, fx kjugekull, tobi, udendørs klatring, klatretur. "
-        "Undgå sætninger, datoer som tags, emojis og jokes medmindre joken/lore er selve emnet. "
-        "Brug kun de givne beskeder som grundlag, og referer til message ids i source_message_ids.\n\n"
-        f"Returner gyldig JSON med denne form:\n{json.dumps(schema, ensure_ascii=False)}\n\n"
-        f"BESKEDER:\n{body}"
+        _SUMMARY_INSTRUCTIONS
+        + f"Returner gyldig JSON med denne form:\n{json.dumps(_SUMMARY_SCHEMA, ensure_ascii=False)}\n\n"
+        f"BESKEDER:\n{_segment_prompt_body(segment)}"
     )
 
 
+def _build_pack_prompt(segments: list[SegmentCandidate]) -> str:
+    labels = _pack_labels(len(segments))
+    body = "\n\n".join(
+        f"SEGMENT {label}:\n{_segment_prompt_body(segment)}" for label, segment in zip(labels, segments)
+    )
+    return (
+        _SUMMARY_INSTRUCTIONS
+        + "Der er flere uafhængige segmenter. Opsummer hvert segment for sig og bland dem ikke sammen.\n"
+        f"Returner gyldig JSON med præcis disse nøgler: {', '.join(labels)}. "
+        f"Værdien for hver nøgle har denne form:\n{json.dumps(_SUMMARY_SCHEMA, ensure_ascii=False)}\n\n"
+        f"{body}"
+    )
+
+
+def _pack_labels(count: int) -> list[str]:
+    return [f"s{n}" for n in range(1, count + 1)]
+
+
+def _estimate_tokens(segment: SegmentCandidate) -> int:
+    # Roughly four characters per token, plus the id/timestamp prefix of each line.
+    return sum(len(m.content or "") + len(m.user_display_name or "") + 40 for m in segment.human_messages) // 4
+
+
 def _normalize_summary(summary: SegmentSummary, segment: SegmentCandidate) -> SegmentSummary:
     importance = summary.importance if summary.importance in IMPORTANCE_VALUES else "normal"
     source_ids = {m.discord_message_id for m in segment.messages}
@@ -858,10 +1276,39 @@ def _rollup_source(row: dict[str, Any]) -> dict[str, Any]:
     }
 
 
+def _source_fingerprint(period_type: str, sources: list[dict[str, Any]]) -> str:
+    detail = "message_count" if period_type == "daily_ambient" else "text"
+    default: Any = 0 if period_type == "daily_ambient" else ""
+    return _stable_hash(
+        {
+            "sources": [
+                {
+                    "kind": source["kind"],
+                    "id": source["id"],
+                    "summary": source.get("summary", ""),
+                    detail: source.get(detail, default),
+                }
+                for source in sources
+            ]
+        }
+    )
+
+
 def _segment_key(segment: SegmentCandidate) -> str:
     return _stable_hash([message.discord_message_id for message in segment.messages])
 
 
+def _segment_periods(channel_id: int, start: datetime) -> list[tuple[int, str, datetime]]:
+    """The daily ambient and weekly rollup a segment starting at `start` feeds."""
+    return [(channel_id, "day", _day_bounds(start)[0]), (channel_id, "week", _week_bounds(start)[0])]
+
+
+def _touched_periods(deleted: dict[str, Any] | None) -> list[tuple[int, str, datetime]]:
+    if deleted is None:
+        return []
+    return _segment_periods(int(deleted["channel_id"]), datetime.fromisoformat(deleted["start_time_utc"]))
+
+
 def _week_bounds(value: datetime) -> tuple[datetime, datetime]:
     start_date = value.date() - timedelta(days=value.weekday())
     start = datetime.combine(start_date, time.min, tzinfo=value.tzinfo)
@@ -927,6 +1374,15 @@ def _report_counts(progress: ProgressCallback | None, stats: CompileStats) -> No
         f"weekly_completed={stats.weekly_rollups_completed}, weekly_failed={stats.weekly_rollups_failed}, "
         f"monthly_completed={stats.monthly_rollups_completed}, monthly_failed={stats.monthly_rollups_failed}",
     )
+    _progress(
+        progress,
+        f"summary cache: segment_hits={stats.segment_cache_hits}, rollup_hits={stats.rollup_cache_hits}",
+    )
+    if stats.segments_deferred or stats.rollups_deferred:
+        _progress(
+            progress,
+            f"batch: segments_deferred={stats.segments_deferred}, rollups_deferred={stats.rollups_deferred}",
+        )
 
 
 def _add_usage(total: TokenUsage, resp) -> None:
@@ -0,0 +1,192 @@
+"""AIMD concurrency control and retries for compiler LLM calls."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, TypeVar
+
+import openai
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Completions are counted over this trailing window for the reported rate.
+_RATE_WINDOW_S = 60.0
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Throttling, server errors and timeouts; everything else fails the call at once."""
+    if isinstance(exc, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, asyncio.TimeoutError)):
+        return True
+    return isinstance(exc, openai.APIStatusError) and exc.status_code >= 500
+
+
+def retry_after(exc: BaseException) -> float | None:
+    """Seconds the API asked us to wait in `retry-after-ms`/`Retry-After`, if it said."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        value = headers.get("retry-after-ms")
+        if value is not None:
+            return max(0.0, float(value) / 1000)
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class LimiterStats:
+    calls: int = 0
+    retries: int = 0
+    throttled: int = 0
+    failures: int = 0
+
+
+class AdaptiveLimiter:
+    """Additive-increase/multiplicative-decrease window over concurrent calls.
+
+    The window grows by about one slot per window of healthy calls, where
+    healthy means no retryable error and latency within `latency_factor` of
+    the best smoothed latency seen so far. A retryable error halves it (at
+    most once per `backoff_base_s`) and the call is retried after a jittered
+    exponential backoff, or after the error's `Retry-After` when that is
+    longer, as long as it has attempts left and the run-wide retry budget is
+    not spent. The budget starts at `retry_budget` and earns `retry_ratio`
+    retries per successful call, so long runs get proportionally more.
+    """
+
+    def __init__(
+        self,
+        *,
+        initial: int,
+        maximum: int,
+        minimum: int = 1,
+        retry_budget: int = 20,
+        retry_ratio: float = 0.1,
+        max_attempts: int = 4,
+        backoff_base_s: float = 1.0,
+        backoff_max_s: float = 30.0,
+        latency_factor: float = 2.0,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ) -> None:
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.window = float(min(max(initial, self.minimum), self.maximum))
+        self.retry_budget = retry_budget
+        self.retry_ratio = retry_ratio
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.latency_factor = latency_factor
+        self.stats = LimiterStats()
+        self._sleep = sleep
+        self._in_flight = 0
+        self._slots = asyncio.Condition()
+        self._latency: float | None = None
+        self._best_latency: float | None = None
+        self._last_decrease = float("-inf")
+        self._completions: deque[float] = deque()
+
+    @property
+    def limit(self) -> int:
+        return int(self.window)
+
+    @property
+    def retries_left(self) -> int:
+        return self.retry_budget + int(self.retry_ratio * self.stats.calls) - self.stats.retries
+
+    @property
+    def rate_per_minute(self) -> float:
+        """Calls completed over the last minute."""
+        self._trim(time.monotonic())
+        return float(len(self._completions))
+
+    async def run(self, call: Callable[[], Awaitable[T]]) -> T:
+        attempt = 0
+        while True:
+            attempt += 1
+            await self._acquire()
+            started = time.monotonic()
+            try:
+                result = await call()
+            except Exception as exc:
+                if is_retryable(exc):
+                    self._on_throttle(exc)
+                await self._release()
+                if not is_retryable(exc):
+                    self.stats.failures += 1
+                    raise
+                if attempt >= self.max_attempts or self.retries_left <= 0:
+                    self.stats.failures += 1
+                    raise
+                self.stats.retries += 1
+                delay = random.uniform(0, min(self.backoff_max_s, self.backoff_base_s * 2 ** (attempt - 1)))
+                delay = min(self.backoff_max_s, max(delay, retry_after(exc) or 0.0))
+                logger.info(
+                    "memory.limiter retry attempt=%d delay=%.1fs window=%.1f error=%s",
+                    attempt,
+                    delay,
+                    self.window,
+                    type(exc).__name__,
+                )
+                await self._sleep(delay)
+                continue
+            self._on_success(time.monotonic() - started)
+            await self._release()
+            return result
+
+    def describe(self) -> str:
+        return (
+            f"window={self.limit}, rate={self.rate_per_minute:.1f}/min, "
+            f"retries={self.stats.retries}, throttled={self.stats.throttled}"
+        )
+
+    async def _acquire(self) -> None:
+        async with self._slots:
+            await self._slots.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+
+    async def _release(self) -> None:
+        async with self._slots:
+            self._in_flight -= 1
+            self._slots.notify_all()
+
+    def _on_success(self, latency: float) -> None:
+        now = time.monotonic()
+        self.stats.calls += 1
+        self._completions.append(now)
+        self._trim(now)
+        self._latency = latency if self._latency is None else 0.8 * self._latency + 0.2 * latency
+        if self._best_latency is None or self._latency < self._best_latency:
+            self._best_latency = self._latency
+        if latency <= self.latency_factor * self._best_latency:
+            self.window = min(float(self.maximum), self.window + 1.0 / self.window)
+
+    def _on_throttle(self, exc: BaseException) -> None:
+        self.stats.throttled += 1
+        now = time.monotonic()
+        # One burst of 429s is one congestion signal, not one halving per call.
+        if now - self._last_decrease < self.backoff_base_s:
+            return
+        self._last_decrease = now
+        self.window = max(float(self.minimum), self.window / 2)
+        logger.info("memory.limiter backoff window=%.1f error=%s", self.window, type(exc).__name__)
+
+    def _trim(self, now: float) -> None:
+        while self._completions and now - self._completions[0] > _RATE_WINDOW_S:
+            self._completions.popleft()
@@ -0,0 +1,131 @@
+"""LRU/TTL cache of recall results, invalidated when the memory run changes."""
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Hashable
+from weakref import WeakKeyDictionary
+
+import aiosqlite
+
+from klatrebot_v2.db.connection import DbHandle
+from klatrebot_v2.memory.retrieval import RecallResult
+
+
+@dataclass
+class RecallCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class RecallCache:
+    """Recall results keyed by run id and normalized arguments.
+
+    Every lookup carries the run's generation (see `run_generation`); when it
+    differs from the one the cached entries were computed under, that run's
+    entries are dropped. Entries also expire after `ttl_seconds`.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 600.0) -> None:
+        self.max_entries = max(max_entries, 0)
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[tuple, tuple[float, RecallResult]] = OrderedDict()
+        self._generations: dict[int, tuple] = {}
+        self.stats = RecallCacheStats()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, run_id: int, generation: tuple, key: Hashable) -> RecallResult | None:
+        self._check_generation(run_id, generation)
+        entry = self._entries.get((run_id, key))
+        if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+            if entry is not None:
+                del self._entries[(run_id, key)]
+            self.stats.misses += 1
+            return None
+        self._entries.move_to_end((run_id, key))
+        self.stats.hits += 1
+        return entry[1].model_copy(deep=True)
+
+    def put(self, run_id: int, generation: tuple, key: Hashable, result: RecallResult) -> None:
+        if self.max_entries == 0:
+            return
+        self._check_generation(run_id, generation)
+        self._entries[(run_id, key)] = (time.monotonic(), result.model_copy(deep=True))
+        self._entries.move_to_end((run_id, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._generations.clear()
+
+    def _check_generation(self, run_id: int, generation: tuple) -> None:
+        previous = self._generations.get(run_id)
+        if previous == generation:
+            return
+        self._generations[run_id] = generation
+        if previous is None:
+            return
+        stale = [entry_key for entry_key in self._entries if entry_key[0] == run_id]
+        for entry_key in stale:
+            del self._entries[entry_key]
+        self.stats.invalidations += 1
+
+
+async def run_generation(conn: aiosqlite.Connection, run_id: int) -> tuple:
+    """Changes whenever the run completes again or a rolling compile finishes."""
+    rows = await conn.execute_fetchall(
+        """
+        SELECT
+            (SELECT completed_at FROM memory_compiler_runs WHERE id = ?),
+            (SELECT MAX(last_completed_at) FROM memory_rolling_state)
+        """,
+        (run_id,),
+    )
+    return tuple(rows[0]) if rows else (None, None)
+
+
+def recall_key(
+    *,
+    query: str,
+    channel_id: int | None,
+    people: list[int] | None,
+    date_range: tuple[datetime | None, datetime | None] | None,
+    memory_types: list[str] | None,
+    limit: int,
+) -> tuple[Any, ...]:
+    return (
+        " ".join(query.lower().split()),
+        channel_id,
+        tuple(sorted(set(people))) if people else None,
+        tuple(value.isoformat() if value else None for value in date_range) if date_range else None,
+        tuple(sorted(set(memory_types))) if memory_types else None,
+        limit,
+    )
+
+
+# One cache per database handle, so separate databases never share results.
+_caches: WeakKeyDictionary = WeakKeyDictionary()
+
+
+def get_recall_cache(db: DbHandle) -> RecallCache:
+    cache = _caches.get(db)
+    if cache is None:
+        cache = _caches[db] = RecallCache()
+    return cache
+
+
+def set_recall_cache(db: DbHandle, cache: RecallCache) -> None:
+    _caches[db] = cache
@@ -1,12 +1,27 @@
 """Retrieval over compiled community memory."""
+import asyncio
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
+from functools import partial
+import json
+import logging
 import re
-from typing import Any
+import time
+from typing import Any, Awaitable, Callable
 
 import aiosqlite
 from pydantic import BaseModel, Field
 
+from klatrebot_v2.db import connection
+from klatrebot_v2.db.connection import DbHandle
 from klatrebot_v2.memory.tags import normalize_tags
+from klatrebot_v2.time_utils import to_epoch_ms
+
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on messages get_memory_sources returns, so the tool payload stays small.
+MAX_SOURCE_MESSAGES = 200
 
 
 class RelatedMemory(BaseModel):
@@ -39,10 +54,17 @@ class MemoryResult(BaseModel):
     score: float | None = None
 
 
+class RecallDebug(BaseModel):
+    tier_ms: dict[str, float] = Field(default_factory=dict)
+    skipped_tiers: list[str] = Field(default_factory=list)
+    total_ms: float = 0.0
+
+
 class RecallResult(BaseModel):
     answerable: bool
     results: list[MemoryResult] = Field(default_factory=list)
     source_handles: list[str] = Field(default_factory=list)
+    debug: RecallDebug | None = None
 
 
 class SourceMessage(BaseModel):
@@ -56,7 +78,7 @@ class SourceMessage(BaseModel):
 
 
 async def recall_community_memory(
-    conn: aiosqlite.Connection,
+    conn: DbHandle,
     *,
     run_id: int,
     query: str,
@@ -65,139 +87,227 @@ async def recall_community_memory(
     date_range: tuple[datetime | None, datetime | None] | None = None,
     memory_types: list[str] | None = None,
     limit: int = 6,
+    debug: bool = False,
 ) -> RecallResult:
-    """Search summaries and durable memory items for a recall query."""
+    """Search summaries and durable memory items for a recall query.
+
+    Each tier (rollups, memory items, segment summaries, daily ambient) runs on its
+    own reader. Once `limit` results outscore anything a still-running tier could
+    return, that tier is cancelled. With `debug`, per-tier timings are attached.
+    """
+    started = time.perf_counter()
     query = query.strip()
     if not query:
         return RecallResult(answerable=False)
 
     tag_terms = _query_tag_terms(query)
-    rollup_results = []
-    if _should_search_rollups(query, date_range, memory_types):
-        rollup_results = [
-            *await _search_rollups_by_tags(
-                conn,
-                run_id=run_id,
-                tag_terms=tag_terms,
-                channel_id=channel_id,
-                limit=limit * 3,
-            ),
-            *await _search_rollups(
-                conn,
-                run_id=run_id,
-                query=query,
-                channel_id=channel_id,
-                limit=limit * 3,
-            ),
-        ]
-    ambient_results = [
-        *await _search_daily_ambient_by_tags(
-            conn,
-            run_id=run_id,
-            tag_terms=tag_terms,
-            channel_id=channel_id,
-            date_range=date_range,
-            limit=limit * 3,
-        ),
-        *await _search_daily_ambient(
-            conn,
-            run_id=run_id,
-            query=query,
-            channel_id=channel_id,
-            date_range=date_range,
-            limit=limit * 3,
-        ),
-    ]
-    segment_results = [
-        *await _search_segments_by_tags(
-            conn,
-            run_id=run_id,
-            tag_terms=tag_terms,
-            channel_id=channel_id,
-            date_range=date_range,
-            limit=limit * 3,
-        ),
-        *await _search_segments(
-            conn,
-            run_id=run_id,
-            query=query,
-            channel_id=channel_id,
-            date_range=date_range,
-            limit=limit * 3,
-        ),
-    ]
-    item_results = [
-        *await _search_items_by_tags(
-            conn,
-            run_id=run_id,
-            tag_terms=tag_terms,
-            channel_id=channel_id,
-            memory_types=memory_types,
-            date_range=date_range,
-            people=people,
-            limit=limit * 3,
-        ),
-        *await _search_items(
-            conn,
-            run_id=run_id,
-            query=query,
-            channel_id=channel_id,
-            memory_types=memory_types,
-            date_range=date_range,
-            people=people,
-            limit=limit * 3,
-        ),
-    ]
-    item_results = _dedupe_memory_items(_merge_results(item_results))
-    item_results = await _attach_related_memories(conn, run_id=run_id, items=item_results)
-    results = _rank_results(
-        _merge_results([*rollup_results, *item_results, *ambient_results, *segment_results])
-    )[:limit]
+    tiers = _recall_tiers(
+        run_id=run_id,
+        query=query,
+        tag_terms=tag_terms,
+        channel_id=channel_id,
+        people=people,
+        date_range=date_range,
+        memory_types=memory_types,
+        limit=limit,
+    )
+    ranked, tier_ms, skipped = await _run_tiers(conn, tiers, limit=limit)
+    results = ranked[:limit]
+    items = [r for r in results if r.kind == "memory_item"]
+    if items:
+        async with connection.reader(conn) as read_conn:
+            await _attach_related_memories(read_conn, run_id=run_id, items=items)
+    total_ms = (time.perf_counter() - started) * 1000
+    logger.debug(
+        "recall.tiers total=%.1fms %s skipped=%s",
+        total_ms,
+        " ".join(f"{name}={ms:.1f}ms" for name, ms in tier_ms.items()),
+        ",".join(skipped) or "-",
+    )
     return RecallResult(
         answerable=bool(results),
         results=results,
         source_handles=[r.source_handle for r in results],
+        debug=RecallDebug(tier_ms=tier_ms, skipped_tiers=skipped, total_ms=total_ms) if debug else None,
+    )
+
+
+@dataclass
+class _RecallTier:
+    name: str
+    # Highest score any result of this tier can reach; used to decide when it can be skipped.
+    ceiling: float
+    searches: list[Callable[[aiosqlite.Connection], Awaitable[list[MemoryResult]]]]
+    dedupe_items: bool = False
+
+
+def _recall_tiers(
+    *,
+    run_id: int,
+    query: str,
+    tag_terms: list[str],
+    channel_id: int | None,
+    people: list[int] | None,
+    date_range: tuple[datetime | None, datetime | None] | None,
+    memory_types: list[str] | None,
+    limit: int,
+) -> list[_RecallTier]:
+    fetch = limit * 3
+    tiers = []
+    if _should_search_rollups(query, date_range, memory_types):
+        tiers.append(
+            _RecallTier(
+                "rollups",
+                _tier_ceiling("rollup_month", tag_terms),
+                [
+                    partial(_search_rollups_by_tags, run_id=run_id, tag_terms=tag_terms, channel_id=channel_id, limit=fetch),
+                    partial(_search_rollups, run_id=run_id, query=query, channel_id=channel_id, limit=fetch),
+                ],
+            )
+        )
+    item_filters = dict(
+        run_id=run_id,
+        channel_id=channel_id,
+        memory_types=memory_types,
+        date_range=date_range,
+        people=people,
+        limit=fetch,
+    )
+    tiers.append(
+        _RecallTier(
+            "items",
+            _tier_ceiling("memory_item", tag_terms),
+            [
+                partial(_search_items_by_tags, tag_terms=tag_terms, **item_filters),
+                partial(_search_items, query=query, **item_filters),
+            ],
+            dedupe_items=True,
+        )
     )
+    for name, kind, by_tags, by_text in (
+        ("segments", "segment_summary", _search_segments_by_tags, _search_segments),
+        ("ambient", "daily_ambient", _search_daily_ambient_by_tags, _search_daily_ambient),
+    ):
+        filters = dict(run_id=run_id, channel_id=channel_id, date_range=date_range, limit=fetch)
+        tiers.append(
+            _RecallTier(
+                name,
+                _tier_ceiling(kind, tag_terms),
+                [partial(by_tags, tag_terms=tag_terms, **filters), partial(by_text, query=query, **filters)],
+            )
+        )
+    return tiers
+
+
+def _tier_ceiling(kind: str, tag_terms: list[str]) -> float:
+    best = dict(importance="high", memory_type="decision")
+    if not tag_terms:
+        return _base_score("text", kind, **best)
+    # Tag hits add 10 per matched tag, and a handle found by both searches gets +15.
+    return _base_score("tag", kind, **best) + len(set(tag_terms)) * 10 + 15.0
+
+
+async def _run_tiers(
+    conn: DbHandle,
+    tiers: list[_RecallTier],
+    *,
+    limit: int,
+) -> tuple[list[MemoryResult], dict[str, float], list[str]]:
+    tier_ms: dict[str, float] = {}
+
+    async def run(tier: _RecallTier) -> list[MemoryResult]:
+        async with connection.reader(conn) as read_conn:
+            started = time.perf_counter()
+            found: list[MemoryResult] = []
+            for search in tier.searches:
+                found.extend(await search(read_conn))
+            tier_ms[tier.name] = (time.perf_counter() - started) * 1000
+        merged = _merge_results(found)
+        return _dedupe_memory_items(merged) if tier.dedupe_items else merged
+
+    tasks = {asyncio.create_task(run(tier)): tier for tier in tiers}
+    pending = set(tasks)
+    collected: list[MemoryResult] = []
+    ranked: list[MemoryResult] = []
+    skipped: list[str] = []
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                collected.extend(task.result())
+            # Handles never repeat across tiers, so per-tier merging equals one global merge.
+            ranked = _rank_results(collected)
+            if pending and len(ranked) >= limit:
+                cutoff = ranked[limit - 1].score or 0.0
+                for task in list(pending):
+                    if tasks[task].ceiling < cutoff:
+                        task.cancel()
+                        pending.discard(task)
+                        skipped.append(tasks[task].name)
+    finally:
+        for task in pending:
+            task.cancel()
+    return ranked, tier_ms, skipped
 
 
 async def get_memory_sources(
-    conn: aiosqlite.Connection,
+    conn: DbHandle,
     *,
     source_handles: list[str],
     context_radius: int = 5,
+    max_messages: int = MAX_SOURCE_MESSAGES,
+) -> list[SourceMessage]:
+    """Return raw source messages around segment/item/rollup/ambient handles.
+
+    At most `max_messages` are returned; source messages and their nearest
+    neighbours are kept first.
+    """
+    async with connection.reader(conn) as read_conn:
+        return await _get_memory_sources(
+            read_conn,
+            source_handles=source_handles,
+            context_radius=context_radius,
+            max_messages=max_messages,
+        )
+
+
+async def _get_memory_sources(
+    conn: aiosqlite.Connection,
+    *,
+    source_handles: list[str],
+    context_radius: int,
+    max_messages: int,
 ) -> list[SourceMessage]:
-    """Return raw source messages around segment/item handles."""
-    message_ids: set[int] = set()
+    handles = []
     for handle in source_handles:
         kind, _, raw_id = handle.partition(":")
-        if not raw_id.isdigit():
-            continue
-        if kind == "seg":
-            message_ids.update(await _segment_message_ids(conn, int(raw_id)))
-        elif kind == "mem":
-            message_ids.update(await _memory_item_source_ids(conn, int(raw_id)))
-        elif kind == "roll":
-            message_ids.update(await _rollup_message_ids(conn, int(raw_id)))
-        elif kind == "amb":
-            message_ids.update(await _daily_ambient_message_ids(conn, int(raw_id)))
-
-    expanded_ids: set[int] = set()
-    for message_id in message_ids:
-        expanded_ids.update(await _nearby_message_ids(conn, message_id, context_radius))
-
-    if not expanded_ids:
+        if kind in {"seg", "mem", "roll", "amb"} and raw_id.isdigit():
+            handles.append((kind, int(raw_id)))
+    seeds = await _source_seed_messages(conn, handles)
+
+    by_channel: dict[int, list[tuple[int, int]]] = {}
+    for message_id, channel_id, timestamp_ms in seeds:
+        by_channel.setdefault(channel_id, []).append((message_id, timestamp_ms))
+    nearby: list[tuple[int, int]] = []
+    for channel_id, channel_seeds in by_channel.items():
+        nearby.extend(await _nearby_message_ids(conn, channel_id, channel_seeds, max(context_radius, 0)))
+
+    if not nearby:
         return []
-    placeholders = ",".join("?" for _ in expanded_ids)
+    if len(nearby) > max_messages:
+        logger.info("memory_sources.capped messages=%d max=%d", len(nearby), max_messages)
+        nearby = sorted(nearby, key=lambda entry: (entry[1], entry[0]))[:max_messages]
+    expanded_ids = {message_id for message_id, _ in nearby}
     cursor = await conn.execute(
-        f"""
+        """
         SELECT m.discord_message_id, m.channel_id, m.user_id,
                COALESCE(u.display_name, '?'), m.content, m.timestamp_utc, m.is_bot
         FROM messages m
         LEFT JOIN users u ON u.discord_user_id = m.user_id
-        WHERE m.discord_message_id IN ({placeholders})
-        ORDER BY m.channel_id, m.timestamp_utc, m.discord_message_id
+        WHERE m.discord_message_id IN (SELECT value FROM json_each(?))
+        ORDER BY m.channel_id, m.timestamp_ms, m.discord_message_id
         """,
-        tuple(expanded_ids),
+        (json.dumps(sorted(expanded_ids)),),
     )
     return [
         SourceMessage(
@@ -321,7 +431,7 @@ async def _search_daily_ambient(
     if channel_id is not None:
         where.append("dam.channel_id = ?")
         params.append(channel_id)
-    _append_date_filter(where, params, "dam.day_start_utc", date_range)
+    _append_date_filter(where, params, "dam.day_start_ms", date_range)
     params.append(limit)
     cursor = await conn.execute(
         f"""
@@ -369,7 +479,7 @@ async def _search_daily_ambient_by_tags(
     if channel_id is not None:
         where.append("dam.channel_id = ?")
         params.append(channel_id)
-    _append_date_filter(where, params, "dam.day_start_utc", date_range)
+    _append_date_filter(where, params, "dam.day_start_ms", date_range)
     params.append(limit)
     cursor = await conn.execute(
         f"""
@@ -380,7 +490,7 @@ async def _search_daily_ambient_by_tags(
         JOIN daily_ambient_tags dat ON dat.ambient_id = dam.id
         WHERE {' AND '.join(where)}
         GROUP BY dam.id
-        ORDER BY COUNT(DISTINCT dat.tag) DESC, dam.day_start_utc DESC
+        ORDER BY COUNT(DISTINCT dat.tag) DESC, dam.day_start_ms DESC
         LIMIT ?
         """,
         params,
@@ -418,7 +528,7 @@ async def _search_segments(
     if channel_id is not None:
         where.append("cs.channel_id = ?")
         params.append(channel_id)
-    _append_date_filter(where, params, "cs.start_time_utc", date_range)
+    _append_date_filter(where, params, "cs.start_time_ms", date_range)
     params.append(limit)
     cursor = await conn.execute(
         f"""
@@ -465,7 +575,7 @@ async def _search_segments_by_tags(
     if channel_id is not None:
         where.append("cs.channel_id = ?")
         params.append(channel_id)
-    _append_date_filter(where, params, "cs.start_time_utc", date_range)
+    _append_date_filter(where, params, "cs.start_time_ms", date_range)
     params.append(limit)
     cursor = await conn.execute(
         f"""
@@ -475,7 +585,7 @@ async def _search_segments_by_tags(
         JOIN conversation_segment_tags cst ON cst.segment_id = cs.id
         WHERE {' AND '.join(where)}
         GROUP BY cs.id
-        ORDER BY COUNT(DISTINCT cst.tag) DESC, cs.start_time_utc DESC
+        ORDER BY COUNT(DISTINCT cst.tag) DESC, cs.start_time_ms DESC
         LIMIT ?
         """,
         params,
@@ -517,7 +627,7 @@ async def _search_items(
     if memory_types:
         where.append(f"mi.type IN ({','.join('?' for _ in memory_types)})")
         params.extend(memory_types)
-    _append_date_filter(where, params, "mi.created_at_source", date_range)
+    _append_date_filter(where, params, "mi.created_at_source_ms", date_range)
     params.append(limit)
     cursor = await conn.execute(
         f"""
@@ -578,7 +688,7 @@ async def _search_items_by_tags(
     if memory_types:
         where.append(f"mi.type IN ({_placeholders(memory_types)})")
         params.extend(memory_types)
-    _append_date_filter(where, params, "mi.created_at_source", date_range)
+    _append_date_filter(where, params, "mi.created_at_source_ms", date_range)
     params.append(limit)
     cursor = await conn.execute(
         f"""
@@ -590,7 +700,7 @@ async def _search_items_by_tags(
         JOIN memory_item_tags mit ON mit.memory_item_id = mi.id
         WHERE {' AND '.join(where)}
         GROUP BY mi.id
-        ORDER BY COUNT(DISTINCT mit.tag) DESC, mi.created_at_source DESC
+        ORDER BY COUNT(DISTINCT mit.tag) DESC, mi.created_at_source_ms DESC
         LIMIT ?
         """,
         params,
@@ -629,74 +739,85 @@ async def _attach_related_memories(
     window_days: int = 14,
     limit: int = 5,
 ) -> list[MemoryResult]:
+    seeds: dict[int, MemoryResult] = {}
     for item in items:
         if item.kind != "memory_item" or item.created_at_source is None:
             continue
         item_id = _handle_id(item.source_handle)
-        if item_id is None:
-            continue
-        item_tags = await _memory_item_tags(conn, item_id)
-        if not item_tags:
+        if item_id is not None:
+            seeds[item_id] = item
+    if not seeds:
+        return items
+    window = timedelta(days=window_days)
+    candidates = await _related_candidates(
+        conn,
+        run_id=run_id,
+        windows={
+            item_id: (item.created_at_source - window, item.created_at_source + window)
+            for item_id, item in seeds.items()
+        },
+    )
+    for item_id, item in seeds.items():
+        item_candidates = candidates.get(item_id)
+        if not item_candidates:
             continue
-        start = item.created_at_source - timedelta(days=window_days)
-        end = item.created_at_source + timedelta(days=window_days)
-        candidates = await _related_candidates(
-            conn,
-            run_id=run_id,
-            item_id=item_id,
-            tags=item_tags,
-            start=start,
-            end=end,
-        )
-        item.related_memories = _rank_related(item, item_tags, candidates, limit)
+        shared_tags = set().union(*(candidate["tags"] for candidate in item_candidates))
+        item.related_memories = _rank_related(item, shared_tags, item_candidates, limit)
     return items
 
 
-async def _memory_item_tags(conn: aiosqlite.Connection, memory_item_id: int) -> set[str]:
-    rows = await conn.execute_fetchall(
-        "SELECT tag FROM memory_item_tags WHERE memory_item_id = ?",
-        (memory_item_id,),
-    )
-    return {str(row[0]) for row in rows}
-
-
 async def _related_candidates(
     conn: aiosqlite.Connection,
     *,
     run_id: int,
-    item_id: int,
-    tags: set[str],
-    start: datetime,
-    end: datetime,
-) -> list[dict[str, Any]]:
-    placeholders = ",".join("?" for _ in tags)
+    windows: dict[int, tuple[datetime, datetime]],
+) -> dict[int, list[dict[str, Any]]]:
+    """Neighbours sharing a tag with each seed item inside its time window, in one query.
+
+    Each candidate's `tags` holds only the tags it shares with that seed.
+    """
+    seed_values = ", ".join("(?, ?, ?)" for _ in windows)
+    seed_params = [
+        value
+        for item_id, (start, end) in windows.items()
+        for value in (item_id, to_epoch_ms(start), to_epoch_ms(end))
+    ]
     rows = await conn.execute_fetchall(
         f"""
-        SELECT mi.id, mi.type, mi.subject, mi.text, mi.segment_id, mi.created_at_source,
-               group_concat(mit.tag)
-        FROM memory_items mi
-        JOIN memory_item_tags mit ON mit.memory_item_id = mi.id
+        WITH seeds(item_id, start_ms, end_ms) AS (VALUES {seed_values}),
+        seed_tags AS (
+            SELECT s.item_id, s.start_ms, s.end_ms, t.tag
+            FROM seeds s
+            JOIN memory_item_tags t ON t.memory_item_id = s.item_id
+        )
+        SELECT st.item_id, mi.id, mi.type, mi.subject, mi.text, mi.segment_id, mi.created_at_source,
+               group_concat(st.tag)
+        FROM seed_tags st
+        JOIN memory_item_tags mit ON mit.tag = st.tag
+        JOIN memory_items mi ON mi.id = mit.memory_item_id
         WHERE mi.compiler_run_id = ?
-          AND mi.id != ?
-          AND mi.created_at_source >= ?
-          AND mi.created_at_source <= ?
-          AND mit.tag IN ({placeholders})
-        GROUP BY mi.id
+          AND mi.id != st.item_id
+          AND mi.created_at_source_ms >= st.start_ms
+          AND mi.created_at_source_ms <= st.end_ms
+        GROUP BY st.item_id, mi.id
+        ORDER BY st.item_id, mi.id
         """,
-        (run_id, item_id, start.isoformat(), end.isoformat(), *tags),
+        (*seed_params, run_id),
     )
-    return [
-        {
-            "id": row[0],
-            "type": row[1],
-            "subject": row[2],
-            "text": row[3],
-            "segment_id": row[4],
-            "created_at_source": datetime.fromisoformat(row[5]) if row[5] else None,
-            "tags": set(str(row[6] or "").split(",")) if row[6] else set(),
-        }
-        for row in rows
-    ]
+    out: dict[int, list[dict[str, Any]]] = {}
+    for row in rows:
+        out.setdefault(row[0], []).append(
+            {
+                "id": row[1],
+                "type": row[2],
+                "subject": row[3],
+                "text": row[4],
+                "segment_id": row[5],
+                "created_at_source": datetime.fromisoformat(row[6]) if row[6] else None,
+                "tags": set(str(row[7]).split(",")) if row[7] else set(),
+            }
+        )
+    return out
 
 
 def _rank_related(
@@ -906,96 +1027,117 @@ def _handle_id(source_handle: str) -> int | None:
     return int(raw_id)
 
 
-async def _segment_message_ids(conn: aiosqlite.Connection, segment_id: int) -> list[int]:
-    rows = await conn.execute_fetchall(
-        "SELECT discord_message_id FROM segment_messages WHERE segment_id = ? ORDER BY position",
-        (segment_id,),
-    )
-    return [int(row[0]) for row in rows]
-
-
-async def _memory_item_source_ids(conn: aiosqlite.Connection, memory_item_id: int) -> list[int]:
-    rows = await conn.execute_fetchall(
-        "SELECT discord_message_id FROM memory_item_sources WHERE memory_item_id = ?",
-        (memory_item_id,),
-    )
-    return [int(row[0]) for row in rows]
-
-
-async def _rollup_message_ids(conn: aiosqlite.Connection, rollup_id: int, seen: set[int] | None = None) -> list[int]:
-    seen = seen or set()
-    if rollup_id in seen:
+async def _source_seed_messages(
+    conn: aiosqlite.Connection,
+    handles: list[tuple[str, int]],
+) -> list[tuple[int, int, int]]:
+    """Resolve handles to (message id, channel, timestamp_ms) through the whole rollup lineage."""
+    if not handles:
         return []
-    seen.add(rollup_id)
-    rows = await conn.execute_fetchall(
-        """
-        SELECT source_kind, source_id
-        FROM memory_rollup_sources
-        WHERE rollup_id = ?
-        ORDER BY source_kind, source_id
-        """,
-        (rollup_id,),
-    )
-    out: set[int] = set()
-    for source_kind, source_id in rows:
-        if source_kind == "segment":
-            out.update(await _segment_message_ids(conn, int(source_id)))
-        elif source_kind == "memory_item":
-            out.update(await _memory_item_source_ids(conn, int(source_id)))
-        elif source_kind == "rollup":
-            out.update(await _rollup_message_ids(conn, int(source_id), seen))
-    return sorted(out)
-
-
-async def _daily_ambient_message_ids(conn: aiosqlite.Connection, ambient_id: int) -> list[int]:
-    rows = await conn.execute_fetchall(
-        """
-        SELECT segment_id
-        FROM daily_ambient_sources
-        WHERE ambient_id = ?
-        ORDER BY segment_id
+    values = ", ".join("(?, ?)" for _ in handles)
+    # UNION (not UNION ALL) in the recursive step also stops rollup cycles.
+    return await conn.execute_fetchall(
+        f"""
+        WITH RECURSIVE
+        handles(kind, id) AS (VALUES {values}),
+        rollups(id) AS (
+            SELECT id FROM handles WHERE kind = 'roll'
+            UNION
+            SELECT rs.source_id
+            FROM memory_rollup_sources rs
+            JOIN rollups r ON rs.rollup_id = r.id
+            WHERE rs.source_kind = 'rollup'
+        ),
+        lineage(kind, id) AS (
+            SELECT rs.source_kind, rs.source_id
+            FROM memory_rollup_sources rs
+            JOIN rollups r ON rs.rollup_id = r.id
+            WHERE rs.source_kind IN ('segment', 'memory_item')
+            UNION
+            SELECT 'segment', id FROM handles WHERE kind = 'seg'
+            UNION
+            SELECT 'memory_item', id FROM handles WHERE kind = 'mem'
+            UNION
+            SELECT 'segment', das.segment_id
+            FROM daily_ambient_sources das
+            JOIN handles h ON h.kind = 'amb' AND das.ambient_id = h.id
+        ),
+        source_ids(discord_message_id) AS (
+            SELECT sm.discord_message_id
+            FROM segment_messages sm
+            JOIN lineage l ON l.kind = 'segment' AND sm.segment_id = l.id
+            UNION
+            SELECT mis.discord_message_id
+            FROM memory_item_sources mis
+            JOIN lineage l ON l.kind = 'memory_item' AND mis.memory_item_id = l.id
+        )
+        SELECT m.discord_message_id, m.channel_id, m.timestamp_ms
+        FROM source_ids s
+        JOIN messages m ON m.discord_message_id = s.discord_message_id
         """,
-        (ambient_id,),
+        [value for handle in handles for value in handle],
     )
-    out: set[int] = set()
-    for row in rows:
-        out.update(await _segment_message_ids(conn, int(row[0])))
-    return sorted(out)
 
 
 async def _nearby_message_ids(
     conn: aiosqlite.Connection,
-    message_id: int,
+    channel_id: int,
+    seeds: list[tuple[int, int]],
     radius: int,
-) -> list[int]:
-    row = await conn.execute_fetchall(
-        "SELECT channel_id, timestamp_utc FROM messages WHERE discord_message_id = ?",
-        (message_id,),
-    )
-    if not row:
-        return []
-    channel_id, timestamp = row[0]
-    before = await conn.execute_fetchall(
-        """
-        SELECT discord_message_id
-        FROM messages
-        WHERE channel_id = ? AND timestamp_utc <= ?
-        ORDER BY timestamp_utc DESC, discord_message_id DESC
-        LIMIT ?
-        """,
-        (channel_id, timestamp, radius + 1),
-    )
-    after = await conn.execute_fetchall(
+) -> list[tuple[int, int]]:
+    """Messages within `radius` positions of any seed in one channel, as (id, distance).
+
+    One windowed query: messages are numbered by (timestamp_ms, id) over the span
+    the seeds cover plus `radius` messages either side, and each row's distance to
+    the nearest seed comes from running MAX/MIN over the seed row numbers.
+    """
+    first_ms = min(ts for _, ts in seeds)
+    last_ms = max(ts for _, ts in seeds)
+    rows = await conn.execute_fetchall(
         """
-        SELECT discord_message_id
-        FROM messages
-        WHERE channel_id = ? AND timestamp_utc > ?
-        ORDER BY timestamp_utc ASC, discord_message_id ASC
-        LIMIT ?
+        WITH numbered AS (
+            SELECT discord_message_id,
+                   ROW_NUMBER() OVER (ORDER BY timestamp_ms, discord_message_id) AS rn,
+                   discord_message_id IN (SELECT value FROM json_each(:seeds)) AS is_seed
+            FROM messages
+            WHERE channel_id = :channel_id
+              AND timestamp_ms >= COALESCE(
+                  (SELECT timestamp_ms FROM messages
+                   WHERE channel_id = :channel_id AND timestamp_ms < :first_ms
+                   ORDER BY timestamp_ms DESC LIMIT 1 OFFSET :offset),
+                  -9223372036854775808)
+              AND timestamp_ms <= COALESCE(
+                  (SELECT timestamp_ms FROM messages
+                   WHERE channel_id = :channel_id AND timestamp_ms > :last_ms
+                   ORDER BY timestamp_ms ASC LIMIT 1 OFFSET :offset),
+                  9223372036854775807)
+        ),
+        marked AS (
+            SELECT discord_message_id, rn,
+                   MAX(CASE WHEN is_seed THEN rn END) OVER (
+                       ORDER BY rn ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+                   ) AS prev_seed,
+                   MIN(CASE WHEN is_seed THEN rn END) OVER (
+                       ORDER BY rn ROWS BETWEEN CURRENT ROW AND UNBOUNDED FOLLOWING
+                   ) AS next_seed
+            FROM numbered
+        )
+        SELECT discord_message_id,
+               MIN(COALESCE(rn - prev_seed, :far), COALESCE(next_seed - rn, :far)) AS distance
+        FROM marked
+        WHERE distance <= :radius
         """,
-        (channel_id, timestamp, radius),
+        {
+            "seeds": json.dumps([message_id for message_id, _ in seeds]),
+            "channel_id": channel_id,
+            "first_ms": first_ms,
+            "last_ms": last_ms,
+            "offset": max(radius - 1, 0),
+            "radius": radius,
+            "far": radius + 1,
+        },
     )
-    return [int(r[0]) for r in before + after]
+    return [(int(row[0]), int(row[1])) for row in rows]
 
 
 def _fts_query(query: str) -> str:
@@ -1014,10 +1156,10 @@ def _append_date_filter(
     start, end = date_range
     if start is not None:
         where.append(f"{column} >= ?")
-        params.append(start.isoformat())
+        params.append(to_epoch_ms(start))
     if end is not None:
         where.append(f"{column} < ?")
-        params.append(end.isoformat())
+        params.append(to_epoch_ms(end))
 
 
 def _json_int_list(raw: str) -> list[int]:
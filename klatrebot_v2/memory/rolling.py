@@ -0,0 +1,310 @@
+"""Rolling production memory compile, from the systemd timer or inside the bot."""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import socket
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, TypeVar
+
+import aiosqlite
+
+from klatrebot_v2.db import connection
+from klatrebot_v2.llm import client
+from klatrebot_v2.memory import store
+from klatrebot_v2.memory.compiler import CompilerConfig, ProgressCallback, _progress, compile_run
+from klatrebot_v2.memory.segmentation import SegmentConfig
+from klatrebot_v2.settings import Settings, get_settings
+
+
+logger = logging.getLogger(__name__)
+
+# A compile that found the lease taken or failed is tried again after this long.
+RETRY_DELAY = timedelta(minutes=5)
+
+T = TypeVar("T")
+
+Clock = Callable[[], datetime]
+CompileRun = Callable[..., Awaitable[int]]
+
+
+@dataclass(frozen=True)
+class RollingResult:
+    # "locked", "empty", "compiled" or "failed".
+    status: str
+    from_time: datetime | None = None
+    to_time: datetime | None = None
+    run_id: int | None = None
+    error: str | None = None
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def lock_owner(kind: str) -> str:
+    return f"{socket.gethostname()}:{kind}:{uuid.uuid4()}"
+
+
+def segment_config_from_settings(settings: Settings | None = None) -> SegmentConfig:
+    s = settings or get_settings()
+    return SegmentConfig(
+        gap_minutes=s.memory_segment_gap_minutes,
+        min_human_messages=s.memory_segment_min_human_messages,
+        min_total_chars=s.memory_segment_min_total_chars,
+        min_participants=s.memory_segment_min_participants,
+        max_messages=s.memory_segment_max_messages,
+        max_duration_minutes=s.memory_segment_max_duration_minutes,
+    )
+
+
+def rolling_window(*, now: datetime, state: dict | None, settings) -> tuple[datetime, datetime]:
+    to_time = now - timedelta(minutes=settings.memory_rolling_settle_minutes)
+    last_to = None
+    if state and state.get("last_successful_to_utc"):
+        last_to = datetime.fromisoformat(state["last_successful_to_utc"])
+    if last_to is None:
+        from_time = now - timedelta(hours=settings.memory_rolling_initial_lookback_hours)
+    else:
+        from_time = last_to - timedelta(minutes=settings.memory_rolling_tail_buffer_minutes)
+    return from_time, to_time
+
+
+async def compile_rolling(
+    conn: aiosqlite.Connection,
+    *,
+    settings: Settings,
+    owner: str,
+    clock: Clock = utcnow,
+    compile: CompileRun = compile_run,
+    progress: ProgressCallback | None = None,
+) -> RollingResult:
+    """Take the run's lease, compile from the watermark to `now - settle`, and advance it.
+
+    A failed compile records its error and releases the lease but keeps the watermark.
+    """
+    run_name = settings.memory_rolling_run_name
+    now = clock()
+    locked = await store.acquire_rolling_lock(
+        conn,
+        run_name=run_name,
+        owner=owner,
+        now=now,
+        lock_expires_at=now + timedelta(minutes=settings.memory_rolling_lock_ttl_minutes),
+    )
+    if not locked:
+        return RollingResult("locked")
+
+    state = await store.get_rolling_state(conn, run_name)
+    from_time, to_time = rolling_window(now=now, state=state, settings=settings)
+    if to_time <= from_time:
+        await store.release_rolling_lock(conn, run_name=run_name)
+        return RollingResult("empty", from_time, to_time)
+
+    _progress(
+        progress,
+        "Rolling memory window: "
+        f"{from_time.isoformat()} -> {to_time.isoformat()} "
+        f"(run '{run_name}').",
+    )
+    try:
+        run_id = await compile(
+            conn,
+            config=CompilerConfig(
+                name=run_name,
+                from_time=from_time,
+                to_time=to_time,
+                channel_ids=[settings.discord_main_channel_id],
+                compiler_model=settings.memory_compiler_model,
+                source_db_label=settings.db_path,
+                concurrency=settings.memory_rolling_concurrency,
+                rebuild=False,
+                pack_token_budget=settings.memory_compiler_pack_token_budget,
+                retry_budget=settings.memory_compiler_retry_budget,
+                retry_ratio=settings.memory_compiler_retry_ratio,
+                segment=segment_config_from_settings(settings),
+            ),
+            progress=progress,
+        )
+    except asyncio.CancelledError:
+        # Shutdown mid-compile: hand the lease back instead of holding it until it expires.
+        await store.release_rolling_lock(conn, run_name=run_name)
+        raise
+    except Exception as exc:
+        await store.fail_rolling_compile(conn, run_name=run_name, error=str(exc))
+        return RollingResult("failed", from_time, to_time, error=str(exc))
+    await store.complete_rolling_compile(conn, run_name=run_name, completed_to=to_time, completed_at=clock())
+    return RollingResult("compiled", from_time, to_time, run_id=run_id)
+
+
+@dataclass
+class RollingCompilerStats:
+    compiles: int = 0
+    failures: int = 0
+    locked: int = 0
+    last_duration_ms: float = 0.0
+    max_duration_ms: float = 0.0
+
+
+class RollingCompiler:
+    """Compiles the rolling run from inside the bot once a conversation has settled.
+
+    `note_message` records the newest message per watched channel. A compile is
+    due when the segment gap has closed the conversation and it is older than
+    the settle window, so it falls inside `rolling_window`. One catch-up compile
+    runs at start. Compiles run on an event loop of their own in a worker
+    thread, with their own connection and OpenAI client, so segmentation,
+    hashing and validation never stall `!gpt` or ingest on the bot's loop. They
+    share the lease in `memory_rolling_state` with the `compile-rolling` timer.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        *,
+        settings: Settings,
+        clock: Clock = utcnow,
+        compile: CompileRun = compile_run,
+    ) -> None:
+        self.db_path = db_path
+        self.settings = settings
+        self.channel_ids = {settings.discord_main_channel_id}
+        self.quiet_for = timedelta(
+            minutes=max(settings.memory_segment_gap_minutes, settings.memory_rolling_settle_minutes)
+        )
+        self.owner = lock_owner("bot")
+        self.stats = RollingCompilerStats()
+        self._clock = clock
+        self._compile = compile
+        self._latest: dict[int, datetime] = {}
+        self._due: datetime | None = None
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def due_at(self) -> datetime | None:
+        return self._due
+
+    def start(self) -> None:
+        if self._task is None:
+            self._due = self._clock()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def note_message(self, channel_id: int, timestamp_utc: datetime) -> None:
+        if channel_id not in self.channel_ids:
+            return
+        latest = self._latest.get(channel_id)
+        if latest is None or timestamp_utc > latest:
+            self._latest[channel_id] = timestamp_utc
+            self._schedule(timestamp_utc + self.quiet_for)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_once(self) -> RollingResult:
+        started = time.perf_counter()
+        result = await in_worker_thread(self._compile_rolling)
+        duration_ms = (time.perf_counter() - started) * 1000
+        self.stats.last_duration_ms = duration_ms
+        self.stats.max_duration_ms = max(self.stats.max_duration_ms, duration_ms)
+        if result.status == "compiled":
+            self.stats.compiles += 1
+        elif result.status == "failed":
+            self.stats.failures += 1
+        elif result.status == "locked":
+            self.stats.locked += 1
+        logger.info(
+            "memory.rolling status=%s run_id=%s to=%s duration=%.0fms error=%s",
+            result.status,
+            result.run_id,
+            result.to_time.isoformat() if result.to_time else None,
+            duration_ms,
+            result.error,
+        )
+        return result
+
+    async def _compile_rolling(self) -> RollingResult:
+        conn = await connection.open(self.db_path)
+        try:
+            async with client.thread_client(self.settings):
+                return await compile_rolling(
+                    conn,
+                    settings=self.settings,
+                    owner=self.owner,
+                    clock=self._clock,
+                    compile=self._compile,
+                    progress=lambda message: logger.debug("memory.rolling %s", message),
+                )
+        finally:
+            await connection.close(conn)
+
+    async def _run(self) -> None:
+        while True:
+            if self._due is None:
+                await self._wake.wait()
+                self._wake.clear()
+                continue
+            delay = (self._due - self._clock()).total_seconds()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                continue
+            self._due = None
+            try:
+                result = await self.run_once()
+            except Exception:
+                logger.exception("memory.rolling compile_crashed")
+                result = RollingResult("failed")
+            if result.status in {"locked", "failed"}:
+                self._schedule(self._clock() + RETRY_DELAY)
+            elif result.to_time is not None:
+                # Messages past the window's end still need their own compile.
+                pending = [ts for ts in self._latest.values() if ts >= result.to_time]
+                if pending:
+                    self._schedule(max(pending) + self.quiet_for)
+
+    def _schedule(self, due: datetime) -> None:
+        # A later message pushes the compile back: the conversation is still going.
+        if self._due is None or due > self._due:
+            self._due = due
+            self._wake.set()
+
+
+async def in_worker_thread(run: Callable[[], Awaitable[T]]) -> T:
+    """Await `run()` on a fresh event loop in a worker thread.
+
+    Cancelling the caller cancels the worker's task and waits for it to unwind,
+    so a compile interrupted by shutdown still hands its lease back.
+    """
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(run())
+
+    def work() -> T:
+        try:
+            return loop.run_until_complete(task)
+        finally:
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+
+    future = asyncio.ensure_future(asyncio.to_thread(work))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        with contextlib.suppress(RuntimeError):
+            loop.call_soon_threadsafe(task.cancel)
+        with contextlib.suppress(BaseException):
+            await future
+        raise
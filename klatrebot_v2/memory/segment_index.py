@@ -0,0 +1,119 @@
+"""In-memory index of a run's persisted segments, used while planning a compile."""
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Iterable
+
+import aiosqlite
+
+from klatrebot_v2.time_utils import to_epoch_ms
+
+
+@dataclass(frozen=True)
+class IndexedSegment:
+    id: int
+    status: str
+    retry_count: int
+
+
+class SegmentIndex:
+    """Segment keys and message ownership for one run, replacing per-segment lookups.
+
+    Ownership is two parallel arrays sorted by message id, which costs 16 bytes
+    per message instead of a dict entry. Segments deleted during planning are
+    tombstoned rather than removed from the arrays.
+    """
+
+    def __init__(
+        self,
+        segments: dict[str, IndexedSegment],
+        message_ids: array,
+        owner_ids: array,
+    ) -> None:
+        self._by_key = segments
+        self._key_by_id = {segment.id: key for key, segment in segments.items()}
+        self._message_ids = message_ids
+        self._owner_ids = owner_ids
+        self._deleted: set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def by_key(self, segment_key: str) -> IndexedSegment | None:
+        return self._by_key.get(segment_key)
+
+    def owners(self, message_ids: Iterable[int]) -> list[int]:
+        """Ids of live segments holding any of `message_ids`, ascending."""
+        found: set[int] = set()
+        ids, owners = self._message_ids, self._owner_ids
+        size = len(ids)
+        for message_id in message_ids:
+            position = bisect_left(ids, message_id)
+            while position < size and ids[position] == message_id:
+                found.add(owners[position])
+                position += 1
+        return sorted(found - self._deleted)
+
+    def add(self, segment_key: str, segment: IndexedSegment) -> None:
+        # Ownership of new segments is not recorded: the planned segments
+        # partition the streamed messages, so no later lookup can hit them.
+        self._by_key[segment_key] = segment
+        self._key_by_id[segment.id] = segment_key
+
+    def remove(self, segment_id: int) -> None:
+        self._deleted.add(segment_id)
+        segment_key = self._key_by_id.pop(segment_id, None)
+        if segment_key is not None:
+            del self._by_key[segment_key]
+
+
+async def load_segment_index(
+    conn: aiosqlite.Connection,
+    *,
+    run_id: int,
+    from_time: datetime | None = None,
+    to_time: datetime | None = None,
+    channel_ids: list[int] | None = None,
+) -> SegmentIndex:
+    """Index the run's segments that can overlap the compile window."""
+    where = ["cs.compiler_run_id = ?"]
+    params: list[Any] = [run_id]
+    if from_time is not None:
+        where.append("cs.end_time_ms >= ?")
+        params.append(to_epoch_ms(from_time))
+    if to_time is not None:
+        where.append("cs.start_time_ms < ?")
+        params.append(to_epoch_ms(to_time))
+    if channel_ids:
+        where.append(f"cs.channel_id IN ({','.join('?' for _ in channel_ids)})")
+        params.extend(channel_ids)
+    where_sql = " AND ".join(where)
+    rows = await conn.execute_fetchall(
+        f"SELECT cs.id, cs.segment_key, cs.status, cs.retry_count FROM conversation_segments cs WHERE {where_sql}",
+        params,
+    )
+    segments = {
+        str(segment_key): IndexedSegment(id=int(segment_id), status=str(status), retry_count=int(retry_count or 0))
+        for segment_id, segment_key, status, retry_count in rows
+        if segment_key is not None
+    }
+    message_ids, owner_ids = array("q"), array("q")
+    cursor = await conn.execute(
+        f"""
+        SELECT sm.discord_message_id, sm.segment_id
+        FROM segment_messages sm
+        JOIN conversation_segments cs ON cs.id = sm.segment_id
+        WHERE {where_sql}
+        ORDER BY sm.discord_message_id, sm.segment_id
+        """,
+        params,
+    )
+    while batch := await cursor.fetchmany(10_000):
+        for message_id, segment_id in batch:
+            message_ids.append(message_id)
+            owner_ids.append(segment_id)
+    await cursor.close()
+    return SegmentIndex(segments, message_ids, owner_ids)
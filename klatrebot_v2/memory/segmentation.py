@@ -1,17 +1,15 @@
 """Conversation segmentation for Discord chat memory."""
+from __future__ import annotations
+
 from dataclasses import dataclass
 from datetime import datetime, timedelta
+from typing import AsyncIterable, AsyncIterator
 
+from klatrebot_v2.db.rows import MessageRow
 
-@dataclass(frozen=True)
-class RawMemoryMessage:
-    discord_message_id: int
-    channel_id: int
-    user_id: int
-    user_display_name: str
-    content: str
-    timestamp_utc: datetime
-    is_bot: bool = False
+
+# Messages fed to the compiler; slotted rows so full-history loads stay cheap.
+RawMemoryMessage = MessageRow
 
 
 @dataclass(frozen=True)
@@ -67,16 +65,114 @@ def build_segments(
     config: SegmentConfig | None = None,
 ) -> list[SegmentCandidate]:
     """Build adaptive segments from timestamp-ordered Discord messages."""
-    config = config or SegmentConfig()
-    ordered = sorted(messages, key=lambda m: (m.channel_id, m.timestamp_utc, m.discord_message_id))
-    initial = _split_by_channel_and_gap(ordered, config)
-    merged = _merge_tiny_segments(initial, config)
+    builder = SegmentBuilder(config)
     out: list[SegmentCandidate] = []
-    for segment in merged:
-        out.extend(_split_oversized(segment, config))
+    for message in sorted(messages, key=_order_key):
+        out.extend(builder.push(message))
+    out.extend(builder.finish())
     return out
 
 
+async def iter_segments(
+    messages: AsyncIterable[RawMemoryMessage],
+    config: SegmentConfig | None = None,
+) -> AsyncIterator[SegmentCandidate]:
+    """Streaming `build_segments` over messages already in (channel, timestamp, id) order."""
+    builder = SegmentBuilder(config)
+    async for message in messages:
+        for segment in builder.push(message):
+            yield segment
+    for segment in builder.finish():
+        yield segment
+
+
+class SegmentBuilder:
+    """Incremental segmenter producing exactly what `build_segments` would.
+
+    Messages must arrive in (channel, timestamp, id) order. A segment is
+    released once a gap or channel change has closed it and the tiny-segment
+    merge can no longer reach it, so only the open segment and two closed
+    neighbours are held at any time.
+    """
+
+    def __init__(self, config: SegmentConfig | None = None) -> None:
+        self.config = config or SegmentConfig()
+        self._max_gap_ms = self.config.gap_minutes * 60_000
+        self._current: list[RawMemoryMessage] = []
+        # Closed segment that may still absorb the next one while it is tiny.
+        self._pending: SegmentCandidate | None = None
+        # Last merged segment; a tiny final segment is folded back into it.
+        self._held: SegmentCandidate | None = None
+        self._last_key: tuple[int, int, int] | None = None
+
+    def push(self, message: RawMemoryMessage) -> list[SegmentCandidate]:
+        key = _order_key(message)
+        if self._last_key is not None and key < self._last_key:
+            raise ValueError("Messages must be ordered by channel, timestamp and message id.")
+        self._last_key = key
+        out: list[SegmentCandidate] = []
+        current = self._current
+        if current and (
+            message.channel_id != current[-1].channel_id
+            or message.timestamp_ms - current[-1].timestamp_ms > self._max_gap_ms
+        ):
+            out = self._close(SegmentCandidate(channel_id=current[0].channel_id, messages=current))
+            self._current = current = []
+        current.append(message)
+        return out
+
+    def finish(self) -> list[SegmentCandidate]:
+        out: list[SegmentCandidate] = []
+        if self._current:
+            out = self._close(SegmentCandidate(channel_id=self._current[0].channel_id, messages=self._current))
+        pending, held = self._pending, self._held
+        self._current, self._pending, self._held, self._last_key = [], None, None, None
+        if (
+            pending is not None
+            and held is not None
+            and pending.channel_id == held.channel_id
+            and not is_meaningful(pending, self.config)
+        ):
+            held.messages.extend(pending.messages)
+            pending = None
+        for segment in (held, pending):
+            if segment is not None:
+                out.extend(_split_oversized(segment, self.config))
+        return out
+
+    def _close(self, segment: SegmentCandidate) -> list[SegmentCandidate]:
+        pending = self._pending
+        if pending is None:
+            self._pending = segment
+            return []
+        if pending.channel_id == segment.channel_id and not is_meaningful(pending, self.config):
+            pending.messages.extend(segment.messages)
+            return []
+        self._pending = segment
+        held, self._held = self._held, pending
+        return _split_oversized(held, self.config) if held is not None else []
+
+
+@dataclass(frozen=True)
+class SegmentSpan:
+    """A segment's bounds in (channel, timestamp, id) order, enough to reload its messages."""
+
+    channel_id: int
+    first: tuple[int, int]
+    last: tuple[int, int]
+    message_count: int
+
+    @classmethod
+    def of(cls, segment: SegmentCandidate) -> SegmentSpan:
+        first, last = segment.messages[0], segment.messages[-1]
+        return cls(
+            channel_id=segment.channel_id,
+            first=(first.timestamp_ms, first.discord_message_id),
+            last=(last.timestamp_ms, last.discord_message_id),
+            message_count=segment.message_count,
+        )
+
+
 def is_meaningful(segment: SegmentCandidate, config: SegmentConfig | None = None) -> bool:
     config = config or SegmentConfig()
     return (
@@ -86,63 +182,8 @@ def is_meaningful(segment: SegmentCandidate, config: SegmentConfig | None = None
     )
 
 
-def _split_by_channel_and_gap(
-    messages: list[RawMemoryMessage],
-    config: SegmentConfig,
-) -> list[SegmentCandidate]:
-    segments: list[SegmentCandidate] = []
-    current: list[RawMemoryMessage] = []
-    last: RawMemoryMessage | None = None
-    max_gap = timedelta(minutes=config.gap_minutes)
-
-    for message in messages:
-        starts_new = (
-            last is None
-            or message.channel_id != last.channel_id
-            or message.timestamp_utc - last.timestamp_utc > max_gap
-        )
-        if starts_new and current:
-            segments.append(SegmentCandidate(channel_id=current[0].channel_id, messages=current))
-            current = []
-        current.append(message)
-        last = message
-
-    if current:
-        segments.append(SegmentCandidate(channel_id=current[0].channel_id, messages=current))
-    return segments
-
-
-def _merge_tiny_segments(
-    segments: list[SegmentCandidate],
-    config: SegmentConfig,
-) -> list[SegmentCandidate]:
-    merged: list[SegmentCandidate] = []
-    pending: SegmentCandidate | None = None
-
-    for segment in segments:
-        if pending is None:
-            pending = segment
-        elif pending.channel_id == segment.channel_id and not is_meaningful(pending, config):
-            pending = SegmentCandidate(
-                channel_id=pending.channel_id,
-                messages=[*pending.messages, *segment.messages],
-            )
-        else:
-            merged.append(pending)
-            pending = segment
-
-    if pending is not None:
-        if merged and pending.channel_id == merged[-1].channel_id and not is_meaningful(pending, config):
-            previous = merged.pop()
-            merged.append(
-                SegmentCandidate(
-                    channel_id=previous.channel_id,
-                    messages=[*previous.messages, *pending.messages],
-                )
-            )
-        else:
-            merged.append(pending)
-    return merged
+def _order_key(message: RawMemoryMessage) -> tuple[int, int, int]:
+    return (message.channel_id, message.timestamp_ms, message.discord_message_id)
 
 
 def _split_oversized(
@@ -151,7 +192,8 @@ def _split_oversized(
 ) -> list[SegmentCandidate]:
     if (
         segment.message_count <= config.max_messages
-        and segment.duration <= timedelta(minutes=config.max_duration_minutes)
+        and segment.messages[-1].timestamp_ms - segment.messages[0].timestamp_ms
+        <= config.max_duration_minutes * 60_000
     ):
         return [segment]
     if segment.message_count <= 1:
@@ -168,9 +210,9 @@ def _split_oversized(
 
 def _largest_internal_gap_index(messages: list[RawMemoryMessage]) -> int:
     best_index = 1
-    best_gap = timedelta(0)
+    best_gap = 0
     for idx in range(1, len(messages)):
-        gap = messages[idx].timestamp_utc - messages[idx - 1].timestamp_utc
+        gap = messages[idx].timestamp_ms - messages[idx - 1].timestamp_ms
         if gap > best_gap:
             best_gap = gap
             best_index = idx
@@ -1,20 +1,42 @@
 """SQLite persistence helpers for durable memory."""
 import json
-from datetime import datetime
-from typing import Any
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Iterable
 
 import aiosqlite
 
-from klatrebot_v2.memory.segmentation import RawMemoryMessage, SegmentCandidate
+from klatrebot_v2.db.rows import MESSAGE_ROW_COLUMNS, decode_message_rows
+from klatrebot_v2.memory.segmentation import RawMemoryMessage, SegmentCandidate, SegmentSpan
+from klatrebot_v2.time_utils import to_epoch_ms
 
 
 PROMPT_VERSION = "summary-memory-v1"
 
 
+@asynccontextmanager
+async def unit_of_work(conn: aiosqlite.Connection) -> AsyncIterator[aiosqlite.Connection]:
+    """One transaction around writers called with `commit=False`; rolled back on error."""
+    try:
+        yield conn
+    except BaseException:
+        await conn.rollback()
+        raise
+    await conn.commit()
+
+
 def _dt(value: datetime | None) -> str | None:
     return value.isoformat() if value else None
 
 
+def _ms(value: datetime | str | None) -> int | None:
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return to_epoch_ms(value)
+
+
 async def create_compiler_run(
     conn: aiosqlite.Connection,
     *,
@@ -208,6 +230,8 @@ async def delete_compiler_run_by_name(conn: aiosqlite.Connection, name: str) ->
     )
     await conn.execute("DELETE FROM memory_items WHERE compiler_run_id = ?", (run_id,))
     await conn.execute("DELETE FROM conversation_segments WHERE compiler_run_id = ?", (run_id,))
+    await conn.execute("DELETE FROM memory_compiler_batches WHERE compiler_run_id = ?", (run_id,))
+    await conn.execute("DELETE FROM memory_dirty_periods WHERE compiler_run_id = ?", (run_id,))
     await conn.execute("DELETE FROM memory_compiler_runs WHERE id = ?", (run_id,))
     await conn.commit()
 
@@ -224,6 +248,42 @@ async def complete_compiler_run(conn: aiosqlite.Connection, run_id: int) -> None
     await conn.commit()
 
 
+async def insert_compiler_batch(
+    conn: aiosqlite.Connection,
+    *,
+    run_id: int,
+    batch_id: str,
+    request_count: int,
+) -> int:
+    cursor = await conn.execute(
+        "INSERT INTO memory_compiler_batches (compiler_run_id, batch_id, request_count) VALUES (?, ?, ?)",
+        (run_id, batch_id, request_count),
+    )
+    await conn.commit()
+    return int(cursor.lastrowid)
+
+
+async def get_open_compiler_batch(conn: aiosqlite.Connection, run_id: int) -> dict[str, Any] | None:
+    return await _fetch_one_dict(
+        conn,
+        """
+        SELECT * FROM memory_compiler_batches
+        WHERE compiler_run_id = ? AND status = 'submitted'
+        ORDER BY id DESC
+        LIMIT 1
+        """,
+        (run_id,),
+    )
+
+
+async def finish_compiler_batch(conn: aiosqlite.Connection, batch_row_id: int, *, status: str) -> None:
+    await conn.execute(
+        "UPDATE memory_compiler_batches SET status = ?, collected_at = datetime('now') WHERE id = ?",
+        (status, batch_row_id),
+    )
+    await conn.commit()
+
+
 async def fail_compiler_run(conn: aiosqlite.Connection, run_id: int, error: str) -> None:
     await conn.execute(
         """
@@ -253,25 +313,39 @@ async def list_segments_for_run(
 ) -> list[dict[str, Any]]:
     return await _fetch_all_dicts(
         conn,
-        "SELECT * FROM conversation_segments WHERE compiler_run_id = ? ORDER BY start_time_utc",
+        "SELECT * FROM conversation_segments WHERE compiler_run_id = ? ORDER BY start_time_ms",
         (run_id,),
     )
 
 
-async def get_segment_by_key(
+async def count_summarized_segments_since(
     conn: aiosqlite.Connection,
+    since: datetime,
     *,
-    run_id: int,
-    segment_key: str,
-) -> dict[str, Any] | None:
-    return await _fetch_one_dict(
-        conn,
-        "SELECT * FROM conversation_segments WHERE compiler_run_id = ? AND segment_key = ?",
-        (run_id, segment_key),
+    run_ids: Iterable[int],
+) -> int:
+    """Segments the given runs summarized since `since`; `created_at` is SQLite's UTC `datetime('now')`."""
+    run_ids = sorted(set(run_ids))
+    if not run_ids:
+        return 0
+    rows = await conn.execute_fetchall(
+        f"""
+        SELECT COUNT(*) FROM conversation_segments
+        WHERE status = 'summarized' AND created_at >= ?
+          AND compiler_run_id IN ({", ".join("?" * len(run_ids))})
+        """,
+        (since.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"), *run_ids),
     )
+    return int(rows[0][0])
 
 
-async def delete_segment_tree(conn: aiosqlite.Connection, segment_id: int) -> None:
+async def delete_segment_tree(
+    conn: aiosqlite.Connection,
+    segment_id: int,
+    *,
+    commit: bool = True,
+) -> dict[str, Any] | None:
+    """Delete a segment with its items; returns the deleted row's channel_id and start_time_utc."""
     await conn.execute(
         "DELETE FROM memory_items_fts WHERE rowid IN (SELECT id FROM memory_items WHERE segment_id = ?)",
         (segment_id,),
@@ -294,8 +368,15 @@ async def delete_segment_tree(conn: aiosqlite.Connection, segment_id: int) -> No
     await conn.execute("DELETE FROM conversation_segments_fts WHERE rowid = ?", (segment_id,))
     await conn.execute("DELETE FROM conversation_segment_tags WHERE segment_id = ?", (segment_id,))
     await conn.execute("DELETE FROM segment_messages WHERE segment_id = ?", (segment_id,))
-    await conn.execute("DELETE FROM conversation_segments WHERE id = ?", (segment_id,))
-    await conn.commit()
+    cursor = await conn.execute(
+        "DELETE FROM conversation_segments WHERE id = ? RETURNING channel_id, start_time_utc",
+        (segment_id,),
+    )
+    row = await cursor.fetchone()
+    await cursor.close()
+    if commit:
+        await conn.commit()
+    return {"channel_id": row[0], "start_time_utc": row[1]} if row else None
 
 
 async def list_segment_message_id_sets_for_run(
@@ -318,29 +399,7 @@ async def list_segment_message_id_sets_for_run(
     return {tuple(ids) for ids in grouped.values()}
 
 
-async def overlapping_segments_for_messages(
-    conn: aiosqlite.Connection,
-    *,
-    run_id: int,
-    channel_id: int,
-    message_ids: list[int],
-) -> list[dict[str, Any]]:
-    if not message_ids:
-        return []
-    placeholders = ",".join("?" for _ in message_ids)
-    return await _fetch_all_dicts(
-        conn,
-        f"""
-        SELECT DISTINCT cs.id, cs.status, cs.segment_key
-        FROM conversation_segments cs
-        JOIN segment_messages sm ON sm.segment_id = cs.id
-        WHERE cs.compiler_run_id = ?
-          AND cs.channel_id = ?
-          AND sm.discord_message_id IN ({placeholders})
-        ORDER BY cs.id
-        """,
-        (run_id, channel_id, *message_ids),
-    )
+MESSAGE_BATCH_SIZE = 2_000
 
 
 async def load_messages(
@@ -350,42 +409,71 @@ async def load_messages(
     to_time: datetime | None = None,
     channel_ids: list[int] | None = None,
 ) -> list[RawMemoryMessage]:
+    cursor = await conn.execute(*_messages_query(from_time, to_time, channel_ids))
+    return decode_message_rows(await cursor.fetchall())
+
+
+async def iter_messages(
+    conn: aiosqlite.Connection,
+    *,
+    from_time: datetime | None = None,
+    to_time: datetime | None = None,
+    channel_ids: list[int] | None = None,
+    batch_size: int = MESSAGE_BATCH_SIZE,
+) -> AsyncIterator[RawMemoryMessage]:
+    """`load_messages` in the same order, fetched `batch_size` rows at a time."""
+    cursor = await conn.execute(*_messages_query(from_time, to_time, channel_ids))
+    try:
+        while rows := await cursor.fetchmany(batch_size):
+            for message in decode_message_rows(rows):
+                yield message
+    finally:
+        await cursor.close()
+
+
+async def load_segment(conn: aiosqlite.Connection, span: SegmentSpan) -> SegmentCandidate:
+    """Reload the messages a `SegmentSpan` was taken from."""
+    (first_ms, first_id), (last_ms, last_id) = span.first, span.last
+    cursor = await conn.execute(
+        f"""
+        SELECT {MESSAGE_ROW_COLUMNS}
+        FROM messages m
+        LEFT JOIN users u ON u.discord_user_id = m.user_id
+        WHERE m.channel_id = ?
+          AND m.timestamp_ms BETWEEN ? AND ?
+          AND (m.timestamp_ms, m.discord_message_id) BETWEEN (?, ?) AND (?, ?)
+        ORDER BY m.timestamp_ms, m.discord_message_id
+        """,
+        (span.channel_id, first_ms, last_ms, first_ms, first_id, last_ms, last_id),
+    )
+    return SegmentCandidate(channel_id=span.channel_id, messages=decode_message_rows(await cursor.fetchall()))
+
+
+def _messages_query(
+    from_time: datetime | None,
+    to_time: datetime | None,
+    channel_ids: list[int] | None,
+) -> tuple[str, list[Any]]:
     where = []
     params: list[Any] = []
     if from_time is not None:
-        where.append("m.timestamp_utc >= ?")
-        params.append(from_time.isoformat())
+        where.append("m.timestamp_ms >= ?")
+        params.append(to_epoch_ms(from_time))
     if to_time is not None:
-        where.append("m.timestamp_utc < ?")
-        params.append(to_time.isoformat())
+        where.append("m.timestamp_ms < ?")
+        params.append(to_epoch_ms(to_time))
     if channel_ids:
         where.append(f"m.channel_id IN ({','.join('?' for _ in channel_ids)})")
         params.extend(channel_ids)
     where_sql = f"WHERE {' AND '.join(where)}" if where else ""
-    cursor = await conn.execute(
-        f"""
-        SELECT m.discord_message_id, m.channel_id, m.user_id,
-               COALESCE(u.display_name, '?'), m.content, m.timestamp_utc, m.is_bot
+    sql = f"""
+        SELECT {MESSAGE_ROW_COLUMNS}
         FROM messages m
         LEFT JOIN users u ON u.discord_user_id = m.user_id
         {where_sql}
-        ORDER BY m.channel_id, m.timestamp_utc, m.discord_message_id
-        """,
-        params,
-    )
-    rows = await cursor.fetchall()
-    return [
-        RawMemoryMessage(
-            discord_message_id=r[0],
-            channel_id=r[1],
-            user_id=r[2],
-            user_display_name=r[3],
-            content=r[4],
-            timestamp_utc=datetime.fromisoformat(r[5]),
-            is_bot=bool(r[6]),
-        )
-        for r in rows
-    ]
+        ORDER BY m.channel_id, m.timestamp_ms, m.discord_message_id
+        """
+    return sql, params
 
 
 async def insert_segment(
@@ -402,14 +490,16 @@ async def insert_segment(
     skip_reason: str | None = None,
     error: str | None = None,
     retry_count: int = 0,
+    commit: bool = True,
 ) -> int:
     cursor = await conn.execute(
         """
         INSERT INTO conversation_segments
-            (compiler_run_id, segment_key, channel_id, start_time_utc, end_time_utc, message_count,
+            (compiler_run_id, segment_key, channel_id, start_time_utc, end_time_utc,
+             start_time_ms, end_time_ms, message_count,
              human_message_count, total_chars, participant_ids_json, topic_title,
              summary, importance, status, skip_reason, error, retry_count)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """,
         (
             compiler_run_id,
@@ -417,6 +507,8 @@ async def insert_segment(
             segment.channel_id,
             segment.start_time_utc.isoformat(),
             segment.end_time_utc.isoformat(),
+            to_epoch_ms(segment.start_time_utc),
+            to_epoch_ms(segment.end_time_utc),
             segment.message_count,
             segment.human_message_count,
             segment.total_chars,
@@ -431,14 +523,13 @@ async def insert_segment(
         ),
     )
     segment_id = int(cursor.lastrowid)
-    for pos, message in enumerate(segment.messages):
-        await conn.execute(
-            """
-            INSERT INTO segment_messages (segment_id, discord_message_id, position)
-            VALUES (?, ?, ?)
-            """,
-            (segment_id, message.discord_message_id, pos),
-        )
+    await conn.executemany(
+        """
+        INSERT INTO segment_messages (segment_id, discord_message_id, position)
+        VALUES (?, ?, ?)
+        """,
+        [(segment_id, message.discord_message_id, pos) for pos, message in enumerate(segment.messages)],
+    )
     await conn.execute(
         """
         INSERT INTO conversation_segments_fts(rowid, topic_title, summary)
@@ -446,50 +537,119 @@ async def insert_segment(
         """,
         (segment_id, topic_title, summary),
     )
-    for tag in tags or []:
-        await conn.execute(
-            """
-            INSERT OR IGNORE INTO conversation_segment_tags (segment_id, tag)
-            VALUES (?, ?)
-            """,
-            (segment_id, tag),
-        )
-    await conn.commit()
+    await conn.executemany(
+        """
+        INSERT OR IGNORE INTO conversation_segment_tags (segment_id, tag)
+        VALUES (?, ?)
+        """,
+        [(segment_id, tag) for tag in tags or []],
+    )
+    if commit:
+        await conn.commit()
     return segment_id
 
 
 async def completed_segments_for_rollups(
     conn: aiosqlite.Connection,
     run_id: int,
+    *,
+    period: tuple[int, datetime, datetime] | None = None,
 ) -> list[dict[str, Any]]:
+    """Summarized segments of a run, or only those of one (channel_id, start, end) period."""
+    where, params = _period_filter(period, column="start_time_ms")
     return await _fetch_all_dicts(
         conn,
-        """
+        f"""
         SELECT id, channel_id, start_time_utc, end_time_utc, topic_title, summary, importance
         FROM conversation_segments
-        WHERE compiler_run_id = ? AND status = 'summarized'
-        ORDER BY channel_id, start_time_utc, id
+        WHERE compiler_run_id = ? AND status = 'summarized'{where}
+        ORDER BY channel_id, start_time_ms, id
         """,
-        (run_id,),
+        (run_id, *params),
     )
 
 
 async def skipped_segments_for_daily_ambient(
     conn: aiosqlite.Connection,
     run_id: int,
+    *,
+    period: tuple[int, datetime, datetime] | None = None,
 ) -> list[dict[str, Any]]:
+    where, params = _period_filter(period, column="start_time_ms")
     return await _fetch_all_dicts(
         conn,
-        """
+        f"""
         SELECT id, channel_id, start_time_utc, end_time_utc, message_count,
                human_message_count, total_chars, participant_ids_json,
                topic_title, summary, importance, skip_reason
         FROM conversation_segments
-        WHERE compiler_run_id = ? AND status = 'skipped'
-        ORDER BY channel_id, start_time_utc, id
+        WHERE compiler_run_id = ? AND status = 'skipped'{where}
+        ORDER BY channel_id, start_time_ms, id
         """,
-        (run_id,),
+        (run_id, *params),
+    )
+
+
+def _period_filter(
+    period: tuple[int, datetime, datetime] | None,
+    *,
+    column: str,
+    encode: Callable[[datetime], Any] = _ms,
+) -> tuple[str, tuple[Any, ...]]:
+    if period is None:
+        return "", ()
+    channel_id, start, end = period
+    return f" AND channel_id = ? AND {column} >= ? AND {column} < ?", (channel_id, encode(start), encode(end))
+
+
+async def mark_dirty_periods(
+    conn: aiosqlite.Connection,
+    run_id: int,
+    periods: Iterable[tuple[int, str, datetime]],
+    *,
+    commit: bool = True,
+) -> None:
+    """Queue (channel_id, period_type, period_start) rollups of a run for rebuilding."""
+    await conn.executemany(
+        """
+        INSERT OR IGNORE INTO memory_dirty_periods (compiler_run_id, channel_id, period_type, period_start_utc)
+        VALUES (?, ?, ?, ?)
+        """,
+        [(run_id, channel_id, period_type, start.isoformat()) for channel_id, period_type, start in periods],
     )
+    if commit:
+        await conn.commit()
+
+
+async def dirty_periods(conn: aiosqlite.Connection, run_id: int, period_type: str) -> list[tuple[int, datetime]]:
+    rows = await conn.execute_fetchall(
+        """
+        SELECT channel_id, period_start_utc FROM memory_dirty_periods
+        WHERE compiler_run_id = ? AND period_type = ?
+        """,
+        (run_id, period_type),
+    )
+    return [(int(row[0]), datetime.fromisoformat(row[1])) for row in rows]
+
+
+async def clear_dirty_period(
+    conn: aiosqlite.Connection,
+    run_id: int,
+    *,
+    channel_id: int,
+    period_type: str,
+    period_start: datetime,
+    commit: bool = True,
+) -> None:
+    await conn.execute(
+        """
+        DELETE FROM memory_dirty_periods
+        WHERE compiler_run_id = ? AND channel_id = ? AND period_type = ? AND period_start_utc = ?
+        """,
+        (run_id, channel_id, period_type, period_start.isoformat()),
+    )
+    if commit:
+        await conn.commit()
 
 
 async def memory_items_for_segments(
@@ -506,7 +666,7 @@ async def memory_items_for_segments(
                created_at_source, last_seen_at_source
         FROM memory_items
         WHERE segment_id IN ({placeholders})
-        ORDER BY created_at_source, id
+        ORDER BY created_at_source_ms, id
         """,
         tuple(segment_ids),
     )
@@ -521,7 +681,7 @@ async def list_daily_ambient_memory_for_run(
         """
         SELECT * FROM daily_ambient_memory
         WHERE compiler_run_id = ?
-        ORDER BY day_start_utc, channel_id
+        ORDER BY day_start_ms, channel_id
         """,
         (run_id,),
     )
@@ -542,6 +702,34 @@ async def list_rollups_for_run(
     )
 
 
+async def get_cached_summary(conn: aiosqlite.Connection, cache_key: str) -> str | None:
+    rows = await conn.execute_fetchall(
+        "SELECT response_json FROM memory_summary_cache WHERE cache_key = ?",
+        (cache_key,),
+    )
+    return rows[0][0] if rows else None
+
+
+async def put_cached_summary(
+    conn: aiosqlite.Connection,
+    *,
+    cache_key: str,
+    kind: str,
+    model: str,
+    response_json: str,
+    commit: bool = True,
+) -> None:
+    await conn.execute(
+        """
+        INSERT OR REPLACE INTO memory_summary_cache (cache_key, kind, model, prompt_version, response_json)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (cache_key, kind, model, PROMPT_VERSION, response_json),
+    )
+    if commit:
+        await conn.commit()
+
+
 async def get_rolling_state(conn: aiosqlite.Connection, run_name: str) -> dict[str, Any] | None:
     return await _fetch_one_dict(
         conn,
@@ -682,6 +870,7 @@ async def upsert_daily_ambient_memory(
     error: str | None,
     source_fingerprint: str,
     source_segments: list[int],
+    commit: bool = True,
 ) -> int:
     existing = await get_daily_ambient_by_day(
         conn,
@@ -708,15 +897,17 @@ async def upsert_daily_ambient_memory(
         cursor = await conn.execute(
             """
             INSERT INTO daily_ambient_memory
-                (compiler_run_id, channel_id, day_start_utc, day_end_utc,
+                (compiler_run_id, channel_id, day_start_utc, day_end_utc, day_start_ms, day_end_ms,
                  title, summary, key_items_json, importance, status, error, source_fingerprint)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
             (
                 run_id,
                 channel_id,
                 day_start_utc,
                 day_end_utc,
+                _ms(day_start_utc),
+                _ms(day_end_utc),
                 title,
                 summary,
                 json.dumps(key_items, ensure_ascii=False),
@@ -734,35 +925,38 @@ async def upsert_daily_ambient_memory(
         """,
         (ambient_id, title, summary, json.dumps(key_items, ensure_ascii=False)),
     )
-    for segment_id in source_segments:
-        await conn.execute(
-            """
-            INSERT OR IGNORE INTO daily_ambient_sources (ambient_id, segment_id)
-            VALUES (?, ?)
-            """,
-            (ambient_id, segment_id),
-        )
-    for tag in tags:
-        await conn.execute(
-            "INSERT OR IGNORE INTO daily_ambient_tags (ambient_id, tag) VALUES (?, ?)",
-            (ambient_id, tag),
-        )
-    await conn.commit()
+    await conn.executemany(
+        """
+        INSERT OR IGNORE INTO daily_ambient_sources (ambient_id, segment_id)
+        VALUES (?, ?)
+        """,
+        [(ambient_id, segment_id) for segment_id in source_segments],
+    )
+    await conn.executemany(
+        "INSERT OR IGNORE INTO daily_ambient_tags (ambient_id, tag) VALUES (?, ?)",
+        [(ambient_id, tag) for tag in tags],
+    )
+    if commit:
+        await conn.commit()
     return ambient_id
 
 
 async def completed_rollups_for_months(
     conn: aiosqlite.Connection,
     run_id: int,
+    *,
+    period: tuple[int, datetime, datetime] | None = None,
 ) -> list[dict[str, Any]]:
+    # Rollups have no epoch-ms columns; their ISO starts are all UTC and sort as text.
+    where, params = _period_filter(period, column="period_start_utc", encode=_dt)
     return await _fetch_all_dicts(
         conn,
-        """
+        f"""
         SELECT * FROM memory_rollups
-        WHERE compiler_run_id = ? AND period_type = 'week' AND status = 'completed'
+        WHERE compiler_run_id = ? AND period_type = 'week' AND status = 'completed'{where}
         ORDER BY channel_id, period_start_utc
         """,
-        (run_id,),
+        (run_id, *params),
     )
 
 
@@ -805,6 +999,7 @@ async def upsert_rollup(
     source_segments: list[int] | None = None,
     source_memory_items: list[int] | None = None,
     source_rollups: list[int] | None = None,
+    commit: bool = True,
 ) -> int:
     existing = await get_rollup_by_period(
         conn,
@@ -859,25 +1054,27 @@ async def upsert_rollup(
         """,
         (rollup_id, title, summary, json.dumps(key_items, ensure_ascii=False)),
     )
-    for source_kind, ids in (
-        ("segment", source_segments or []),
-        ("memory_item", source_memory_items or []),
-        ("rollup", source_rollups or []),
-    ):
-        for source_id in ids:
-            await conn.execute(
-                """
-                INSERT OR IGNORE INTO memory_rollup_sources (rollup_id, source_kind, source_id)
-                VALUES (?, ?, ?)
-                """,
-                (rollup_id, source_kind, source_id),
+    await conn.executemany(
+        """
+        INSERT OR IGNORE INTO memory_rollup_sources (rollup_id, source_kind, source_id)
+        VALUES (?, ?, ?)
+        """,
+        [
+            (rollup_id, source_kind, source_id)
+            for source_kind, ids in (
+                ("segment", source_segments or []),
+                ("memory_item", source_memory_items or []),
+                ("rollup", source_rollups or []),
             )
-    for tag in tags:
-        await conn.execute(
-            "INSERT OR IGNORE INTO memory_rollup_tags (rollup_id, tag) VALUES (?, ?)",
-            (rollup_id, tag),
-        )
-    await conn.commit()
+            for source_id in ids
+        ],
+    )
+    await conn.executemany(
+        "INSERT OR IGNORE INTO memory_rollup_tags (rollup_id, tag) VALUES (?, ?)",
+        [(rollup_id, tag) for tag in tags],
+    )
+    if commit:
+        await conn.commit()
     return rollup_id
 
 
@@ -888,6 +1085,7 @@ async def insert_memory_item(
     segment_id: int,
     item: dict[str, Any],
     segment: SegmentCandidate,
+    commit: bool = True,
 ) -> int:
     source_ids = [int(x) for x in item.get("source_message_ids", []) if x]
     created_at_source, last_seen_at_source = _source_time_bounds(segment, source_ids)
@@ -895,8 +1093,9 @@ async def insert_memory_item(
         """
         INSERT INTO memory_items
             (compiler_run_id, segment_id, type, subject, text, confidence, importance,
-             speaker_ids_json, created_at_source, last_seen_at_source)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+             speaker_ids_json, created_at_source, last_seen_at_source,
+             created_at_source_ms, last_seen_at_source_ms)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """,
         (
             compiler_run_id,
@@ -909,25 +1108,25 @@ async def insert_memory_item(
             json.dumps(item.get("speaker_ids", [])),
             _dt(created_at_source),
             _dt(last_seen_at_source),
+            _ms(created_at_source),
+            _ms(last_seen_at_source),
         ),
     )
     item_id = int(cursor.lastrowid)
-    for message_id in source_ids:
-        await conn.execute(
-            """
-            INSERT OR IGNORE INTO memory_item_sources (memory_item_id, discord_message_id)
-            VALUES (?, ?)
-            """,
-            (item_id, message_id),
-        )
-    for tag in item.get("tags", []):
-        await conn.execute(
-            """
-            INSERT OR IGNORE INTO memory_item_tags (memory_item_id, tag)
-            VALUES (?, ?)
-            """,
-            (item_id, tag),
-        )
+    await conn.executemany(
+        """
+        INSERT OR IGNORE INTO memory_item_sources (memory_item_id, discord_message_id)
+        VALUES (?, ?)
+        """,
+        [(item_id, message_id) for message_id in source_ids],
+    )
+    await conn.executemany(
+        """
+        INSERT OR IGNORE INTO memory_item_tags (memory_item_id, tag)
+        VALUES (?, ?)
+        """,
+        [(item_id, tag) for tag in item.get("tags", [])],
+    )
     await conn.execute(
         """
         INSERT INTO memory_items_fts(rowid, type, subject, text)
@@ -935,7 +1134,8 @@ async def insert_memory_item(
         """,
         (item_id, item["type"], item.get("subject", ""), item["text"]),
     )
-    await conn.commit()
+    if commit:
+        await conn.commit()
     return item_id
 
 
@@ -1,14 +1,19 @@
 """Responses API tool definitions and executors for memory recall."""
+import asyncio
 import json
+import logging
+import time
 from datetime import datetime
-from typing import Any
+from typing import Any, Awaitable, Callable
 
-import aiosqlite
-
-from klatrebot_v2.db import user_aliases
+from klatrebot_v2.db import connection, user_aliases
+from klatrebot_v2.db.connection import DbHandle
+from klatrebot_v2.memory.recall_cache import get_recall_cache, recall_key, run_generation
 from klatrebot_v2.memory.retrieval import get_memory_sources, recall_community_memory
 
 
+logger = logging.getLogger(__name__)
+
 MEMORY_TOOL_DEFS = [
     {
         "type": "function",
@@ -58,7 +63,7 @@ MEMORY_TOOL_DEFS = [
 
 
 async def execute_memory_tool(
-    conn: aiosqlite.Connection,
+    conn: DbHandle,
     *,
     run_id: int,
     name: str,
@@ -67,19 +72,27 @@ async def execute_memory_tool(
     if name == "recall_community_memory":
         start = _parse_dt(arguments.get("date_start"))
         end = _parse_dt(arguments.get("date_end"))
-        people_resolution = await user_aliases.resolve_people_names(conn, arguments.get("people_names"))
+        async with connection.reader(conn) as read_conn:
+            people_resolution = await user_aliases.resolve_people_names(read_conn, arguments.get("people_names"))
+            generation = await run_generation(read_conn, run_id)
         people = _merge_people(arguments.get("people"), people_resolution.resolved_ids)
-        result = await recall_community_memory(
-            conn,
-            run_id=run_id,
-            query=arguments["query"],
-            channel_id=arguments.get("channel_id"),
-            people=people,
-            date_range=(start, end) if start or end else None,
-            memory_types=arguments.get("memory_types"),
-            limit=int(arguments.get("limit") or 6),
-        )
+        recall_args = {
+            "query": arguments["query"],
+            "channel_id": arguments.get("channel_id"),
+            "people": people,
+            "date_range": (start, end) if start or end else None,
+            "memory_types": arguments.get("memory_types"),
+            "limit": int(arguments.get("limit") or 6),
+        }
+        cache = get_recall_cache(conn)
+        key = recall_key(**recall_args)
+        result = cache.get(run_id, generation, key)
+        if result is None:
+            result = await recall_community_memory(conn, run_id=run_id, **recall_args)
+            cache.put(run_id, generation, key, result)
         payload = result.model_dump(mode="json")
+        if payload.get("debug") is None:
+            payload.pop("debug", None)
         if arguments.get("people_names"):
             payload["resolved_people"] = {
                 "ids": people_resolution.resolved_ids,
@@ -99,6 +112,44 @@ async def execute_memory_tool(
     return json.dumps({"error": f"Unknown memory tool: {name}"})
 
 
+MemoryToolExecutor = Callable[..., Awaitable[str]]
+
+
+async def execute_memory_tool_calls(
+    conn: DbHandle,
+    calls: list[dict[str, Any]],
+    *,
+    run_id: int,
+    timeout_s: float,
+    execute: MemoryToolExecutor | None = None,
+) -> list[str]:
+    """Run one Responses round's calls concurrently; outputs come back in call order.
+
+    Each call borrows its own reader from `conn`. A call that exceeds `timeout_s`
+    returns an error payload so the model can carry on without it.
+    """
+    execute = execute or execute_memory_tool
+
+    async def run_one(call: dict[str, Any]) -> str:
+        started = time.perf_counter()
+        try:
+            return await asyncio.wait_for(
+                execute(conn, run_id=run_id, name=call["name"], arguments=call["arguments"]),
+                timeout=timeout_s,
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                "memory_tool.timeout name=%s call_id=%s timeout=%.1fs", call["name"], call.get("call_id"), timeout_s
+            )
+            return json.dumps({"error": f"Memory tool {call['name']} timed out"})
+        finally:
+            logger.debug(
+                "memory_tool.call name=%s duration=%.1fms", call["name"], (time.perf_counter() - started) * 1000
+            )
+
+    return list(await asyncio.gather(*(run_one(call) for call in calls)))
+
+
 def _parse_dt(value: str | None) -> datetime | None:
     if not value:
         return None
@@ -20,8 +20,12 @@ class Settings(BaseSettings):
 
     # Optional (defaults)
     model: str = "gpt-5.6-terra"
+    # Responses API endpoint; e.g. the local stand-in in klatrebot_v2.llm.fake_server. None = api.openai.com.
+    openai_base_url: str | None = None
     soul_path: str = "./SOUL.MD"
     db_path: str = "./klatrebot_v2.db"
+    # Read-only connections alongside the single writer (WAL). 0 = reads share the writer.
+    db_reader_pool_size: int = 3
     user_aliases_config_path: str | None = None
 
     timezone: str = "Europe/Copenhagen"
@@ -35,13 +39,35 @@ class Settings(BaseSettings):
     seasonal_locations: dict[int, str] = {0: "Sydhavn", 3: "Vanløse"}
 
     gpt_recent_message_count: int = 25
+    # Messages kept in memory per channel for !gpt context and the !referat tail.
+    recent_buffer_size: int = 200
+    # Stream !gpt answers into an early reply, edited at most once per interval.
+    gpt_streaming_enabled: bool = True
+    gpt_stream_edit_interval_ms: int = 1200
     rate_limit_per_user_per_hour: int = 30
     log_level: str = "INFO"
 
+    # Write-behind message ingestion: flush after this many ms or this many queued rows.
+    ingest_flush_interval_ms: int = 250
+    ingest_flush_max_rows: int = 200
+
+    # USD per million tokens by model: (input, cached input, output). `memory stats` prices calls with it.
+    llm_prices_per_million_tokens: dict[str, tuple[float, float, float]] = {}
+
     memory_enabled: bool = False
     memory_active_run_id: int | None = None
     memory_active_run_name: str | None = None
     memory_compiler_model: str = "gpt-5.6-luna"
+    # Prompt-token budget for packing small segments into one compiler request; 0 disables.
+    memory_compiler_pack_token_budget: int = 0
+    # Retries a compile may spend up front, plus this many per successful LLM call.
+    memory_compiler_retry_budget: int = 20
+    memory_compiler_retry_ratio: float = 0.1
+    # Per-call limit for memory tools; calls in one Responses round run concurrently.
+    memory_tool_timeout_seconds: float = 15.0
+    # Recall results cached per run until it recompiles; 0 entries disables the cache.
+    memory_recall_cache_size: int = 256
+    memory_recall_cache_ttl_seconds: int = 600
     memory_segment_gap_minutes: int = 30
     memory_segment_min_human_messages: int = 8
     memory_segment_min_total_chars: int = 300
@@ -55,6 +81,8 @@ class Settings(BaseSettings):
     memory_rolling_initial_lookback_hours: int = 24
     memory_rolling_concurrency: int = 2
     memory_rolling_lock_ttl_minutes: int = 180
+    # Compile the rolling run inside the bot once conversations settle, instead of only from the timer.
+    memory_rolling_in_bot: bool = False
 
 
 @lru_cache(maxsize=1)
@@ -87,7 +87,7 @@ async def post_klatretid_embed_in(
         post_time_local=post_time_local, start_hour=s.klatretid_start_hour
     )
     await att_db.create_session(
-        bot.db_conn,
+        bot.db,
         date_local=post_time_local.strftime("%Y-%m-%d"),
         channel_id=channel.id,
         message_id=msg.id,
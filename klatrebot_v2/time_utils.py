@@ -31,3 +31,18 @@ def since_5am_local(*, now: datetime, tz: pytz.BaseTzInfo) -> datetime:
         return today_5am
     yesterday = local_now.date() - timedelta(days=1)
     return tz.localize(datetime.combine(yesterday, time(hour=5)))
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_ONE_MS = timedelta(milliseconds=1)
+
+
+def to_epoch_ms(value: datetime) -> int:
+    """Exact integer milliseconds since the Unix epoch (naive values are taken as UTC)."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - _EPOCH) // _ONE_MS
+
+
+def from_epoch_ms(value: int) -> datetime:
+    return _EPOCH + timedelta(milliseconds=value)
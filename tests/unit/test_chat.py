@@ -316,6 +316,69 @@ async def test_reply_resolves_active_memory_run_by_name(monkeypatch, tmp_path, d
     assert calls == [(33, "recall_community_memory", {"query": "Spanien", "channel_id": 42})]
 
 
+async def test_reply_streams_text_deltas_when_callback_given(monkeypatch, tmp_path, db):
+    soul = tmp_path / "SOUL.MD"
+    soul.write_text("Soul.")
+    monkeypatch.setenv("DISCORD_KEY", "x"); monkeypatch.setenv("OPENAI_KEY", "x")
+    monkeypatch.setenv("DISCORD_MAIN_CHANNEL_ID", "1"); monkeypatch.setenv("DISCORD_SANDBOX_CHANNEL_ID", "2")
+    monkeypatch.setenv("ADMIN_USER_ID", "3"); monkeypatch.setenv("SOUL_PATH", str(soul))
+
+    completed = MagicMock()
+    completed.output_text = "Hej brormand"
+    completed.output = []
+
+    async def events():
+        yield SimpleNamespace(type="response.created")
+        yield SimpleNamespace(type="response.output_text.delta", delta="Hej ")
+        yield SimpleNamespace(type="response.output_text.delta", delta="brormand")
+        yield SimpleNamespace(type="response.completed", response=completed)
+
+    from klatrebot_v2.llm import chat, client, prompt
+    from klatrebot_v2.settings import get_settings
+    client._client = None
+    prompt.load_soul.cache_clear()
+    get_settings.cache_clear()
+    fake_client = MagicMock()
+    fake_client.responses = MagicMock()
+    fake_client.responses.create = AsyncMock(return_value=events())
+    monkeypatch.setattr(client, "_client", fake_client)
+    monkeypatch.setattr(chat, "_get_db_conn", lambda: db)
+    deltas = []
+
+    async def on_text_delta(delta):
+        deltas.append(delta)
+
+    result = await chat.reply(question="hvad så", asking_user_id=42, channel_id=0, on_text_delta=on_text_delta)
+
+    assert deltas == ["Hej ", "brormand"]
+    assert result.text == "Hej brormand"
+    assert fake_client.responses.create.await_args.kwargs["stream"] is True
+
+
+async def test_streamed_round_announces_its_start_before_its_text():
+    from klatrebot_v2.llm import chat
+
+    completed = MagicMock()
+
+    async def events():
+        yield SimpleNamespace(type="response.created")
+        yield SimpleNamespace(type="response.output_text.delta", delta="Svar")
+        yield SimpleNamespace(type="response.completed", response=completed)
+
+    fake_client = MagicMock()
+    fake_client.responses.create = AsyncMock(return_value=events())
+    seen = []
+
+    async def on_text_delta(delta):
+        seen.append(delta)
+
+    async def on_round_start():
+        seen.append("<round>")
+
+    assert await chat._responses_call(fake_client, on_text_delta, on_round_start, model="m") is completed
+    assert seen == ["<round>", "Svar"]
+
+
 def test_extract_sources_from_response():
     from klatrebot_v2.llm.chat import _extract_sources
 
@@ -1,9 +1,41 @@
+import asyncio
 from contextlib import asynccontextmanager
 from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock
 
+import pytest
+
 from klatrebot_v2.cogs import chat as chat_cog
 from klatrebot_v2.llm.chat import ChatReply
+from klatrebot_v2.settings import get_settings
+
+
+@pytest.fixture(autouse=True)
+def _settings(monkeypatch):
+    for key, value in {
+        "DISCORD_KEY": "x",
+        "OPENAI_KEY": "x",
+        "DISCORD_MAIN_CHANNEL_ID": "1",
+        "DISCORD_SANDBOX_CHANNEL_ID": "2",
+        "ADMIN_USER_ID": "3",
+        "GPT_STREAM_EDIT_INTERVAL_MS": "0",
+    }.items():
+        monkeypatch.setenv(key, value)
+    get_settings.cache_clear()
+
+
+def _ctx(reply):
+    @asynccontextmanager
+    async def typing():
+        yield
+
+    return SimpleNamespace(
+        author=SimpleNamespace(id=42),
+        channel=SimpleNamespace(id=7),
+        message=SimpleNamespace(mentions=[]),
+        typing=typing,
+        reply=reply,
+    )
 
 
 async def test_gpt_reply_suppresses_link_embeds(monkeypatch):
@@ -37,3 +69,139 @@ async def test_gpt_reply_suppresses_link_embeds(monkeypatch):
     ctx.reply.assert_awaited_once()
     assert ctx.reply.await_args.kwargs["suppress_embeds"] is True
     assert "https://example.com/source" in ctx.reply.await_args.args[0]
+
+
+async def test_gpt_streams_into_early_reply_and_finalizes_with_sources(monkeypatch):
+    monkeypatch.setattr(chat_cog.ratelimit, "check_and_record", lambda _user_id: True)
+
+    async def fake_reply(**kwargs):
+        await kwargs["on_text_delta"]("Et ")
+        await kwargs["on_text_delta"]("svar.")
+        return ChatReply(text="Et svar.", sources=["https://example.com/source"])
+
+    monkeypatch.setattr(chat_cog.chat, "reply", fake_reply)
+    message = SimpleNamespace(edit=AsyncMock())
+    ctx = _ctx(AsyncMock(return_value=message))
+    cog = chat_cog.ChatCog(MagicMock())
+
+    await chat_cog.ChatCog.gpt.callback(cog, ctx, question="Hvad sker der?")
+
+    ctx.reply.assert_awaited_once()
+    assert ctx.reply.await_args.args[0].startswith("Et ")
+    assert ctx.reply.await_args.kwargs["suppress_embeds"] is True
+    final = message.edit.await_args_list[-1].kwargs["content"]
+    assert final == "Et svar.\n\n_Kilder: https://example.com/source_"
+
+
+async def test_gpt_failure_mid_stream_replaces_the_cursor_with_an_error(monkeypatch):
+    monkeypatch.setattr(chat_cog.ratelimit, "check_and_record", lambda _user_id: True)
+
+    async def fake_reply(**kwargs):
+        await kwargs["on_text_delta"]("Et halvt ")
+        raise RuntimeError("stream broke")
+
+    monkeypatch.setattr(chat_cog.chat, "reply", fake_reply)
+    message = SimpleNamespace(edit=AsyncMock())
+    ctx = _ctx(AsyncMock(return_value=message))
+    cog = chat_cog.ChatCog(MagicMock())
+
+    # Handled in the cog, so on_command_error does not reply a second time.
+    await chat_cog.ChatCog.gpt.callback(cog, ctx, question="Hvad sker der?")
+
+    ctx.reply.assert_awaited_once()
+    assert message.edit.await_args_list[-1].kwargs["content"] == f"Et halvt\n\n{chat_cog._ERROR_TEXT}"
+
+
+async def test_gpt_failure_without_streaming_replies_once(monkeypatch):
+    monkeypatch.setenv("GPT_STREAMING_ENABLED", "false")
+    get_settings.cache_clear()
+    monkeypatch.setattr(chat_cog.ratelimit, "check_and_record", lambda _user_id: True)
+    monkeypatch.setattr(chat_cog.chat, "reply", AsyncMock(side_effect=RuntimeError("api down")))
+    ctx = _ctx(AsyncMock())
+    cog = chat_cog.ChatCog(MagicMock())
+
+    await chat_cog.ChatCog.gpt.callback(cog, ctx, question="Hvad sker der?")
+
+    ctx.reply.assert_awaited_once()
+    assert ctx.reply.await_args.args[0] == chat_cog._ERROR_TEXT
+
+
+async def test_gpt_stream_is_not_held_up_by_a_slow_edit(monkeypatch):
+    monkeypatch.setattr(chat_cog.ratelimit, "check_and_record", lambda _user_id: True)
+    release = asyncio.Event()
+    previews = []
+    blocked_while_streaming = []
+
+    async def slow_edit(*, content):
+        previews.append(content)
+        if len(previews) == 1:
+            await release.wait()
+
+    async def fake_reply(**kwargs):
+        for word in ("Et ", "langt ", "svar ", "i ", "bidder."):
+            await kwargs["on_text_delta"](word)
+            await asyncio.sleep(0)
+        # Every delta was delivered while the first edit was still waiting on Discord.
+        blocked_while_streaming.append(len(previews) == 1 and not release.is_set())
+        release.set()
+        return ChatReply(text="Et langt svar i bidder.")
+
+    monkeypatch.setattr(chat_cog.chat, "reply", fake_reply)
+    message = SimpleNamespace(edit=slow_edit)
+    ctx = _ctx(AsyncMock(return_value=message))
+    cog = chat_cog.ChatCog(MagicMock())
+
+    await chat_cog.ChatCog.gpt.callback(cog, ctx, question="Hvad sker der?")
+
+    assert blocked_while_streaming == [True]
+    # The blocked preview, then straight to the final answer.
+    assert previews[-1] == "Et langt svar i bidder."
+    assert len(previews) == 2
+
+
+async def test_gpt_splits_a_final_answer_over_discords_limit(monkeypatch):
+    monkeypatch.setattr(chat_cog.ratelimit, "check_and_record", lambda _user_id: True)
+    text = "a" * 1500 + "\n" + "b" * 1500
+
+    async def fake_reply(**kwargs):
+        await kwargs["on_text_delta"](text)
+        return ChatReply(text=text)
+
+    monkeypatch.setattr(chat_cog.chat, "reply", fake_reply)
+    message = SimpleNamespace(edit=AsyncMock())
+    ctx = _ctx(AsyncMock(return_value=message))
+    ctx.send = AsyncMock()
+    cog = chat_cog.ChatCog(MagicMock())
+
+    await chat_cog.ChatCog.gpt.callback(cog, ctx, question="Hvad sker der?")
+
+    assert len(ctx.reply.await_args.args[0]) <= chat_cog._DISCORD_MAX_CHARS
+    assert message.edit.await_args_list[-1].kwargs["content"] == "a" * 1500
+    ctx.send.assert_awaited_once()
+    assert ctx.send.await_args.args[0] == "b" * 1500
+
+
+async def test_gpt_preview_drops_text_streamed_before_a_tool_call(monkeypatch):
+    monkeypatch.setattr(chat_cog.ratelimit, "check_and_record", lambda _user_id: True)
+    previews = []
+
+    async def fake_reply(**kwargs):
+        await kwargs["on_round_start"]()
+        await kwargs["on_text_delta"]("Lad mig slå det op.")
+        await asyncio.sleep(0.01)
+        await kwargs["on_round_start"]()
+        await kwargs["on_text_delta"]("Svaret.")
+        await asyncio.sleep(0.01)
+        return ChatReply(text="Svaret.")
+
+    async def edit(*, content):
+        previews.append(content)
+
+    monkeypatch.setattr(chat_cog.chat, "reply", fake_reply)
+    ctx = _ctx(AsyncMock(return_value=SimpleNamespace(edit=edit)))
+    cog = chat_cog.ChatCog(MagicMock())
+
+    await chat_cog.ChatCog.gpt.callback(cog, ctx, question="Hvad sker der?")
+
+    assert ctx.reply.await_args.args[0].startswith("Lad mig")
+    assert previews == ["Svaret. …", "Svaret."]
@@ -0,0 +1,92 @@
+import asyncio
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+import pytest_asyncio
+
+from klatrebot_v2.db import connection, messages as msg_db, migrations, users as users_db
+
+
+@pytest_asyncio.fixture
+async def database(tmp_path):
+    db = await connection.open_database(str(tmp_path / "bot.db"), readers=2)
+    await migrations.run(db.writer)
+    yield db
+    await db.close()
+
+
+async def test_readers_see_committed_writes(database):
+    await users_db.upsert(database.writer, discord_user_id=10, display_name="Nicklas")
+    await msg_db.insert(
+        database,
+        discord_message_id=1,
+        channel_id=42,
+        user_id=10,
+        content="hej",
+        timestamp_utc=datetime(2026, 5, 1, 12, 0, tzinfo=timezone.utc),
+    )
+
+    rows = await msg_db.recent_with_authors(database, channel_id=42, limit=5)
+
+    assert [(r.user_display_name, r.content) for r in rows] == [("Nicklas", "hej")]
+    assert database.reader_count == 2
+    assert database.stats.acquisitions == 1
+
+
+async def test_reader_connections_are_read_only(database):
+    async with database.reader() as conn:
+        assert conn is not database.writer
+        with pytest.raises(sqlite3.OperationalError):
+            await conn.execute("INSERT INTO users (discord_user_id, display_name) VALUES (1, 'x')")
+
+
+async def test_pool_records_wait_time_when_exhausted(database):
+    release = asyncio.Event()
+
+    async def hold() -> None:
+        async with database.reader():
+            await release.wait()
+
+    holders = [asyncio.create_task(hold()) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    async def borrow() -> None:
+        async with database.reader():
+            pass
+
+    waiter = asyncio.create_task(borrow())
+    await asyncio.sleep(0.02)
+    release.set()
+    await asyncio.gather(*holders, waiter)
+
+    assert database.stats.waits == 1
+    assert database.stats.max_wait_ms >= 10
+
+
+async def test_memory_database_reads_through_writer():
+    db = await connection.open_database(":memory:", readers=3)
+    try:
+        async with connection.reader(db) as conn:
+            assert conn is db.writer
+        assert connection.writer(db) is db.writer
+    finally:
+        await db.close()
+
+
+async def test_bare_connection_is_its_own_reader_and_writer(db):
+    async with connection.reader(db) as conn:
+        assert conn is db
+    assert connection.writer(db) is db
+
+
+async def test_writer_waits_for_other_writers_instead_of_failing_fast(database):
+    rows = await database.writer.execute_fetchall("PRAGMA busy_timeout")
+    assert rows[0][0] == connection.BUSY_TIMEOUT_MS
+
+
+async def test_readers_wait_out_locks_like_the_writer(database):
+    for _ in range(database.reader_count):
+        async with database.reader() as conn:
+            rows = await conn.execute_fetchall("PRAGMA busy_timeout")
+            assert rows[0][0] == connection.BUSY_TIMEOUT_MS
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta, timezone
+
+import openai
+import pytest
+
+from klatrebot_v2.db import messages as msg_db, users as users_db
+from klatrebot_v2.llm import chat, client, prompt
+from klatrebot_v2.llm.fake_server import FakeConfig, FakeResponsesServer
+from klatrebot_v2.memory.compiler import CompilerConfig, compile_run
+from klatrebot_v2.memory.store import list_rollups_for_run, list_segments_for_run
+from klatrebot_v2.settings import get_settings
+
+
+_BASE = datetime(2026, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+async def server(monkeypatch, tmp_path):
+    soul = tmp_path / "SOUL.MD"
+    soul.write_text("Du er en klatrebot.")
+    async with FakeResponsesServer(FakeConfig(seed=1)) as running:
+        monkeypatch.setenv("DISCORD_KEY", "x")
+        monkeypatch.setenv("OPENAI_KEY", "x")
+        monkeypatch.setenv("DISCORD_MAIN_CHANNEL_ID", "1")
+        monkeypatch.setenv("DISCORD_SANDBOX_CHANNEL_ID", "2")
+        monkeypatch.setenv("ADMIN_USER_ID", "3")
+        monkeypatch.setenv("SOUL_PATH", str(soul))
+        monkeypatch.setenv("OPENAI_BASE_URL", running.base_url)
+        get_settings.cache_clear()
+        prompt.load_soul.cache_clear()
+        monkeypatch.setattr(client, "_client", None)
+        yield running
+
+
+async def test_compile_run_end_to_end_against_the_stand_in(server, db):
+    for user_id, name in ((10, "Nicklas"), (20, "Tobi")):
+        await users_db.upsert(db, discord_user_id=user_id, display_name=name)
+    for i in range(8):
+        await msg_db.insert(
+            db,
+            discord_message_id=i + 1,
+            channel_id=42,
+            user_id=10 if i % 2 else 20,
+            content=f"skal vi klatre i Vanløse på torsdag, besked nummer {i} med lidt mere tekst end normalt",
+            timestamp_utc=_BASE + timedelta(minutes=i),
+        )
+
+    run_id = await compile_run(
+        db,
+        config=CompilerConfig(name="stand-in", from_time=_BASE, to_time=_BASE + timedelta(hours=1), compiler_model="test"),
+    )
+
+    segments = await list_segments_for_run(db, run_id)
+    assert [(s["topic_title"], s["status"]) for s in segments] == [("Stand-in emne", "summarized")]
+    rollups = await list_rollups_for_run(db, run_id)
+    assert sorted((r["period_type"], r["title"]) for r in rollups) == [
+        ("month", "Stand-in periode"),
+        ("week", "Stand-in periode"),
+    ]
+    assert server.stats.requests == 3
+    assert all(body["text"]["format"] == {"type": "json_object"} for body in server.bodies)
+
+
+async def test_reply_streams_from_the_stand_in(server, db):
+    chat.set_db_conn_provider(lambda: db)
+    deltas = []
+
+    async def on_text_delta(delta):
+        deltas.append(delta)
+
+    result = await chat.reply(question="hvad så", asking_user_id=42, channel_id=0, on_text_delta=on_text_delta)
+
+    assert result.text == "Stand-in svar fra den lokale Responses-server."
+    assert "".join(deltas) == result.text
+    assert len(deltas) > 1
+    assert server.stats.streamed == 1
+
+
+async def test_injected_errors_reach_the_client_as_api_errors(server):
+    server.config.error_rate = 1.0
+    server.config.error_status = 429
+
+    with pytest.raises(openai.RateLimitError):
+        await chat.summarize([])
+
+    assert server.stats.errors == 1
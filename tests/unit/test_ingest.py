@@ -0,0 +1,93 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from klatrebot_v2.db import messages as msg_db, users as users_db
+from klatrebot_v2.db.ingest import IngestWriter
+
+
+_BASE = datetime(2026, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _enqueue(writer: IngestWriter, message_id: int, *, user_id: int = 10, display_name: str = "Nicklas") -> None:
+    writer.enqueue_message(
+        discord_message_id=message_id,
+        channel_id=42,
+        user_id=user_id,
+        display_name=display_name,
+        content=f"besked {message_id}",
+        timestamp_utc=_BASE + timedelta(minutes=message_id),
+    )
+
+
+async def test_flush_writes_users_aliases_and_messages_in_one_batch(db):
+    writer = IngestWriter(db)
+    _enqueue(writer, 1)
+    _enqueue(writer, 2, user_id=20, display_name="Tobi")
+    _enqueue(writer, 3)
+
+    assert writer.queue_depth == 3
+    assert await writer.flush() == 3
+
+    rows = await msg_db.recent_with_authors(db, channel_id=42, limit=10)
+    assert [(r.discord_message_id, r.user_display_name) for r in rows] == [(1, "Nicklas"), (2, "Tobi"), (3, "Nicklas")]
+    cursor = await db.execute("SELECT alias_normalized FROM user_aliases ORDER BY alias_normalized")
+    assert [r[0] for r in await cursor.fetchall()] == ["nicklas", "tobi"]
+    assert writer.queue_depth == 0
+    assert writer.stats.flushes == 1
+    assert writer.stats.messages_written == 3
+    assert writer.stats.max_queue_depth == 3
+
+
+async def test_latest_display_name_in_a_batch_wins(db):
+    writer = IngestWriter(db)
+    _enqueue(writer, 1, display_name="Pelle")
+    _enqueue(writer, 2, display_name="Pelle Lauritsen")
+    await writer.flush()
+
+    user = await users_db.get(db, 10)
+    assert user.display_name == "Pelle Lauritsen"
+
+
+async def test_background_task_flushes_when_max_rows_reached(db):
+    writer = IngestWriter(db, flush_interval_ms=60_000, max_rows=2)
+    writer.start()
+    try:
+        _enqueue(writer, 1)
+        _enqueue(writer, 2)
+        for _ in range(50):
+            if writer.stats.flushes:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await writer.close()
+
+    assert writer.stats.flushes == 1
+    assert len(await msg_db.recent(db, channel_id=42, limit=10)) == 2
+
+
+async def test_background_task_flushes_after_interval(db):
+    writer = IngestWriter(db, flush_interval_ms=10, max_rows=100)
+    writer.start()
+    try:
+        _enqueue(writer, 1)
+        for _ in range(50):
+            if writer.stats.flushes:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await writer.close()
+
+    assert writer.stats.flushes == 1
+    assert writer.stats.last_flush_ms > 0
+
+
+async def test_close_flushes_remaining_rows(db):
+    writer = IngestWriter(db, flush_interval_ms=60_000)
+    writer.start()
+    _enqueue(writer, 1)
+    _enqueue(writer, 2)
+
+    await writer.close()
+
+    assert len(await msg_db.recent(db, channel_id=42, limit=10)) == 2
+    assert writer.queue_depth == 0
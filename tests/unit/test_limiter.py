@@ -0,0 +1,126 @@
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+from klatrebot_v2.memory.limiter import AdaptiveLimiter, is_retryable, retry_after
+
+
+class _RateLimited(openai.RateLimitError):
+    """A 429 without building an HTTP response."""
+
+    def __init__(self) -> None:
+        Exception.__init__(self, "slow down")
+        self.status_code = 429
+
+
+def _rate_limited() -> openai.RateLimitError:
+    return _RateLimited()
+
+
+async def _no_sleep(delay: float) -> None:
+    return None
+
+
+def _flaky(failures: int):
+    calls = {"n": 0}
+
+    async def call():
+        calls["n"] += 1
+        if calls["n"] <= failures:
+            raise _rate_limited()
+        return "ok"
+
+    return call, calls
+
+
+async def test_throttled_call_is_retried_and_halves_the_window():
+    limiter = AdaptiveLimiter(initial=8, maximum=16, sleep=_no_sleep)
+    call, calls = _flaky(1)
+
+    assert await limiter.run(call) == "ok"
+
+    assert calls["n"] == 2
+    assert limiter.stats.retries == 1
+    assert limiter.stats.throttled == 1
+    assert limiter.limit == 4
+
+
+async def test_window_grows_with_healthy_calls_up_to_maximum():
+    limiter = AdaptiveLimiter(initial=2, maximum=3, sleep=_no_sleep)
+
+    async def call():
+        return 1
+
+    for _ in range(20):
+        await limiter.run(call)
+
+    assert limiter.limit == 3
+    assert limiter.rate_per_minute == 20
+    assert limiter.describe() == "window=3, rate=20.0/min, retries=0, throttled=0"
+
+
+async def test_retry_budget_is_shared_and_then_errors_surface():
+    limiter = AdaptiveLimiter(initial=4, maximum=4, retry_budget=2, max_attempts=5, sleep=_no_sleep)
+    call, calls = _flaky(10)
+
+    with pytest.raises(openai.RateLimitError):
+        await limiter.run(call)
+
+    assert calls["n"] == 3
+    assert limiter.stats.failures == 1
+
+
+async def test_retry_budget_grows_with_successful_calls():
+    limiter = AdaptiveLimiter(initial=4, maximum=4, retry_budget=0, retry_ratio=0.5, max_attempts=5, sleep=_no_sleep)
+
+    async def call():
+        return "ok"
+
+    for _ in range(4):
+        await limiter.run(call)
+    flaky, calls = _flaky(10)
+    with pytest.raises(openai.RateLimitError):
+        await limiter.run(flaky)
+
+    assert calls["n"] == 3
+    assert limiter.retries_left == 0
+
+
+async def test_retry_waits_for_retry_after(monkeypatch):
+    monkeypatch.setattr("klatrebot_v2.memory.limiter.random.uniform", lambda low, high: 0.0)
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    limiter = AdaptiveLimiter(initial=4, maximum=4, max_attempts=5, backoff_max_s=30.0, sleep=sleep)
+    headers = iter([{"retry-after": "7"}, {"retry-after-ms": "1500"}, {"retry-after": "120"}])
+
+    async def call():
+        if len(delays) < 3:
+            exc = _rate_limited()
+            exc.response = SimpleNamespace(headers=next(headers))
+            raise exc
+        return "ok"
+
+    assert await limiter.run(call) == "ok"
+
+    # Capped by backoff_max_s.
+    assert delays == [7.0, 1.5, 30.0]
+    assert retry_after(ValueError()) is None
+
+
+async def test_non_retryable_errors_fail_at_once():
+    limiter = AdaptiveLimiter(initial=4, maximum=4, sleep=_no_sleep)
+
+    async def call():
+        raise ValueError("bad json")
+
+    with pytest.raises(ValueError):
+        await limiter.run(call)
+
+    assert limiter.stats.retries == 0
+    assert limiter.limit == 4
+    assert not is_retryable(ValueError())
+    assert is_retryable(_rate_limited())
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from klatrebot_v2.db import llm_calls as llm_calls_db, messages as msg_db, users as users_db
+from klatrebot_v2.db.ingest import IngestWriter
+from klatrebot_v2.llm import telemetry
+from klatrebot_v2.memory.compiler import CompilerConfig, compile_run
+
+
+_BASE = datetime(2026, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+
+async def test_compile_run_records_every_llm_call_with_its_purpose(monkeypatch, db):
+    await users_db.upsert(db, discord_user_id=10, display_name="Nicklas")
+    for i in range(8):
+        await msg_db.insert(
+            db,
+            discord_message_id=i + 1,
+            channel_id=42,
+            user_id=10,
+            content=f"besked {i}",
+            timestamp_utc=_BASE + timedelta(minutes=i),
+        )
+    response = MagicMock()
+    response.output_text = '{"topic_title":"Telemetri","summary":"Kald.","importance":"normal","memory_items":[]}'
+    response.usage = SimpleNamespace(
+        input_tokens=100,
+        output_tokens=25,
+        total_tokens=125,
+        input_tokens_details=SimpleNamespace(cached_tokens=40),
+    )
+    fake_client = MagicMock()
+    fake_client.responses.create = AsyncMock(return_value=response)
+    monkeypatch.setattr("klatrebot_v2.memory.compiler.get_client", lambda: fake_client)
+
+    run_id = await compile_run(
+        db,
+        config=CompilerConfig(name="telemetry", from_time=_BASE, to_time=_BASE + timedelta(hours=1), compiler_model="test"),
+    )
+
+    rows = await llm_calls_db.calls_since(db, _BASE)
+    assert sorted(row[0] for row in rows) == ["rollup", "rollup", "segment"]
+    for purpose, model, _, latency_ms, input_tokens, cached_tokens, output_tokens, _, status, call_run_id in rows:
+        assert (model, input_tokens, cached_tokens, output_tokens, status) == ("test", 100, 40, 25, "ok")
+        assert call_run_id == run_id
+        assert latency_ms >= 0
+
+
+async def test_failed_calls_are_recorded_and_chat_calls_ride_the_ingest_flush(db):
+    writer = IngestWriter(db)
+    telemetry.set_default_sink(lambda call: writer.enqueue_llm_call(telemetry.call_row(call)))
+    try:
+        assert await telemetry.timed("chat", "gpt-test", AsyncMock(return_value=MagicMock()), tool_rounds=2)
+        with pytest.raises(TimeoutError):
+            await telemetry.timed("referat", "gpt-test", AsyncMock(side_effect=TimeoutError()))
+        await writer.flush()
+    finally:
+        telemetry.set_default_sink(None)
+
+    rows = await llm_calls_db.calls_since(db, datetime.now(timezone.utc) - timedelta(minutes=1))
+    # MagicMock usage attributes are not token counts.
+    assert [(r[0], r[4], r[7], r[8]) for r in rows] == [("chat", 0, 2, "ok"), ("referat", 0, 0, "error")]
+
+
+def test_percentile_and_cost():
+    assert telemetry.percentile([], 95) == 0.0
+    assert telemetry.percentile([5.0, 1.0, 3.0, 2.0, 4.0], 50) == 3.0
+    assert telemetry.percentile([float(i) for i in range(1, 101)], 95) == 95.0
+    prices = {"gpt-test": (1.0, 0.1, 4.0)}
+    cost = telemetry.call_cost("gpt-test", input_tokens=1_000_000, cached_tokens=500_000, output_tokens=250_000, prices=prices)
+    assert cost == pytest.approx(0.5 + 0.05 + 1.0)
+    assert telemetry.call_cost("unknown", input_tokens=1, cached_tokens=0, output_tokens=1, prices=prices) is None
@@ -0,0 +1,98 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+from klatrebot_v2.db import messages as msg_db, users as users_db
+from klatrebot_v2.memory.batch import LocalBatchBackend, compile_batch, read_batch_results
+from klatrebot_v2.memory.compiler import CompilerConfig
+from klatrebot_v2.memory.store import (
+    get_compiler_run_by_name,
+    list_rollups_for_run,
+    list_segments_for_run,
+)
+
+
+def _respond(body):
+    if "BESKEDER:" in body["input"]:
+        return json.dumps({"topic_title": "Batch", "summary": "Fra batch.", "importance": "normal"})
+    return json.dumps({"title": "Rollup", "summary": "Perioden.", "key_items": ["a"]})
+
+
+async def test_batch_compile_advances_one_round_per_collect(db, tmp_path):
+    await users_db.upsert(db, discord_user_id=10, display_name="Nicklas")
+    base = datetime(2026, 5, 1, 12, 0, tzinfo=timezone.utc)
+    for i in range(8):
+        await msg_db.insert(
+            db,
+            discord_message_id=i + 1,
+            channel_id=42,
+            user_id=10,
+            content=f"besked {i}",
+            timestamp_utc=base + timedelta(minutes=i),
+        )
+    backend = LocalBatchBackend(tmp_path / "local", _respond)
+    config = CompilerConfig(name="batch", from_time=base, to_time=base + timedelta(hours=1), compiler_model="test")
+
+    run_id = await compile_batch(db, config=config, backend=backend, batch_dir=tmp_path)
+
+    assert (await get_compiler_run_by_name(db, "batch"))["status"] == "running"
+    assert await list_segments_for_run(db, run_id) == []
+    first_batch = [json.loads(line) for line in backend.submitted[0].read_text().splitlines()]
+    assert [line["custom_id"].split(":")[0] for line in first_batch] == ["segment"]
+    assert first_batch[0]["url"] == "/v1/responses"
+
+    for _ in range(3):
+        await compile_batch(db, config=config, backend=backend, batch_dir=tmp_path, collect=True)
+
+    segments = await list_segments_for_run(db, run_id)
+    rollups = await list_rollups_for_run(db, run_id)
+    assert [(s["topic_title"], s["status"]) for s in segments] == [("Batch", "summarized")]
+    assert sorted((r["period_type"], r["status"]) for r in rollups) == [("month", "completed"), ("week", "completed")]
+    assert (await get_compiler_run_by_name(db, "batch"))["status"] == "completed"
+    assert len(backend.submitted) == 3
+
+
+def test_read_batch_results_marks_errored_requests(tmp_path):
+    path = tmp_path / "out.jsonl"
+    path.write_text(
+        "\n".join(
+            json.dumps(row)
+            for row in [
+                {"custom_id": "segment:a", "response": {"status_code": 200, "body": {"output_text": "{}"}}},
+                {"custom_id": "segment:b", "response": {"status_code": 500, "body": {}}},
+                {"custom_id": "rollup:c", "response": None, "error": {"message": "expired"}},
+            ]
+        )
+    )
+
+    assert read_batch_results(path) == {"segment:a": "{}", "segment:b": None, "rollup:c": None}
+
+
+async def test_batch_results_that_fail_validation_fail_their_segment_instead_of_requeueing(db, tmp_path):
+    await users_db.upsert(db, discord_user_id=10, display_name="Nicklas")
+    base = datetime(2026, 5, 1, 12, 0, tzinfo=timezone.utc)
+    for i in range(8):
+        await msg_db.insert(
+            db,
+            discord_message_id=i + 1,
+            channel_id=42,
+            user_id=10,
+            content=f"besked {i}",
+            timestamp_utc=base + timedelta(minutes=i),
+        )
+
+    def respond(body):
+        return "ikke json" if "BESKEDER:" in body["input"] else _respond(body)
+
+    backend = LocalBatchBackend(tmp_path / "local", respond)
+    config = CompilerConfig(name="batch", from_time=base, to_time=base + timedelta(hours=1), compiler_model="test")
+    events = []
+
+    run_id = await compile_batch(db, config=config, backend=backend, batch_dir=tmp_path)
+    await compile_batch(db, config=config, backend=backend, batch_dir=tmp_path, collect=True, progress=events.append)
+
+    segments = await list_segments_for_run(db, run_id)
+    assert [(s["status"], s["retry_count"]) for s in segments] == [("failed", 1)]
+    assert "did not validate" in segments[0]["error"]
+    assert any(line.startswith("Collected batch") and "1 failed" in line for line in events)
+    resubmitted = [json.loads(line)["custom_id"] for path in backend.submitted[1:] for line in path.read_text().splitlines()]
+    assert not any(custom_id.startswith("segment:") for custom_id in resubmitted)
@@ -1,3 +1,4 @@
+import sqlite3
 from datetime import datetime, timedelta, timezone
 from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock
@@ -135,6 +136,28 @@ async def test_compile_cli_updates_failed_duplicate_run_by_default(monkeypatch,
     assert called["rebuild"] is False
 
 
+async def test_compile_cli_collect_runs_a_batch_round(monkeypatch, tmp_path):
+    db_path = tmp_path / "memory.db"
+    called = {}
+
+    async def fake_batch(conn, *, config, backend, batch_dir, collect, progress):
+        called.update(name=config.name, rebuild=config.rebuild, batch_dir=batch_dir, collect=collect)
+        return 3
+
+    monkeypatch.setattr("klatrebot_v2.memory.__main__.compile_batch", fake_batch)
+    monkeypatch.setattr("klatrebot_v2.memory.__main__.get_client", lambda: MagicMock())
+
+    code = await main(["compile", "--db", str(db_path), "--name", "history", "--collect", "--rebuild"])
+
+    assert code == 0
+    assert called == {
+        "name": "history",
+        "rebuild": False,
+        "batch_dir": tmp_path / "memory.batches",
+        "collect": True,
+    }
+
+
 async def test_compile_cli_prints_progress(monkeypatch, tmp_path, capsys):
     db_path = tmp_path / "memory.db"
 
@@ -618,3 +641,119 @@ async def test_resolve_run_id_accepts_numeric_id_or_name(monkeypatch, db):
 
     assert await resolve_run_id(db, "12") == 12
     assert await resolve_run_id(db, "april") == 44
+
+
+async def test_stats_reports_latency_tokens_and_cost_per_segment(monkeypatch, tmp_path, capsys):
+    db_path = tmp_path / "memory.db"
+    monkeypatch.setenv("DISCORD_KEY", "x")
+    monkeypatch.setenv("OPENAI_KEY", "x")
+    monkeypatch.setenv("DISCORD_MAIN_CHANNEL_ID", "1")
+    monkeypatch.setenv("DISCORD_SANDBOX_CHANNEL_ID", "2")
+    monkeypatch.setenv("ADMIN_USER_ID", "3")
+    monkeypatch.setenv("LLM_PRICES_PER_MILLION_TOKENS", '{"luna": [1.0, 0.5, 2.0]}')
+    from klatrebot_v2.settings import get_settings
+    get_settings.cache_clear()
+
+    from klatrebot_v2.db import llm_calls as llm_calls_db
+    from klatrebot_v2.memory import store
+
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    conn = await connection.open(str(db_path))
+    try:
+        await migrations.run(conn)
+        run_id = await store.create_compiler_run(
+            conn,
+            name="stats",
+            compiler_model="luna",
+            from_time=None,
+            to_time=None,
+            channel_ids=None,
+            config={},
+            config_hash="x",
+            source_db_label="test",
+        )
+        await conn.execute(
+            """
+            INSERT INTO conversation_segments
+                (compiler_run_id, channel_id, start_time_utc, end_time_utc, message_count,
+                 human_message_count, total_chars, status)
+            VALUES (?, 42, ?, ?, 8, 8, 400, 'summarized')
+            """,
+            (run_id, now.isoformat(), now.isoformat()),
+        )
+        # Summarized by a run with no calls in the window (e.g. from the cache); not part of the cost.
+        other_run_id = await store.create_compiler_run(
+            conn,
+            name="other",
+            compiler_model="luna",
+            from_time=None,
+            to_time=None,
+            channel_ids=None,
+            config={},
+            config_hash="y",
+            source_db_label="test",
+        )
+        await conn.execute(
+            """
+            INSERT INTO conversation_segments
+                (compiler_run_id, channel_id, start_time_utc, end_time_utc, message_count,
+                 human_message_count, total_chars, status)
+            VALUES (?, 42, ?, ?, 8, 8, 400, 'summarized')
+            """,
+            (other_run_id, now.isoformat(), now.isoformat()),
+        )
+        rows = [
+            llm_calls_db.call_row(purpose="chat", model="terra", started_at_utc=now, latency_ms=ms, input_tokens=10)
+            for ms in (100.0, 200.0, 300.0, 400.0)
+        ]
+        rows.append(
+            llm_calls_db.call_row(
+                purpose="segment",
+                model="luna",
+                started_at_utc=now,
+                latency_ms=900.0,
+                input_tokens=1_000_000,
+                cached_tokens=1_000_000,
+                output_tokens=1_000_000,
+                compiler_run_id=run_id,
+            )
+        )
+        await llm_calls_db.insert_many(conn, rows)
+        await conn.commit()
+    finally:
+        await connection.close(conn)
+
+    code = await main(["stats", "--db", str(db_path), "--days", "1"])
+
+    out = capsys.readouterr().out
+    assert code == 0
+    assert "chat: calls=4 errors=0 p50=200ms p95=400ms" in out
+    assert "segment: calls=1 errors=0 p50=900ms p95=900ms" in out
+    # Chat runs on an unpriced model, so the day's total is unknown.
+    assert f"{now.date().isoformat()}: input=1000040 cached=1000000 output=1000000 cost=n/a" in out
+    assert "segments_summarized: 1" in out
+    assert "cost_per_segment: $2.5000" in out
+
+
+async def test_stats_refuses_an_unmigrated_database_without_touching_it(monkeypatch, tmp_path, capsys):
+    for key, value in {
+        "DISCORD_KEY": "x",
+        "OPENAI_KEY": "x",
+        "DISCORD_MAIN_CHANNEL_ID": "1",
+        "DISCORD_SANDBOX_CHANNEL_ID": "2",
+        "ADMIN_USER_ID": "3",
+    }.items():
+        monkeypatch.setenv(key, value)
+    from klatrebot_v2.settings import get_settings
+    get_settings.cache_clear()
+    db_path = tmp_path / "old.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("PRAGMA user_version = 2")
+
+    code = await main(["stats", "--db", str(db_path)])
+
+    assert code == 1
+    assert "stats needs" in capsys.readouterr().out
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 2
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'llm_calls'").fetchone() is None
@@ -1,17 +1,25 @@
 import asyncio
+import sqlite3
+from dataclasses import replace
 from datetime import datetime, timedelta, timezone
 from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 
-from klatrebot_v2.db import messages as msg_db, users as users_db
+from klatrebot_v2.db import connection, messages as msg_db, migrations, users as users_db
+from klatrebot_v2.memory import compiler, store
 from klatrebot_v2.memory.compiler import CompilerConfig, RollupInput, RollupSummary, SegmentConfig, SegmentSummary, compile_run
+from klatrebot_v2.memory.segmentation import SegmentCandidate
 from klatrebot_v2.memory.store import (
+    create_compiler_run,
     get_compiler_run_by_name,
+    insert_memory_item,
+    insert_segment,
     list_daily_ambient_memory_for_run,
     list_rollups_for_run,
     list_segments_for_run,
+    unit_of_work,
 )
 
 
@@ -568,6 +576,88 @@ async def test_compile_run_builds_daily_ambient_memory_from_skipped_segments(db)
     assert [source["kind"] for source in ambient_inputs[0].sources] == ["skipped_segment"]
 
 
+async def test_compile_run_commits_planning_writes_in_batches(monkeypatch, tmp_path):
+    db_path = tmp_path / "memory.db"
+    conn = await connection.open(str(db_path))
+    await migrations.run(conn)
+    await users_db.upsert(conn, discord_user_id=10, display_name="Nicklas")
+    base = datetime(2026, 1, 5, 12, 0, tzinfo=timezone.utc)
+    for i in range(3):
+        await msg_db.insert(
+            conn,
+            discord_message_id=i + 1,
+            # One channel each, so the tiny segments are never merged.
+            channel_id=42 + i,
+            user_id=10,
+            content=f"loose message {i}",
+            timestamp_utc=base + timedelta(minutes=i),
+        )
+    monkeypatch.setattr(compiler, "_PLANNING_BATCH_WRITES", 1)
+    committed_before_batch = []
+    mark_dirty_periods = store.mark_dirty_periods
+
+    async def watching_mark_dirty_periods(conn, run_id, periods, *, commit=True):
+        # What another connection can already see when the next batch is closed.
+        with sqlite3.connect(db_path) as other:
+            committed_before_batch.append(other.execute("SELECT COUNT(*) FROM conversation_segments").fetchone()[0])
+        await mark_dirty_periods(conn, run_id, periods, commit=commit)
+
+    monkeypatch.setattr(store, "mark_dirty_periods", watching_mark_dirty_periods)
+    try:
+        await compile_run(
+            conn,
+            config=CompilerConfig(name="batches", from_time=base, to_time=base + timedelta(days=1), compiler_model="test"),
+            summarizer=AsyncMock(),
+            rollup_summarizer=_noop_rollup_summarizer,
+        )
+    finally:
+        await connection.close(conn)
+
+    # Each skipped segment is visible before planning moves on; later calls come from the rollup stage.
+    assert committed_before_batch[:3] == [0, 1, 2]
+
+
+async def test_compile_run_keys_a_segment_by_the_messages_it_was_summarized_from(monkeypatch, db):
+    await users_db.upsert(db, discord_user_id=10, display_name="Nicklas")
+    base = datetime(2026, 5, 1, 12, 0, tzinfo=timezone.utc)
+    for i in range(8):
+        await msg_db.insert(
+            db,
+            discord_message_id=(i + 1) * 10,
+            channel_id=42,
+            user_id=10,
+            content=f"besked {i}",
+            timestamp_utc=base + timedelta(minutes=i),
+        )
+    load_segment = store.load_segment
+
+    async def load_after_late_ingest(conn, span):
+        # A message arrives inside the span between planning and summarizing.
+        await msg_db.insert(
+            conn,
+            discord_message_id=15,
+            channel_id=42,
+            user_id=10,
+            content="sen besked",
+            timestamp_utc=base + timedelta(seconds=30),
+        )
+        return await load_segment(conn, span)
+
+    monkeypatch.setattr(store, "load_segment", load_after_late_ingest)
+    summarized = []
+
+    async def summarizer(segment):
+        summarized.append(segment.message_count)
+        return SegmentSummary(topic_title="Sen", summary="Sen besked.", importance="normal")
+
+    config = CompilerConfig(name="late-ingest", from_time=base, to_time=base + timedelta(hours=1), compiler_model="test")
+    await compile_run(db, config=config, summarizer=summarizer, rollup_summarizer=_noop_rollup_summarizer)
+    monkeypatch.setattr(store, "load_segment", load_segment)
+    await compile_run(db, config=config, summarizer=summarizer, rollup_summarizer=_noop_rollup_summarizer)
+
+    assert summarized == [9]
+
+
 async def test_compile_run_marks_rollup_failure_without_aborting(db):
     await users_db.upsert(db, discord_user_id=10, display_name="Nicklas")
     base = datetime(2026, 1, 5, 12, 0, tzinfo=timezone.utc)
@@ -599,6 +689,67 @@ async def test_compile_run_marks_rollup_failure_without_aborting(db):
     assert (await get_compiler_run_by_name(db, "rollup-failure"))["status"] == "completed"
 
 
+async def test_compile_run_rebuilds_only_touched_rollup_periods(monkeypatch, db):
+    await users_db.upsert(db, discord_user_id=10, display_name="Nicklas")
+    base = datetime(2026, 1, 5, 12, 0, tzinfo=timezone.utc)
+
+    async def insert_messages(first_id, start):
+        for i in range(8):
+            await msg_db.insert(
+                db,
+                discord_message_id=first_id + i,
+                channel_id=42,
+                user_id=10,
+                content=f"besked {first_id + i}",
+                timestamp_utc=start + timedelta(minutes=i),
+            )
+
+    async def summarizer(segment):
+        return SegmentSummary(topic_title=f"Emne {segment.messages[0].discord_message_id}", summary="Snak.")
+
+    rollup_periods = []
+
+    async def rollup_summarizer(rollup: RollupInput):
+        rollup_periods.append((rollup.period_type, rollup.period_start.date().isoformat()))
+        return await _noop_rollup_summarizer(rollup)
+
+    loaded_periods = []
+    load_segments = store.completed_segments_for_rollups
+
+    async def spy(conn, run_id, *, period=None):
+        loaded_periods.append(period and period[1].date().isoformat())
+        return await load_segments(conn, run_id, period=period)
+
+    monkeypatch.setattr(store, "completed_segments_for_rollups", spy)
+    config = CompilerConfig(name="touched", from_time=base, to_time=base + timedelta(days=20), compiler_model="test")
+    await insert_messages(1, base)
+    await insert_messages(11, base + timedelta(days=7))
+    run_id = await compile_run(db, config=config, summarizer=summarizer, rollup_summarizer=rollup_summarizer)
+    assert sorted(rollup_periods) == [("month", "2026-01-01"), ("week", "2026-01-05"), ("week", "2026-01-12")]
+
+    rollup_periods.clear()
+    loaded_periods.clear()
+    await insert_messages(21, base + timedelta(days=8))
+    await compile_run(db, config=config, summarizer=summarizer, rollup_summarizer=rollup_summarizer)
+
+    assert loaded_periods == ["2026-01-12"]
+    # The month is revisited too, but its week summaries did not change.
+    assert rollup_periods == [("week", "2026-01-12")]
+    assert await db.execute_fetchall("SELECT * FROM memory_dirty_periods WHERE compiler_run_id = ?", (run_id,)) == []
+
+    rollup_periods.clear()
+    loaded_periods.clear()
+    await compile_run(
+        db,
+        config=replace(config, full_rollups=True),
+        summarizer=summarizer,
+        rollup_summarizer=rollup_summarizer,
+    )
+
+    assert loaded_periods == [None]
+    assert rollup_periods == []
+
+
 async def test_compile_run_reports_progress(db):
     await users_db.upsert(db, discord_user_id=10, display_name="Nicklas")
     base = datetime(2026, 5, 1, 12, 0, tzinfo=timezone.utc)
@@ -669,6 +820,151 @@ async def test_compile_run_reports_total_llm_token_usage(monkeypatch, db):
         assert call.kwargs["reasoning"] == {"effort": "low"}
 
 
+async def test_compile_run_reuses_cached_llm_summaries_across_runs(monkeypatch, db):
+    await users_db.upsert(db, discord_user_id=10, display_name="Nicklas")
+    base = datetime(2026, 5, 1, 12, 0, tzinfo=timezone.utc)
+    for i in range(8):
+        await msg_db.insert(
+            db,
+            discord_message_id=i + 1,
+            channel_id=42,
+            user_id=10,
+            content=f"besked {i}",
+            timestamp_utc=base + timedelta(minutes=i),
+        )
+    response = MagicMock()
+    response.output_text = '{"topic_title":"Cache","summary":"Cachet.","importance":"normal","memory_items":[]}'
+    response.usage = SimpleNamespace(input_tokens=10, output_tokens=5, total_tokens=15)
+    fake_client = MagicMock()
+    fake_client.responses = MagicMock()
+    fake_client.responses.create = AsyncMock(return_value=response)
+    monkeypatch.setattr("klatrebot_v2.memory.compiler.get_client", lambda: fake_client)
+    window = {"from_time": base, "to_time": base + timedelta(hours=1), "compiler_model": "test"}
+
+    await compile_run(db, config=CompilerConfig(name="first", **window))
+    calls = fake_client.responses.create.await_count
+    events = []
+    second = await compile_run(db, config=CompilerConfig(name="second", **window), progress=events.append)
+
+    segments = await list_segments_for_run(db, second)
+    assert [s["topic_title"] for s in segments] == ["Cache"]
+    assert fake_client.responses.create.await_count == calls + 2
+    assert "summary cache: segment_hits=1, rollup_hits=0" in events
+
+
+async def test_compile_run_packs_small_segments_and_isolates_bad_sub_results(monkeypatch, db):
+    await users_db.upsert(db, discord_user_id=10, display_name="Nicklas")
+    base = datetime(2026, 5, 1, 12, 0, tzinfo=timezone.utc)
+    mid = 1
+    for day in range(3):
+        for i in range(8):
+            await msg_db.insert(
+                db,
+                discord_message_id=mid,
+                channel_id=42,
+                user_id=10,
+                content=f"besked {day}-{i}",
+                timestamp_utc=base + timedelta(days=day, minutes=i),
+            )
+            mid += 1
+    packed = SimpleNamespace(
+        output_text=(
+            '{"s1": {"topic_title": "Dag 1", "summary": "Første dag.", "importance": "normal"},'
+            ' "s2": {"topic_title": "Dag 2", "memory_items": "ikke en liste"}}'
+        ),
+        usage=None,
+    )
+    rollup = SimpleNamespace(output_text='{"title": "Rollup", "summary": "Perioden."}', usage=None)
+    prompts = []
+
+    async def create(**kwargs):
+        prompts.append(kwargs["input"])
+        return packed if "SEGMENT s1" in kwargs["input"] else rollup
+
+    fake_client = MagicMock()
+    fake_client.responses.create = create
+    monkeypatch.setattr("klatrebot_v2.memory.compiler.get_client", lambda: fake_client)
+    events = []
+
+    run_id = await compile_run(
+        db,
+        config=CompilerConfig(
+            name="packed",
+            from_time=base,
+            to_time=base + timedelta(days=4),
+            compiler_model="test",
+            pack_token_budget=2_000,
+        ),
+        progress=events.append,
+    )
+
+    segments = await list_segments_for_run(db, run_id)
+    assert sum("SEGMENT s1" in prompt for prompt in prompts) == 1
+    assert "Packed 3 segments into 1 requests." in events
+    assert [(s["topic_title"], s["status"]) for s in segments] == [("Dag 1", "summarized"), ("", "failed"), ("", "failed")]
+    assert "no result for s3" in segments[2]["error"]
+
+
+async def test_compile_run_counts_pack_cache_hits_once_across_retries(monkeypatch, db):
+    await users_db.upsert(db, discord_user_id=10, display_name="Nicklas")
+    base = datetime(2026, 5, 1, 12, 0, tzinfo=timezone.utc)
+    mid = 1
+    for day in range(3):
+        for i in range(8):
+            await msg_db.insert(
+                db,
+                discord_message_id=mid,
+                channel_id=42,
+                user_id=10,
+                content=f"besked {day}-{i}",
+                timestamp_utc=base + timedelta(days=day, minutes=i),
+            )
+            mid += 1
+    single = SimpleNamespace(output_text='{"topic_title": "Dag", "summary": "En dag."}', usage=None)
+    packed = SimpleNamespace(
+        output_text=(
+            '{"s1": {"topic_title": "Dag 2", "summary": "Anden dag."},'
+            ' "s2": {"topic_title": "Dag 3", "summary": "Tredje dag."}}'
+        ),
+        usage=None,
+    )
+    pack_attempts = []
+
+    async def create(**kwargs):
+        if "SEGMENT s1" not in kwargs["input"]:
+            return single
+        pack_attempts.append(1)
+        if len(pack_attempts) == 1:
+            raise asyncio.TimeoutError()
+        return packed
+
+    fake_client = MagicMock()
+    fake_client.responses.create = create
+    monkeypatch.setattr("klatrebot_v2.memory.compiler.get_client", lambda: fake_client)
+    monkeypatch.setattr("klatrebot_v2.memory.limiter.random.uniform", lambda low, high: 0.0)
+    # The first run caches the first day on its own.
+    await compile_run(
+        db,
+        config=CompilerConfig(name="first-day", from_time=base, to_time=base + timedelta(hours=1), compiler_model="test"),
+    )
+    events = []
+
+    await compile_run(
+        db,
+        config=CompilerConfig(
+            name="all-days",
+            from_time=base,
+            to_time=base + timedelta(days=4),
+            compiler_model="test",
+            pack_token_budget=2_000,
+        ),
+        progress=events.append,
+    )
+
+    assert len(pack_attempts) == 2
+    assert "summary cache: segment_hits=1, rollup_hits=0" in events
+
+
 async def test_compile_run_summarizes_meaningful_segments_concurrently(db):
     await users_db.upsert(db, discord_user_id=10, display_name="Nicklas")
     base = datetime(2026, 5, 1, 12, 0, tzinfo=timezone.utc)
@@ -712,6 +1008,61 @@ async def test_compile_run_summarizes_meaningful_segments_concurrently(db):
     assert max_active == 2
 
 
+async def test_compile_run_overlaps_weekly_rollups_and_waits_for_them_before_the_month(db):
+    await users_db.upsert(db, discord_user_id=10, display_name="Nicklas")
+    base = datetime(2026, 1, 5, 12, 0, tzinfo=timezone.utc)
+    mid = 1
+    for week in range(3):
+        for i in range(8):
+            await msg_db.insert(
+                db,
+                discord_message_id=mid,
+                channel_id=42,
+                user_id=10,
+                content=f"besked {week}-{i}",
+                timestamp_utc=base + timedelta(days=week * 7, minutes=i),
+            )
+            mid += 1
+
+    async def summarizer(segment):
+        return SegmentSummary(topic_title="Uge", summary=f"Uge {segment.start_time_utc.date()}.", importance="normal")
+
+    active = 0
+    max_active = 0
+    finished_weeks = []
+    weeks_done_at_month = None
+
+    async def rollup_summarizer(rollup: RollupInput):
+        nonlocal active, max_active, weeks_done_at_month
+        if rollup.period_type == "month":
+            weeks_done_at_month = len(finished_weeks)
+        active += 1
+        max_active = max(max_active, active)
+        await asyncio.sleep(0.05)
+        active -= 1
+        if rollup.period_type == "week":
+            finished_weeks.append(rollup.period_start)
+        return await _noop_rollup_summarizer(rollup)
+
+    run_id = await compile_run(
+        db,
+        config=CompilerConfig(
+            name="concurrent-rollups",
+            from_time=base,
+            to_time=base + timedelta(days=25),
+            compiler_model="test",
+            concurrency=3,
+        ),
+        summarizer=summarizer,
+        rollup_summarizer=rollup_summarizer,
+    )
+
+    assert max_active == 3
+    assert weeks_done_at_month == 3
+    rollups = await list_rollups_for_run(db, run_id)
+    assert sorted((r["period_type"], r["status"]) for r in rollups) == [("month", "completed")] + [("week", "completed")] * 3
+
+
 async def test_compile_run_skips_invalid_llm_source_ids(db):
     await users_db.upsert(db, discord_user_id=10, display_name="Nicklas")
     base = datetime(2026, 5, 1, 12, 0, tzinfo=timezone.utc)
@@ -807,3 +1158,32 @@ async def test_compile_run_treats_null_llm_id_lists_as_empty(db):
         (run_id,),
     )
     assert source_rows == [(1,), (2,), (3,)]
+
+
+async def test_unit_of_work_rolls_back_a_partially_persisted_segment(db):
+    await users_db.upsert(db, discord_user_id=10, display_name="Nicklas")
+    base = datetime(2026, 5, 1, 12, 0, tzinfo=timezone.utc)
+    await msg_db.insert(db, discord_message_id=1, channel_id=42, user_id=10, content="hej", timestamp_utc=base)
+    messages = await msg_db.in_window(db, channel_id=42, start=base, end=base + timedelta(minutes=1))
+    run_id = await create_compiler_run(db, name="uow", compiler_model="test")
+    segment = SegmentCandidate(channel_id=42, messages=messages)
+
+    with pytest.raises(KeyError):
+        async with unit_of_work(db):
+            segment_id = await insert_segment(
+                db,
+                compiler_run_id=run_id,
+                segment=segment,
+                topic_title="Emne",
+                summary="Opsummering.",
+                importance="normal",
+                tags=["emne"],
+                commit=False,
+            )
+            await insert_memory_item(
+                db, compiler_run_id=run_id, segment_id=segment_id, item={"type": "fact"}, segment=segment, commit=False
+            )
+
+    assert await list_segments_for_run(db, run_id) == []
+    rows = await db.execute_fetchall("SELECT COUNT(*) FROM segment_messages")
+    assert rows == [(0,)]
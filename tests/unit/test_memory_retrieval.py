@@ -1,8 +1,11 @@
+import asyncio
 from datetime import datetime, timedelta, timezone
 
 from klatrebot_v2.db import messages as msg_db, users as users_db
 from klatrebot_v2.memory.compiler import CompilerConfig, RollupSummary, SegmentSummary, compile_run
-from klatrebot_v2.memory.retrieval import get_memory_sources, recall_community_memory
+from klatrebot_v2.memory import retrieval
+from klatrebot_v2.memory.retrieval import MemoryResult, get_memory_sources, recall_community_memory
+from klatrebot_v2.time_utils import to_epoch_ms
 
 
 async def _rollup_summarizer(rollup):
@@ -550,3 +553,70 @@ async def test_recall_collapses_likely_duplicate_memory_items(db):
     item_results = [r for r in result.results if r.kind == "memory_item"]
 
     assert len(item_results) == 1
+
+
+async def test_recall_debug_reports_tier_timings(db):
+    run_id = await _compile_spanien_run(db)
+
+    result = await recall_community_memory(db, run_id=run_id, query="Spanien transport", debug=True)
+    plain = await recall_community_memory(db, run_id=run_id, query="Spanien transport")
+
+    assert set(result.debug.tier_ms) | set(result.debug.skipped_tiers) == {"items", "segments", "ambient"}
+    assert plain.debug is None
+    assert plain.source_handles == result.source_handles
+
+
+async def test_run_tiers_cancels_tiers_that_cannot_outrank_results_in_hand(db):
+    slow_started = asyncio.Event()
+
+    async def strong(conn):
+        await slow_started.wait()
+        return [MemoryResult(kind="rollup_month", source_handle="roll:1", score=150.0)]
+
+    async def slow(conn):
+        slow_started.set()
+        await asyncio.sleep(5)
+        return [MemoryResult(kind="daily_ambient", source_handle="amb:1", score=22.0)]
+
+    tiers = [
+        retrieval._RecallTier("rollups", 150.0, [strong]),
+        retrieval._RecallTier("ambient", 34.0, [slow]),
+    ]
+
+    ranked, tier_ms, skipped = await asyncio.wait_for(retrieval._run_tiers(db, tiers, limit=1), timeout=1)
+
+    assert [r.source_handle for r in ranked] == ["roll:1"]
+    assert skipped == ["ambient"]
+    assert set(tier_ms) == {"rollups"}
+
+
+async def test_nearby_messages_expand_by_position_around_each_seed(db):
+    await users_db.upsert(db, discord_user_id=10, display_name="Nicklas")
+    base = datetime(2026, 5, 1, 12, 0, tzinfo=timezone.utc)
+    for i in range(1, 21):
+        await msg_db.insert(
+            db,
+            discord_message_id=i,
+            channel_id=42,
+            user_id=10,
+            content=f"besked {i}",
+            timestamp_utc=base + timedelta(minutes=i),
+        )
+    seeds = [(5, to_epoch_ms(base + timedelta(minutes=5))), (12, to_epoch_ms(base + timedelta(minutes=12)))]
+
+    nearby = dict(await retrieval._nearby_message_ids(db, 42, seeds, 2))
+
+    assert sorted(nearby) == [3, 4, 5, 6, 7, 10, 11, 12, 13, 14]
+    assert (nearby[5], nearby[7], nearby[10]) == (0, 2, 2)
+
+
+async def test_get_memory_sources_caps_payload_keeping_source_messages(db):
+    run_id = await _compile_spanien_run(db)
+    recall = await recall_community_memory(db, run_id=run_id, query="Spanien")
+    uncapped = await get_memory_sources(db, source_handles=recall.source_handles, context_radius=3)
+
+    capped = await get_memory_sources(db, source_handles=recall.source_handles, context_radius=3, max_messages=2)
+
+    assert len(uncapped) > 2
+    assert len(capped) == 2
+    assert any("Spanien kunne være fedt" in source.content for source in capped)
@@ -0,0 +1,112 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from klatrebot_v2.db import connection, migrations
+from klatrebot_v2.memory import store
+from klatrebot_v2.memory.rolling import RollingCompiler, compile_rolling, in_worker_thread
+from klatrebot_v2.settings import Settings
+
+
+_NOW = datetime(2026, 5, 22, 12, 0, tzinfo=timezone.utc)
+
+
+def _settings(db_path) -> Settings:
+    return Settings(
+        discord_key="x",
+        openai_key="x",
+        discord_main_channel_id=42,
+        discord_sandbox_channel_id=2,
+        admin_user_id=3,
+        db_path=str(db_path),
+        memory_rolling_enabled=True,
+        memory_rolling_settle_minutes=45,
+        memory_segment_gap_minutes=30,
+    )
+
+
+async def _migrated(db_path) -> None:
+    conn = await connection.open(str(db_path))
+    try:
+        await migrations.run(conn)
+    finally:
+        await connection.close(conn)
+
+
+async def test_compile_rolling_shares_the_lease_and_advances_the_watermark(db):
+    settings = _settings(":memory:")
+    windows = []
+
+    async def fake_compile(conn, *, config, progress=None):
+        windows.append((config.from_time, config.to_time, config.channel_ids))
+        blocked = await compile_rolling(conn, settings=settings, owner="timer", clock=lambda: _NOW)
+        assert blocked.status == "locked"
+        return 7
+
+    result = await compile_rolling(db, settings=settings, owner="bot", clock=lambda: _NOW, compile=fake_compile)
+
+    assert (result.status, result.run_id) == ("compiled", 7)
+    assert windows == [(_NOW - timedelta(hours=24), _NOW - timedelta(minutes=45), [42])]
+    state = await store.get_rolling_state(db, "production")
+    assert state["last_successful_to_utc"] == (_NOW - timedelta(minutes=45)).isoformat()
+    assert state["lock_owner"] is None
+
+
+async def test_rolling_compiler_waits_for_the_conversation_to_settle(tmp_path):
+    db_path = tmp_path / "memory.db"
+    await _migrated(db_path)
+    clock = {"now": _NOW}
+    compiled = asyncio.Queue()
+    bot_loop = asyncio.get_running_loop()
+    bot_thread = threading.get_ident()
+
+    async def fake_compile(conn, *, config, progress=None):
+        # Compiles run in a worker thread on a loop of their own.
+        assert threading.get_ident() != bot_thread
+        bot_loop.call_soon_threadsafe(compiled.put_nowait, config.to_time)
+        return 1
+
+    rolling = RollingCompiler(str(db_path), settings=_settings(db_path), clock=lambda: clock["now"], compile=fake_compile)
+    rolling.start()
+    try:
+        # Catch-up compile at start.
+        assert await asyncio.wait_for(compiled.get(), 1) == _NOW - timedelta(minutes=45)
+
+        rolling.note_message(42, _NOW + timedelta(minutes=1))
+        rolling.note_message(7, _NOW + timedelta(hours=5))
+        rolling.note_message(42, _NOW + timedelta(minutes=10))
+        await asyncio.sleep(0.05)
+        assert compiled.empty()
+        assert rolling.due_at == _NOW + timedelta(minutes=55)
+
+        clock["now"] = _NOW + timedelta(minutes=56)
+        rolling.note_message(42, _NOW + timedelta(minutes=2))
+        rolling._wake.set()
+        assert await asyncio.wait_for(compiled.get(), 1) == _NOW + timedelta(minutes=11)
+        await asyncio.sleep(0.05)
+        assert rolling.stats.compiles == 2
+        assert rolling.due_at is None
+    finally:
+        await rolling.close()
+
+
+async def test_cancelled_worker_compile_unwinds_before_the_caller_returns():
+    started = threading.Event()
+    unwound = []
+
+    async def compile_forever():
+        started.set()
+        try:
+            await asyncio.sleep(60)
+        finally:
+            unwound.append(True)
+
+    task = asyncio.create_task(in_worker_thread(compile_forever))
+    await asyncio.to_thread(started.wait, 1)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert unwound == [True]
@@ -1,6 +1,17 @@
 from datetime import datetime, timedelta, timezone
 
-from klatrebot_v2.memory.segmentation import RawMemoryMessage, SegmentConfig, build_segments
+import pytest
+
+from klatrebot_v2.db import messages as msg_db, users as users_db
+from klatrebot_v2.memory import store
+from klatrebot_v2.memory.segmentation import (
+    RawMemoryMessage,
+    SegmentBuilder,
+    SegmentConfig,
+    SegmentSpan,
+    build_segments,
+    iter_segments,
+)
 
 
 def msg(mid: int, *, minutes: int, content: str = "hej", channel: int = 1, user: int = 10, is_bot: bool = False):
@@ -88,3 +99,50 @@ def test_build_segments_keeps_bot_messages_as_context_but_not_human_counts():
     assert segments[0].message_count == 3
     assert segments[0].human_message_count == 2
     assert segments[0].participant_ids == [10, 20]
+
+
+def _ids(segments):
+    return [[m.discord_message_id for m in s.messages] for s in segments]
+
+
+async def test_streamed_segments_match_build_segments(db):
+    config = SegmentConfig(gap_minutes=30, min_human_messages=3, min_total_chars=80, min_participants=2, max_messages=6)
+    for user_id in (10, 11, 12):
+        await users_db.upsert(db, discord_user_id=user_id, display_name=f"user-{user_id}")
+    minutes = 0
+    for mid in range(1, 61):
+        minutes += (1, 4, 45, 2, 90)[mid % 5]
+        await msg_db.insert(
+            db,
+            discord_message_id=mid,
+            channel_id=1 + mid % 2,
+            user_id=10 + mid % 3,
+            content="x" * (mid % 7 * 5),
+            timestamp_utc=datetime(2026, 5, 1, tzinfo=timezone.utc) + timedelta(minutes=minutes),
+        )
+
+    expected = build_segments(await store.load_messages(db), config)
+    streamed = [segment async for segment in iter_segments(store.iter_messages(db, batch_size=7), config)]
+
+    assert _ids(streamed) == _ids(expected)
+    reloaded = [await store.load_segment(db, SegmentSpan.of(segment)) for segment in streamed]
+    assert _ids(reloaded) == _ids(expected)
+
+
+def test_segment_builder_holds_last_segment_for_tiny_tail():
+    builder = SegmentBuilder(SegmentConfig(gap_minutes=30, min_human_messages=2, min_total_chars=500, min_participants=3))
+
+    released = []
+    for message in [msg(1, minutes=0), msg(2, minutes=1), msg(3, minutes=60), msg(4, minutes=61), msg(5, minutes=120)]:
+        released.extend(builder.push(message))
+
+    assert released == []
+    assert _ids(builder.finish()) == [[1, 2], [3, 4, 5]]
+
+
+def test_segment_builder_rejects_unordered_messages():
+    builder = SegmentBuilder()
+    builder.push(msg(2, minutes=5))
+
+    with pytest.raises(ValueError):
+        builder.push(msg(1, minutes=0))
@@ -1,3 +1,5 @@
+import asyncio
+import json
 from datetime import datetime, timezone
 
 from pydantic import BaseModel
@@ -56,3 +58,28 @@ async def test_recall_tool_reports_ambiguous_people_names(monkeypatch, db):
     )
 
     assert '"ambiguous": {"Simon": [1, 2]}' in output
+
+
+async def test_tool_calls_in_one_round_run_concurrently_in_call_order(db):
+    started = []
+    release = asyncio.Event()
+
+    async def fake_execute(conn, *, run_id, name, arguments):
+        started.append(arguments["query"])
+        if len(started) == 3:
+            release.set()
+        await release.wait()
+        if arguments["query"] == "langsom":
+            await asyncio.sleep(1)
+        return arguments["query"]
+
+    calls = [
+        {"name": "recall_community_memory", "call_id": f"call_{q}", "arguments": {"query": q}}
+        for q in ("a", "langsom", "b")
+    ]
+
+    outputs = await tools.execute_memory_tool_calls(db, calls, run_id=1, timeout_s=0.1, execute=fake_execute)
+
+    assert outputs[0] == "a"
+    assert json.loads(outputs[1]) == {"error": "Memory tool recall_community_memory timed out"}
+    assert outputs[2] == "b"
@@ -0,0 +1,45 @@
+from datetime import datetime, timezone
+
+from klatrebot_v2.db import messages as msg_db, users as users_db
+from klatrebot_v2.db.rows import MessageRow
+from klatrebot_v2.memory.store import load_messages
+from klatrebot_v2.time_utils import to_epoch_ms
+
+
+_TS = datetime(2026, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def test_from_row_parses_timestamp_lazily():
+    row = MessageRow.from_row((1, 42, 10, "Nicklas", "hej", to_epoch_ms(_TS), 0))
+
+    assert row._timestamp_utc is None
+    assert row.timestamp_utc == _TS
+    assert row.is_bot is False
+
+
+def test_keyword_construction_matches_decoded_row():
+    built = MessageRow(
+        discord_message_id=1,
+        channel_id=42,
+        user_id=10,
+        user_display_name="Nicklas",
+        content="hej",
+        timestamp_utc=_TS,
+    )
+    decoded = MessageRow.from_row((1, 42, 10, "Nicklas", "hej", to_epoch_ms(_TS), 0))
+
+    assert built == decoded
+    assert built.timestamp_ms == to_epoch_ms(_TS)
+
+
+async def test_query_helpers_return_message_rows(db):
+    await users_db.upsert(db, discord_user_id=10, display_name="Nicklas")
+    await msg_db.insert(db, discord_message_id=1, channel_id=42, user_id=10, content="hej", timestamp_utc=_TS)
+
+    recent = await msg_db.recent_with_authors(db, channel_id=42, limit=5)
+    loaded = await load_messages(db)
+
+    assert recent == loaded
+    assert isinstance(recent[0], MessageRow)
+    assert recent[0].user_display_name == "Nicklas"
+    assert recent[0].timestamp_utc == _TS
@@ -0,0 +1,56 @@
+from datetime import datetime, timezone
+
+from klatrebot_v2.db import messages as msg_db, migrations, users as users_db
+from klatrebot_v2.time_utils import from_epoch_ms, to_epoch_ms
+
+
+def test_epoch_ms_round_trip_is_exact():
+    ts = datetime(2026, 5, 1, 12, 0, 0, 123456, tzinfo=timezone.utc)
+
+    assert to_epoch_ms(ts) == 1777636800123
+    assert from_epoch_ms(to_epoch_ms(ts)) == ts.replace(microsecond=123000)
+
+
+async def test_run_backfills_epoch_ms_columns_from_iso_text(db):
+    await users_db.upsert(db, discord_user_id=10, display_name="Nicklas")
+    ts = datetime(2026, 5, 1, 12, 0, tzinfo=timezone.utc)
+    await msg_db.insert(db, discord_message_id=1, channel_id=42, user_id=10, content="hej", timestamp_utc=ts)
+    await db.execute("UPDATE messages SET timestamp_ms = NULL")
+    await db.execute("PRAGMA user_version = 1")
+    await db.commit()
+
+    report = await migrations.run(db)
+
+    assert report.applied == [m.name for m in migrations.MIGRATIONS[1:]]
+
+    rows = await db.execute_fetchall("SELECT timestamp_ms FROM messages")
+    assert rows == [(to_epoch_ms(ts),)]
+
+
+async def test_run_indexes_epoch_ms_columns(db):
+    rows = await db.execute_fetchall("SELECT name FROM sqlite_master WHERE type = 'index'")
+    names = {row[0] for row in rows}
+
+    assert "idx_messages_channel_ts_ms" in names
+    assert "idx_segments_run_time_ms" in names
+    assert "idx_messages_channel_ts" not in names
+
+
+async def test_run_on_current_database_applies_nothing(db):
+    report = await migrations.run(db)
+
+    assert await migrations.current_version(db) == migrations.LATEST_VERSION
+    assert report.applied == []
+    assert report.from_version == report.to_version == migrations.LATEST_VERSION
+
+
+async def test_unversioned_database_is_brought_up_to_date(db):
+    await db.execute("PRAGMA user_version = 0")
+    await db.commit()
+
+    report = await migrations.run(db)
+
+    assert report.from_version == 0
+    assert report.applied == [m.name for m in migrations.MIGRATIONS]
+    assert set(report.step_ms) == set(report.applied)
+    assert await migrations.current_version(db) == migrations.LATEST_VERSION
@@ -0,0 +1,49 @@
+from klatrebot_v2.memory import tools
+from klatrebot_v2.memory.recall_cache import RecallCache, get_recall_cache
+from klatrebot_v2.memory.retrieval import RecallResult
+from klatrebot_v2.memory.store import complete_compiler_run, create_compiler_run
+
+
+async def test_repeated_recall_is_served_from_cache_until_run_completes(monkeypatch, db):
+    run_id = await create_compiler_run(db, name="production", compiler_model="test")
+    await complete_compiler_run(db, run_id)
+    calls = []
+
+    async def fake_recall(conn, **kwargs):
+        calls.append(kwargs["query"])
+        return RecallResult(answerable=True, source_handles=["segment:1"])
+
+    monkeypatch.setattr(tools, "recall_community_memory", fake_recall)
+
+    async def recall(query: str) -> str:
+        return await tools.execute_memory_tool(
+            db, run_id=run_id, name="recall_community_memory", arguments={"query": query}
+        )
+
+    first = await recall("Spanien tur")
+    assert await recall("  spanien   TUR ") == first
+    assert calls == ["Spanien tur"]
+
+    await db.execute("UPDATE memory_compiler_runs SET completed_at = '2999-01-01 00:00:00' WHERE id = ?", (run_id,))
+    await db.commit()
+    await recall("Spanien tur")
+
+    stats = get_recall_cache(db).stats
+    assert len(calls) == 2
+    assert (stats.hits, stats.misses, stats.invalidations) == (1, 2, 1)
+    assert stats.hit_rate == 1 / 3
+
+
+def test_cache_evicts_least_recently_used_and_expires_entries():
+    cache = RecallCache(max_entries=2, ttl_seconds=60)
+    result = RecallResult(answerable=False)
+    cache.put(1, ("g",), "a", result)
+    cache.put(1, ("g",), "b", result)
+    assert cache.get(1, ("g",), "a") == result
+    cache.put(1, ("g",), "c", result)
+
+    assert cache.get(1, ("g",), "b") is None
+    assert cache.stats.evictions == 1
+
+    cache.ttl_seconds = -1
+    assert cache.get(1, ("g",), "a") is None
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta, timezone
+
+from klatrebot_v2.db import messages as msg_db, users as users_db
+from klatrebot_v2.db.ingest import IngestWriter
+from klatrebot_v2.db.recent_buffer import RecentMessageBuffer
+from klatrebot_v2.db.rows import MessageRow
+
+
+_BASE = datetime(2026, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _row(message_id: int, *, channel_id: int = 42) -> MessageRow:
+    return MessageRow(
+        message_id, channel_id, 10, "Nicklas", f"besked {message_id}", _BASE + timedelta(minutes=message_id)
+    )
+
+
+async def _insert(db, message_id: int) -> None:
+    await msg_db.insert(
+        db,
+        discord_message_id=message_id,
+        channel_id=42,
+        user_id=10,
+        content=f"besked {message_id}",
+        timestamp_utc=_BASE + timedelta(minutes=message_id),
+    )
+
+
+async def test_cold_channel_falls_back_until_warmed(db):
+    await users_db.upsert(db, discord_user_id=10, display_name="Nicklas")
+    for message_id in (1, 2, 3):
+        await _insert(db, message_id)
+    buffer = RecentMessageBuffer(capacity=5)
+
+    assert buffer.tail(42, 2) is None
+    await buffer.warm(db, 42)
+
+    assert [r.discord_message_id for r in buffer.tail(42, 2)] == [2, 3]
+    # The whole channel fits, so asking for more than exists is still a hit.
+    assert [r.discord_message_id for r in buffer.tail(42, 5)] == [1, 2, 3]
+    assert buffer.stats.hits == 2
+    assert buffer.stats.misses == 1
+
+
+async def test_eviction_narrows_window_coverage():
+    buffer = RecentMessageBuffer(capacity=3)
+    buffer.seed(42, [], complete=True)
+    for message_id in range(1, 6):
+        buffer.append(_row(message_id))
+
+    assert [r.discord_message_id for r in buffer.tail(42, 3)] == [3, 4, 5]
+    assert buffer.window(42, _BASE + timedelta(minutes=3), _BASE + timedelta(minutes=5)) == [_row(3), _row(4)]
+    # Message 2 was evicted, so a window reaching back to it must go to SQLite.
+    assert buffer.window(42, _BASE + timedelta(minutes=2), _BASE + timedelta(minutes=5)) is None
+    assert buffer.tail(42, 4) is None
+
+
+async def test_ingest_appends_before_flush(db):
+    buffer = RecentMessageBuffer(capacity=10)
+    buffer.seed(42, [], complete=True)
+    writer = IngestWriter(db, recent_buffer=buffer)
+    writer.enqueue_message(
+        discord_message_id=7,
+        channel_id=42,
+        user_id=10,
+        display_name="Nicklas",
+        content="hej",
+        timestamp_utc=_BASE,
+    )
+
+    rows = buffer.tail(42, 1)
+    assert [(r.discord_message_id, r.user_display_name, r.timestamp_utc) for r in rows] == [(7, "Nicklas", _BASE)]
+    assert writer.queue_depth == 1
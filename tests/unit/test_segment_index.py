@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta, timezone
+
+from klatrebot_v2.db import messages as msg_db, users as users_db
+from klatrebot_v2.memory.segment_index import IndexedSegment, load_segment_index
+from klatrebot_v2.memory.segmentation import SegmentCandidate
+from klatrebot_v2.memory.store import create_compiler_run, insert_segment, load_messages
+
+
+_BASE = datetime(2026, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+
+async def _segments(db, run_id: int) -> list[int]:
+    await users_db.upsert(db, discord_user_id=10, display_name="Nicklas")
+    for mid in range(1, 7):
+        await msg_db.insert(
+            db,
+            discord_message_id=mid,
+            channel_id=42,
+            user_id=10,
+            content="hej",
+            timestamp_utc=_BASE + timedelta(days=mid // 4, minutes=mid),
+        )
+    messages = await load_messages(db)
+    ids = []
+    for key, chunk in (("a", messages[:3]), ("b", messages[3:])):
+        ids.append(
+            await insert_segment(
+                db,
+                compiler_run_id=run_id,
+                segment=SegmentCandidate(channel_id=42, messages=chunk),
+                segment_key=key,
+                topic_title="",
+                summary="",
+                importance="normal",
+                status="failed" if key == "b" else "summarized",
+                retry_count=2 if key == "b" else 0,
+            )
+        )
+    return ids
+
+
+async def test_index_maps_keys_and_message_owners(db):
+    run_id = await create_compiler_run(db, name="index", compiler_model="test")
+    first, second = await _segments(db, run_id)
+
+    index = await load_segment_index(db, run_id=run_id)
+
+    assert index.by_key("b") == IndexedSegment(id=second, status="failed", retry_count=2)
+    assert index.owners([3, 4, 99]) == [first, second]
+
+    index.remove(first)
+    index.add("c", IndexedSegment(id=99, status="skipped", retry_count=0))
+
+    assert index.by_key("a") is None
+    assert index.by_key("c").id == 99
+    assert index.owners([1, 2, 3, 4]) == [second]
+
+
+async def test_index_only_loads_segments_overlapping_the_window(db):
+    run_id = await create_compiler_run(db, name="window", compiler_model="test")
+    _, second = await _segments(db, run_id)
+
+    index = await load_segment_index(db, run_id=run_id, from_time=_BASE + timedelta(days=1))
+
+    assert len(index) == 1
+    assert index.by_key("a") is None
+    assert index.owners(range(1, 7)) == [second]
@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+
+from klatrebot_v2.db import users as users_db
+from klatrebot_v2.db.ingest import IngestWriter
+from klatrebot_v2.db.user_cache import UserCache
+
+
+async def test_upsert_skips_unchanged_display_name(db):
+    cache = UserCache()
+
+    assert await cache.upsert(db, discord_user_id=42, display_name="Pelle") is True
+    assert await cache.upsert(db, discord_user_id=42, display_name="Pelle") is False
+    assert await cache.upsert(db, discord_user_id=42, display_name="Pelle Lauritsen") is True
+
+    assert (await users_db.get(db, 42)).display_name == "Pelle Lauritsen"
+    assert cache.stats.writes == 2
+    assert cache.stats.skipped_writes == 1
+
+
+async def test_get_reads_through_once_then_serves_from_cache(db):
+    await users_db.upsert(db, discord_user_id=42, display_name="Pelle")
+    cache = UserCache()
+
+    first = await cache.get(db, 42)
+    second = await cache.get(db, 42)
+
+    assert first == second
+    assert first.display_name == "Pelle"
+    assert (cache.stats.misses, cache.stats.hits) == (1, 1)
+    assert await cache.get(db, 999) is None
+
+
+async def test_warm_loads_known_users_and_aliases(db):
+    await users_db.upsert(db, discord_user_id=42, display_name="Pelle Lauritsen")
+    cache = UserCache()
+
+    assert await cache.warm(db) == 1
+    assert cache.needs_write(42, "Pelle Lauritsen") is False
+    assert cache.needs_write(42, "Pelle") is True
+
+
+async def test_ingest_writer_only_queues_users_whose_name_changed(db):
+    cache = UserCache()
+    writer = IngestWriter(db, user_cache=cache)
+    ts = datetime(2026, 5, 1, 12, 0, tzinfo=timezone.utc)
+    for message_id in range(1, 4):
+        writer.enqueue_message(
+            discord_message_id=message_id,
+            channel_id=1,
+            user_id=42,
+            display_name="Pelle",
+            content="hej",
+            timestamp_utc=ts,
+        )
+    await writer.flush()
+
+    assert writer.stats.users_written == 1
+    assert cache.stats.skipped_writes == 2
+    cursor = await db.execute("SELECT COUNT(*) FROM user_aliases WHERE discord_user_id = 42")
+    assert (await cursor.fetchone())[0] == 1